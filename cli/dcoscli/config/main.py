@@ -23,12 +23,10 @@ Positional Arguments:
 
 import collections
 import copy
-import json
 import os
 
 import dcoscli
 import docopt
-import pkg_resources
 import six
 import toml
 from dcos import (cmds, config, constants, emitting, http, jsonitem,
@@ -375,10 +373,8 @@ def _get_config_schema(command):
     # correspond to any particular subcommand, so we must handle them
     # separately.
     if command == "core":
-        return json.loads(
-            pkg_resources.resource_string(
-                'dcoscli',
-                'data/config-schema/core.json').decode('utf-8'))
+        return util.load_resource_json('dcoscli',
+                                       'data/config-schema/core.json')
 
     executable = subcommand.command_executables(command)
     return subcommand.config_schema(executable)
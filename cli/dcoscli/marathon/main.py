@@ -5,6 +5,12 @@ Usage:
     dcos marathon --info
     dcos marathon about
     dcos marathon app add [<app-resource>]
+    dcos marathon app bulk start [--force --json --instances=<instances>]
+         [--group=<group-id> --label=<label>] [<app-ids>...]
+    dcos marathon app bulk stop [--force --json]
+         [--group=<group-id> --label=<label>] [<app-ids>...]
+    dcos marathon app bulk restart [--force --json]
+         [--group=<group-id> --label=<label>] [<app-ids>...]
     dcos marathon app list [--json]
     dcos marathon app remove [--force] <app-id>
     dcos marathon app restart [--force] <app-id>
@@ -18,13 +24,15 @@ Usage:
     dcos marathon deployment stop <deployment-id>
     dcos marathon deployment watch [--max-count=<max-count>]
          [--interval=<interval>] <deployment-id>
+    dcos marathon task kill [--scale --json] [--app=<app-id> --host=<host>]
+         [<task-ids>...]
     dcos marathon task list [--json <app-id>]
     dcos marathon task show <task-id>
-    dcos marathon group add [<group-resource>]
+    dcos marathon group add [--plan] [<group-resource>]
     dcos marathon group list [--json]
     dcos marathon group show [--group-version=<group-version>] <group-id>
     dcos marathon group remove [--force] <group-id>
-    dcos marathon group update [--force] <group-id> [<properties>...]
+    dcos marathon group update [--force --plan] <group-id> [<properties>...]
 
 Options:
     -h, --help                       Show this screen
@@ -68,9 +76,31 @@ Options:
 
     --interval=<interval>            Number of seconds to wait between actions
 
+    --group=<group-id>               Select the applications in this group and
+                                     its subgroups
+
+    --label=<label>                  Select the applications that have this
+                                     label. Must be of the format <key> or
+                                     <key>=<value>
+
+    --instances=<instances>          The number of instances to start. Defaults
+                                     to 1
+
+    --app=<app-id>                   Select the tasks of this application
+
+    --host=<host>                    Select the tasks running on this host
+
+    --scale                          Scale down the applications of the killed
+                                     tasks instead of replacing the tasks
+
+    --plan                           Print the application and group changes
+                                     without sending them
+
 Positional Arguments:
     <app-id>                    The application id
 
+    <app-ids>                   The ids of the applications to operate on
+
     <app-resource>              Path to a file containing the app's JSON
                                 definition. If omitted, the definition is read
                                 from stdin. For a detailed description see
@@ -94,21 +124,40 @@ Positional Arguments:
                                 stdin.
 
     <task-id>                   The task id
+
+    <task-ids>                  The ids of the tasks to kill. May contain
+                                shell-style wildcards, e.g. 'web.*'
 """
-import json
+import fnmatch
+import functools
 import sys
 import time
 
+import concurrent.futures
 import dcoscli
 import docopt
-import pkg_resources
-from dcos import cmds, emitting, jsonitem, marathon, options, util
+from dcos import (cmds, emitting, groupdiff, jsonitem, marathon, options,
+                  util)
 from dcos.errors import DCOSException
 from dcoscli import tables
 
 logger = util.get_logger(__name__)
 emitter = emitting.FlatEmitter()
 
+DEPLOYMENT_EVENTS = ['deployment_info',
+                     'deployment_step_success',
+                     'deployment_step_failure',
+                     'deployment_success',
+                     'deployment_failed']
+"""Marathon events that describe the progress of a deployment."""
+
+BULK_CONCURRENCY = 8
+"""Number of applications that bulk operations work on concurrently."""
+
+WATCH_MAX_BACKOFF = 8
+"""When polling an unchanged deployment, the wait between polls grows up
+to this multiple of the watch interval."""
+
 
 def main():
     try:
@@ -160,6 +209,11 @@ def _cmds():
             arg_keys=['<deployment-id>', '--max-count', '--interval'],
             function=_deployment_watch),
 
+        cmds.Command(
+            hierarchy=['marathon', 'task', 'kill'],
+            arg_keys=['<task-ids>', '--app', '--host', '--scale', '--json'],
+            function=_task_kill),
+
         cmds.Command(
             hierarchy=['marathon', 'task', 'list'],
             arg_keys=['<app-id>', '--json'],
@@ -190,6 +244,24 @@ def _cmds():
             arg_keys=['<app-id>', '--app-version'],
             function=_show),
 
+        cmds.Command(
+            hierarchy=['marathon', 'app', 'bulk', 'start'],
+            arg_keys=['<app-ids>', '--group', '--label', '--instances',
+                      '--force', '--json'],
+            function=functools.partial(_bulk, _start_app)),
+
+        cmds.Command(
+            hierarchy=['marathon', 'app', 'bulk', 'stop'],
+            arg_keys=['<app-ids>', '--group', '--label', '--instances',
+                      '--force', '--json'],
+            function=functools.partial(_bulk, _stop_app)),
+
+        cmds.Command(
+            hierarchy=['marathon', 'app', 'bulk', 'restart'],
+            arg_keys=['<app-ids>', '--group', '--label', '--instances',
+                      '--force', '--json'],
+            function=functools.partial(_bulk, _restart_app)),
+
         cmds.Command(
             hierarchy=['marathon', 'app', 'start'],
             arg_keys=['<app-id>', '<instances>', '--force'],
@@ -212,7 +284,7 @@ def _cmds():
 
         cmds.Command(
             hierarchy=['marathon', 'group', 'add'],
-            arg_keys=['<group-resource>'],
+            arg_keys=['<group-resource>', '--plan'],
             function=_group_add),
 
         cmds.Command(
@@ -232,7 +304,7 @@ def _cmds():
 
         cmds.Command(
             hierarchy=['marathon', 'group', 'update'],
-            arg_keys=['<group-id>', '<properties>', '--force'],
+            arg_keys=['<group-id>', '<properties>', '--force', '--plan'],
             function=_group_update),
 
         cmds.Command(
@@ -358,12 +430,18 @@ def _list(json_):
     """
 
     client = marathon.create_client()
-    apps = client.get_apps()
 
     if json_:
-        emitter.publish(apps)
+        emitter.publish(client.get_apps())
     else:
-        deployments = client.get_deployments()
+        apps = client.get_apps(embed=['apps.counts', 'apps.deployments'])
+
+        # each app lists the ids of its deployments, but only
+        # v2/deployments has their actions
+        deployments = []
+        if any(app['deployments'] for app in apps):
+            deployments = client.get_deployments()
+
         table = tables.app_table(apps, deployments)
         output = str(table)
         if output:
@@ -387,10 +465,12 @@ def _group_list(json_):
     return 0
 
 
-def _group_add(group_resource):
+def _group_add(group_resource, plan):
     """
     :param group_resource: optional filename for the group resource
     :type group_resource: str
+    :param plan: print the changes instead of adding the group
+    :type plan: bool
     :returns: process return code
     :rtype: int
     """
@@ -414,6 +494,13 @@ def _group_add(group_resource):
     else:
         raise DCOSException("Group '{}' already exists".format(group_id))
 
+    if plan:
+        changes = groupdiff.diff({'id': group_id},
+                                 dict(group_resource, id=group_id))
+        for line in groupdiff.plan(changes):
+            emitter.publish(line)
+        return 0
+
     client.create_group(group_resource)
 
     return 0
@@ -490,14 +577,18 @@ def _group_show(group_id, version=None):
     return 0
 
 
-def _group_update(group_id, properties, force):
-    """
+def _group_update(group_id, properties, force, plan):
+    """Updates a group.  The changed apps and groups are computed first,
+    to print them or to skip an update that changes nothing.
+
     :param group_id: the id of the group
     :type group_id: str
     :param properties: json items used to update group
     :type properties: [str]
     :param force: whether to override running deployments
     :type force: bool
+    :param plan: print the changes instead of sending them
+    :type plan: bool
     :returns: process return code
     :rtype: int
     """
@@ -511,8 +602,32 @@ def _group_update(group_id, properties, force):
     group_resource = _parse_properties(properties, schema)
     _validate_update(current_group, group_resource, schema)
 
-    deployment = client.update_group(group_id, group_resource, force)
+    # a rollback or scaling acts on the whole group, and can't be diffed
+    if groupdiff.GROUP_DIRECTIVES.isdisjoint(group_resource):
+        # the listed apps and groups replace the group's, as with a PUT
+        # of the whole group
+        desired_group = dict(current_group)
+        desired_group.update(group_resource)
+        desired_group['id'] = current_group['id']
+
+        changes = groupdiff.diff(current_group, desired_group,
+                                 _definition_properties(schema))
 
+        if plan:
+            for line in groupdiff.plan(changes):
+                emitter.publish(line)
+            return 0
+
+        if not changes:
+            emitter.publish('Group {!r} is up to date'.format(
+                current_group['id']))
+            return 0
+    elif plan:
+        emitter.publish('update group {}: {}'.format(
+            current_group['id'], ', '.join(sorted(group_resource))))
+        return 0
+
+    deployment = client.update_group(group_id, group_resource, force)
     emitter.publish('Created deployment {}'.format(deployment))
     return 0
 
@@ -530,36 +645,15 @@ def _start(app_id, instances, force):
     :rtype: int
     """
 
-    # Check that the application exists
     client = marathon.create_client()
 
-    desc = client.get_app(app_id)
-
-    if desc['instances'] > 0:
-        emitter.publish(
-            'Application {!r} already started: {!r} instances.'.format(
-                app_id,
-                desc['instances']))
+    try:
+        deployment = _start_app(
+            client, app_id, _parse_instances(instances), force)
+    except _AppStateError as e:
+        emitter.publish(str(e))
         return 1
 
-    # Need to add the 'id' because it is required
-    app_json = {'id': app_id}
-
-    # Set instances to 1 if not specified
-    if instances is None:
-        instances = 1
-    else:
-        instances = util.parse_int(instances)
-        if instances <= 0:
-            emitter.publish(
-                'The number of instances must be positive: {!r}.'.format(
-                    instances))
-            return 1
-
-    app_json['instances'] = instances
-
-    deployment = client.update_app(app_id, app_json, force)
-
     emitter.publish('Created deployment {}'.format(deployment))
 
     return 0
@@ -576,23 +670,227 @@ def _stop(app_id, force):
     :rtype: int
     """
 
-    # Check that the application exists
     client = marathon.create_client()
 
+    try:
+        deployment = _stop_app(client, app_id, None, force)
+    except _AppStateError as e:
+        emitter.publish(str(e))
+        return 1
+
+    emitter.publish('Created deployment {}'.format(deployment))
+
+
+def _bulk(operation, app_ids, group_id, label, instances, force, json_):
+    """Applies `operation` to several applications concurrently, and
+    reports the result for each application.
+
+    :param operation: the operation to apply to each application
+    :type operation: (Client, str, int, bool) -> str
+    :param app_ids: ids of the applications
+    :type app_ids: [str]
+    :param group_id: also select the applications in this group
+    :type group_id: str
+    :param label: also select the applications with this label
+    :type label: str
+    :param instances: the number of instances to start
+    :type instances: str
+    :param force: whether to override running deployments
+    :type force: bool
+    :param json_: output json if True
+    :type json_: bool
+    :returns: process return code
+    :rtype: int
+    """
+
+    instances = _parse_instances(instances)
+
+    client = marathon.create_client()
+
+    selected = _select_apps(client, app_ids, group_id, label)
+    if not selected:
+        raise DCOSException('No applications were selected')
+
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=BULK_CONCURRENCY) as pool:
+        futures = [
+            (app_id, pool.submit(operation, client, app_id, instances, force))
+            for app_id in selected]
+
+    results = []
+    for app_id, future in futures:
+        try:
+            results.append({'id': app_id,
+                            'deploymentId': future.result(),
+                            'error': None})
+        except DCOSException as e:
+            results.append({'id': app_id,
+                            'deploymentId': None,
+                            'error': str(e)})
+
+    emitting.publish_table(emitter, results, tables.bulk_table, json_)
+
+    if any(result['error'] is not None for result in results):
+        return 1
+    return 0
+
+
+def _select_apps(client, app_ids, group_id, label):
+    """Returns the ids of the applications in `app_ids`, followed by the
+    applications that are in `group_id` and have `label`, if either is
+    set.
+
+    :param client: Marathon client
+    :type client: dcos.marathon.Client
+    :param app_ids: ids of the applications
+    :type app_ids: [str]
+    :param group_id: select the applications in this group
+    :type group_id: str
+    :param label: select the applications with this label, of the format
+                  <key> or <key>=<value>, where the value may be empty
+    :type label: str
+    :returns: absolute application ids, without duplicates
+    :rtype: [str]
+    """
+
+    selected = [_absolute_app_id(app_id) for app_id in app_ids]
+
+    if group_id is not None or label is not None:
+        prefix = '/'
+        if group_id is not None:
+            prefix = _absolute_app_id(group_id).rstrip('/') + '/'
+
+        key = value = None
+        if label is not None:
+            key, has_value, value = label.partition('=')
+            if not has_value:
+                value = None
+
+        for app in client.get_apps():
+            labels = app.get('labels') or {}
+            if not app['id'].startswith(prefix):
+                continue
+            if key is not None and (key not in labels or
+                                    (value is not None and
+                                     labels[key] != value)):
+                continue
+            selected.append(app['id'])
+
+    seen = set()
+    return [app_id for app_id in selected
+            if not (app_id in seen or seen.add(app_id))]
+
+
+def _absolute_app_id(app_id):
+    """
+    :param app_id: application id, with or without its leading slash
+    :type app_id: str
+    :returns: the application id as Marathon reports it, which the client
+              quotes in URLs
+    :rtype: str
+    """
+
+    return '/' + app_id.strip('/')
+
+
+def _parse_instances(instances):
+    """
+    :param instances: the number of instances to start, if set
+    :type instances: str
+    :returns: the number of instances to start, 1 by default
+    :rtype: int
+    """
+
+    if instances is None:
+        return 1
+
+    instances = util.parse_int(instances)
+    if instances <= 0:
+        raise DCOSException(
+            'The number of instances must be positive: {!r}.'.format(
+                instances))
+    return instances
+
+
+class _AppStateError(DCOSException):
+    """Raised when an operation does not apply to an application in its
+    current state, such as starting a running application."""
+
+
+def _start_app(client, app_id, instances, force):
+    """Starts a stopped application.
+
+    :param client: Marathon client
+    :type client: dcos.marathon.Client
+    :param app_id: the id of the application
+    :type app_id: str
+    :param instances: the number of instances to start
+    :type instances: int
+    :param force: whether to override running deployments
+    :type force: bool
+    :returns: the deployment id
+    :rtype: str
+    """
+
     desc = client.get_app(app_id)
+    if desc['instances'] > 0:
+        raise _AppStateError(
+            'Application {!r} already started: {!r} instances.'.format(
+                app_id,
+                desc['instances']))
+
+    return client.update_app(app_id,
+                             {'id': app_id, 'instances': instances},
+                             force)
+
 
+def _stop_app(client, app_id, instances, force):
+    """Stops a running application.
+
+    :param client: Marathon client
+    :type client: dcos.marathon.Client
+    :param app_id: the id of the application
+    :type app_id: str
+    :param instances: unused
+    :type instances: int
+    :param force: whether to override running deployments
+    :type force: bool
+    :returns: the deployment id
+    :rtype: str
+    """
+
+    desc = client.get_app(app_id)
     if desc['instances'] <= 0:
-        emitter.publish(
+        raise _AppStateError(
             'Application {!r} already stopped: {!r} instances.'.format(
                 app_id,
                 desc['instances']))
-        return 1
 
-    app_json = {'instances': 0}
+    return client.update_app(app_id, {'instances': 0}, force)
 
-    deployment = client.update_app(app_id, app_json, force)
 
-    emitter.publish('Created deployment {}'.format(deployment))
+def _restart_app(client, app_id, instances, force):
+    """Performs a rolling restart of a running application.
+
+    :param client: Marathon client
+    :type client: dcos.marathon.Client
+    :param app_id: the id of the application
+    :type app_id: str
+    :param instances: unused
+    :type instances: int
+    :param force: whether to override running deployments
+    :type force: bool
+    :returns: the deployment id
+    :rtype: str
+    """
+
+    desc = client.get_app(app_id)
+    if desc['instances'] <= 0:
+        raise _AppStateError(
+            'Unable to perform rolling restart of application {!r} '
+            'because it has no running tasks'.format(app_id))
+
+    return client.restart_app(app_id, force)['deploymentId']
 
 
 def _update(app_id, properties, force):
@@ -709,20 +1007,14 @@ def _restart(app_id, force):
 
     client = marathon.create_client()
 
-    desc = client.get_app(app_id)
-
-    if desc['instances'] <= 0:
-        app_id = client.normalize_app_id(app_id)
-        emitter.publish(
-            'Unable to perform rolling restart of application {!r} '
-            'because it has no running tasks'.format(
-                app_id,
-                desc['instances']))
+    try:
+        deployment = _restart_app(
+            client, _absolute_app_id(app_id), None, force)
+    except _AppStateError as e:
+        emitter.publish(str(e))
         return 1
 
-    payload = client.restart_app(app_id, force)
-
-    emitter.publish('Created deployment {}'.format(payload['deploymentId']))
+    emitter.publish('Created deployment {}'.format(deployment))
     return 0
 
 
@@ -816,18 +1108,158 @@ def _deployment_watch(deployment_id, max_count, interval):
 
     client = marathon.create_client()
 
-    count = 0
-    while max_count is None or count < max_count:
-        deployment = client.get_deployment(deployment_id)
+    _DeploymentWatch(client, deployment_id, max_count).run(interval)
+    return 0
 
-        if deployment is None:
-            return 0
 
-        emitter.publish(deployment)
-        time.sleep(interval)
-        count += 1
+class _DeploymentWatch(object):
+    """Prints a deployment, and then the fields of the deployment that
+    change, until the deployment finishes.  Changes are read from
+    Marathon's event stream.  If the stream isn't available, the
+    deployment is polled instead, backing off while it doesn't change.
 
-    return 0
+    :param client: Marathon client
+    :type client: dcos.marathon.Client
+    :param deployment_id: the deployment id
+    :type deployment_id: str
+    :param max_count: maximum number of updates to print
+    :type max_count: int
+    """
+
+    def __init__(self, client, deployment_id, max_count):
+        self._client = client
+        self._deployment_id = deployment_id
+        self._max_count = max_count
+        self._count = 0
+        self._deployment = None
+
+    def run(self, interval):
+        """
+        :param interval: seconds between polls, when polling
+        :type interval: int
+        :rtype: None
+        """
+
+        while True:
+            try:
+                events = self._client.get_events(DEPLOYMENT_EVENTS)
+            except DCOSException as e:
+                logger.info('Polling deployment: %s', e)
+                return self._poll(interval)
+
+            # subscribed first, so that no change is missed
+            if not self._refresh():
+                events.close()
+                return None
+
+            received = False
+            try:
+                for event in events:
+                    received = True
+                    if not self._apply(event):
+                        return None
+            except DCOSException as e:
+                # the stream broke or went quiet.  the deployment is
+                # checked again once the stream is reopened.
+                logger.info('Reopening event stream: %s', e)
+            else:
+                if not received:
+                    logger.info('Event stream closed without any events')
+                    return self._poll(interval)
+            finally:
+                events.close()
+
+    def _poll(self, interval):
+        """
+        :param interval: seconds between polls while the deployment changes
+        :type interval: int
+        :rtype: None
+        """
+
+        wait = interval
+        while True:
+            previous = self._deployment
+            if not self._refresh():
+                return None
+
+            if self._deployment == previous:
+                wait = min(wait * 2, interval * WATCH_MAX_BACKOFF)
+            else:
+                wait = interval
+            time.sleep(wait)
+
+    def _refresh(self):
+        """Fetches the deployment and prints its changes.
+
+        :returns: False once the deployment is gone or enough updates
+                  were printed; True otherwise
+        :rtype: bool
+        """
+
+        deployment = self._client.get_deployment(self._deployment_id)
+        if deployment is None:
+            return False
+        return self._publish(deployment)
+
+    def _apply(self, event):
+        """Applies a deployment event and prints the changes.
+
+        :param event: Marathon deployment event
+        :type event: dict
+        :returns: False once the deployment finished or enough updates
+                  were printed; True otherwise
+        :rtype: bool
+        """
+
+        plan = event.get('plan', {})
+        if plan.get('id') != self._deployment_id:
+            return True
+
+        deployment = dict(self._deployment)
+        event_type = event['eventType']
+        if event_type == 'deployment_success':
+            deployment['status'] = 'succeeded'
+        elif event_type == 'deployment_failed':
+            deployment['status'] = 'failed'
+        elif event_type == 'deployment_step_failure':
+            deployment['status'] = 'step failed'
+
+        step = event.get('currentStep')
+        if step is not None:
+            deployment['currentActions'] = [
+                {'action': action.get('action', action.get('type')),
+                 'app': action['app']}
+                for action in step['actions']]
+            if step in plan.get('steps', []):
+                deployment['currentStep'] = plan['steps'].index(step) + 1
+
+        published = self._publish(deployment)
+        return published and event_type not in ('deployment_success',
+                                                'deployment_failed')
+
+    def _publish(self, deployment):
+        """Prints the fields of `deployment` that changed since the last
+        update.  The first update prints the whole deployment.
+
+        :param deployment: the deployment's current state
+        :type deployment: dict
+        :returns: False once enough updates were printed; True otherwise
+        :rtype: bool
+        """
+
+        if self._deployment is None:
+            delta = deployment
+        else:
+            delta = {key: value for key, value in deployment.items()
+                     if self._deployment.get(key) != value}
+            if delta:
+                delta['id'] = deployment['id']
+        self._deployment = deployment
+
+        if delta:
+            emitter.publish(delta)
+            self._count += 1
+        return self._max_count is None or self._count < self._max_count
 
 
 def _task_list(app_id, json_):
@@ -906,10 +1338,21 @@ def _cli_config_schema():
     :returns: schema for marathon cli config
     :rtype: dict
     """
-    return json.loads(
-        pkg_resources.resource_string(
-            'dcoscli',
-            'data/config-schema/marathon.json').decode('utf-8'))
+    return util.load_resource_json('dcoscli',
+                                   'data/config-schema/marathon.json')
+
+
+def _definition_properties(schema):
+    """
+    :param schema: schema for marathon data, as returned by _data_schema
+    :type schema: dict
+    :returns: the names of the properties that a group or app definition
+              can set
+    :rtype: set of str
+    """
+
+    return (set(schema['properties']) |
+            set(schema['definitions']['app']['properties']))
 
 
 def _data_schema():
@@ -917,10 +1360,8 @@ def _data_schema():
     :returns: schema for marathon data
     :rtype: dict
     """
-    return json.loads(
-        pkg_resources.resource_string(
-            'dcoscli',
-            'data/marathon-group-schema.json').decode('utf-8'))
+    return util.load_resource_json('dcoscli',
+                                   'data/marathon-group-schema.json')
 
 
 def _app_schema():
@@ -929,3 +1370,93 @@ def _app_schema():
     :rtype: dict
     """
     return _data_schema()['definitions']['app']
+
+
+def _task_kill(task_ids, app_id, host, scale, json_):
+    """Kills tasks, in batches.
+
+    :param task_ids: ids or shell-style patterns of the tasks to kill
+    :type task_ids: [str]
+    :param app_id: select the tasks of this application
+    :type app_id: str
+    :param host: select the tasks running on this host
+    :type host: str
+    :param scale: whether to scale down the apps of the killed tasks
+    :type scale: bool
+    :param json_: output json if True
+    :type json_: bool
+    :returns: process return code
+    :rtype: int
+    """
+
+    client = marathon.create_client()
+
+    selected = _select_tasks(client, task_ids, app_id, host)
+    if not selected:
+        raise DCOSException('No tasks were selected')
+
+    result = client.kill_tasks(selected, scale)
+
+    if json_:
+        emitter.publish(result)
+    else:
+        for task in result['tasks']:
+            emitter.publish('Killed task {}'.format(task['id']))
+        for deployment in result['deploymentIds']:
+            emitter.publish('Created deployment {}'.format(deployment))
+
+    return 0
+
+
+def _select_tasks(client, task_ids, app_id, host):
+    """Returns the ids of the tasks to kill.  An application or a host
+    narrows the selection: only the given tasks, or every task if none
+    are given, of that application and on that host are selected.
+    Otherwise, plain task ids are used as-is.  Tasks are only listed if
+    patterns, an application or a host are given, and a single
+    application's tasks are listed if possible.
+
+    :param client: Marathon client
+    :type client: dcos.marathon.Client
+    :param task_ids: ids or shell-style patterns of the tasks
+    :type task_ids: [str]
+    :param app_id: select only the tasks of this application
+    :type app_id: str
+    :param host: select only the tasks running on this host
+    :type host: str
+    :returns: task ids, without duplicates
+    :rtype: [str]
+    """
+
+    narrowed = app_id is not None or host is not None
+    patterns = [task_id for task_id in task_ids
+                if any(char in task_id for char in '*?[')]
+    if not (narrowed or patterns):
+        return _unique(task_ids)
+
+    # without an application or a host, plain ids are used as-is;
+    # a plain id only matches itself as a pattern
+    selected = [] if narrowed else [task_id for task_id in task_ids
+                                    if task_id not in patterns]
+    for task in client.get_tasks(app_id):
+        if host is not None and task.get('host') != host:
+            continue
+        if task_ids and not any(fnmatch.fnmatchcase(task['id'], task_id)
+                                for task_id in task_ids):
+            continue
+        selected.append(task['id'])
+
+    return _unique(selected)
+
+
+def _unique(task_ids):
+    """
+    :param task_ids: task ids
+    :type task_ids: [str]
+    :returns: the task ids in order, without duplicates
+    :rtype: [str]
+    """
+
+    seen = set()
+    return [task_id for task_id in task_ids
+            if not (task_id in seen or seen.add(task_id))]
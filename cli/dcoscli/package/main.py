@@ -44,13 +44,11 @@ Configuration:
       "git://github.com/mesosphere/universe.git"
     ]
 """
-import json
 import os
 import sys
 
 import dcoscli
 import docopt
-import pkg_resources
 from dcos import cmds, emitting, marathon, options, package, subcommand, util
 from dcos.errors import DCOSException
 from dcoscli import tables
@@ -139,10 +137,8 @@ def _package(config_schema, info):
     """
 
     if config_schema:
-        schema = json.loads(
-            pkg_resources.resource_string(
-                'dcoscli',
-                'data/config-schema/package.json').decode('utf-8'))
+        schema = util.load_resource_json('dcoscli',
+                                         'data/config-schema/package.json')
         emitter.publish(schema)
     elif info:
         _info()
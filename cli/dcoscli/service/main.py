@@ -85,6 +85,13 @@ def _info():
     return 0
 
 
+SERVICE_TABLE_STATE_PATHS = [
+    'frameworks[].{id,name,hostname,active,resources}',
+    'frameworks[].tasks[].id',
+]
+"""Parts of the master's state.json used by the service table."""
+
+
 # TODO (mgummelt): support listing completed services as well.
 # blocked on framework shutdown.
 def _service(inactive, is_json):
@@ -99,7 +106,10 @@ def _service(inactive, is_json):
     :rtype: int
     """
 
-    services = mesos.get_master().frameworks(inactive=inactive)
+    # the table only needs a few fields of each framework, so don't
+    # build the rest of state.json
+    paths = None if is_json else SERVICE_TABLE_STATE_PATHS
+    services = mesos.get_master(paths).frameworks(inactive=inactive)
 
     if is_json:
         emitter.publish([service.dict() for service in services])
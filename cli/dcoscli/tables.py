@@ -45,9 +45,13 @@ def app_table(apps, deployments):
     :rtype: PrettyTable
     """
 
-    deployment_map = {}
+    # (deployment id, app id) -> displayed actions
+    deployment_actions = {}
     for deployment in deployments:
-        deployment_map[deployment['id']] = deployment
+        for action in deployment['currentActions']:
+            key = (deployment['id'], action['app'])
+            deployment_actions.setdefault(key, []).append(
+                DEPLOYMENT_DISPLAY[action['action']])
 
     def get_cmd(app):
         if app["cmd"] is not None:
@@ -74,11 +78,7 @@ def app_table(apps, deployments):
 
         actions = []
         for deployment_id in deployment_ids:
-            deployment = deployment_map.get(deployment_id)
-            if deployment:
-                for action in deployment['currentActions']:
-                    if action['app'] == app['id']:
-                        actions.append(DEPLOYMENT_DISPLAY[action['action']])
+            actions += deployment_actions.get((deployment_id, app['id']), [])
 
         if len(actions) == 0:
             return EMPTY_ENTRY
@@ -106,6 +106,28 @@ def app_table(apps, deployments):
     return tb
 
 
+def bulk_table(results):
+    """Returns a PrettyTable representation of the results of a bulk
+    application operation.
+
+    :param results: the result for each application
+    :type results: [dict]
+    :rtype: PrettyTable
+    """
+
+    fields = OrderedDict([
+        ('ID', lambda r: r['id']),
+        ('DEPLOYMENT', lambda r: r['deploymentId'] or EMPTY_ENTRY),
+        ('ERROR', lambda r: r['error'] or EMPTY_ENTRY),
+    ])
+
+    tb = util.table(fields, results, sortby='ID')
+    tb.align['ID'] = 'l'
+    tb.align['ERROR'] = 'l'
+
+    return tb
+
+
 def app_task_table(tasks):
     """Returns a PrettyTable representation of the provided marathon tasks.
 
@@ -22,14 +22,18 @@ Positional Arguments:
     <file>        Output this file. [default: stdout]
 """
 
+import collections
 import functools
+import heapq
+import itertools
+import random
 import sys
 import time
 
 import concurrent.futures
 import dcoscli
 import docopt
-from dcos import cmds, emitting, mesos, util
+from dcos import cmds, emitting, http, mesos, util
 from dcos.errors import DCOSException, DefaultError
 from dcoscli import tables
 
@@ -91,6 +95,22 @@ def _info():
     return 0
 
 
+TASK_TABLE_STATE_PATHS = [
+    'frameworks[].{id,user,active}',
+    'frameworks[].tasks[].{id,name,state,slave_id,framework_id}',
+    'slaves[].{id,hostname}',
+]
+"""Parts of the master's state.json used by the task table."""
+
+TASK_TABLE_COMPLETED_STATE_PATHS = [
+    'frameworks[].completed_tasks[].{id,name,state,slave_id,framework_id}',
+    'completed_frameworks[].{id,user,active}',
+    'completed_frameworks[].completed_tasks[].'
+    '{id,name,state,slave_id,framework_id}',
+]
+"""Parts of the master's state.json used by the completed task table."""
+
+
 def _task(fltr, completed, json_):
     """List DCOS tasks
 
@@ -107,8 +127,17 @@ def _task(fltr, completed, json_):
     if fltr is None:
         fltr = ""
 
-    tasks = sorted(mesos.get_master().tasks(completed=completed, fltr=fltr),
-                   key=lambda task: task['name'])
+    # the table only needs a few fields of each task, so don't build
+    # the rest of state.json
+    paths = None
+    if not json_:
+        paths = TASK_TABLE_STATE_PATHS
+        if completed:
+            paths = paths + TASK_TABLE_COMPLETED_STATE_PATHS
+
+    tasks = sorted(
+        mesos.get_master(paths).tasks(completed=completed, fltr=fltr),
+        key=lambda task: task['name'])
 
     if json_:
         emitter.publish([task.dict() for task in tasks])
@@ -156,23 +185,15 @@ def _log(follow, completed, lines, task, path):
         raise DCOSException('No matching tasks. Exiting.')
 
     fn = functools.partial(_read_last_lines, lines)
-    curr_header, mesos_files = _stream_files(None, fn, mesos_files)
-    if not mesos_files:
-        raise NO_FILE_EXCEPTION
-
-    while follow:
-        # This flush is needed only for testing, since stdout is fully
-        # buffered (as opposed to line-buffered) when redirected to a
-        # pipe.  So if we don't flush, our --follow tests, which use a
-        # pipe, never see the data
-        sys.stdout.flush()
-
-        curr_header, mesos_files = _stream_files(curr_header,
-                                                 _read_rest,
-                                                 mesos_files)
+
+    # a single pool serves the initial read and the whole follow session
+    with _stream_pool() as pool:
+        curr_header, mesos_files = _stream_files(None, fn, mesos_files, pool)
         if not mesos_files:
             raise NO_FILE_EXCEPTION
-        time.sleep(1)
+
+        if follow:
+            _FollowScheduler(mesos_files, pool).run(curr_header)
 
     return 0
 
@@ -201,7 +222,7 @@ def _mesos_files(completed, fltr, path):
     tasks = master.tasks(completed=completed, fltr=fltr)
 
     # load slave state in parallel
-    slaves = _load_slaves_state([task.slave() for task in tasks])
+    slaves = set(_load_slaves_state({task.slave() for task in tasks}))
 
     # some completed tasks may have entries on the master, but none on
     # the slave.  since we need the slave entry to get the executor
@@ -237,7 +258,7 @@ def _load_slaves_state(slaves):
     return reachable_slaves
 
 
-def _stream_files(curr_header, fn, mesos_files):
+def _stream_files(curr_header, fn, mesos_files, pool=None):
     """Apply `fn` in parallel to each file in `mesos_files`.  `fn` must
     return a list of strings, and these strings are then printed
     serially as separate lines.
@@ -255,6 +276,8 @@ def _stream_files(curr_header, fn, mesos_files):
     :type fn: MesosFile -> [str]
     :param mesos_files: files to read
     :type mesos_files: [MesosFile]
+    :param pool: pool to run `fn` in.  If None, a new pool is used.
+    :type pool: concurrent.futures.Executor
     :returns: Returns the most recently printed header, and a list of
         files that are still reachable.  Once we detect a file is
         unreachable, we stop trying to read from it.
@@ -264,7 +287,7 @@ def _stream_files(curr_header, fn, mesos_files):
     reachable_files = list(mesos_files)
 
     # TODO switch to map
-    for job, mesos_file in _stream(fn, mesos_files):
+    for job, mesos_file in _stream(fn, mesos_files, pool):
         try:
             lines = job.result()
         except DCOSException as e:
@@ -312,7 +335,19 @@ def _output(curr_header, output_header, header, lines):
 STREAM_CONCURRENCY = 20
 
 
-def _stream(fn, objs):
+def _stream_pool():
+    """Returns a thread pool for reading from slaves, and makes sure each
+    of its workers can keep its connection alive.
+
+    :returns: thread pool
+    :rtype: concurrent.futures.ThreadPoolExecutor
+    """
+
+    http.ensure_pool_maxsize(STREAM_CONCURRENCY)
+    return concurrent.futures.ThreadPoolExecutor(STREAM_CONCURRENCY)
+
+
+def _stream(fn, objs, pool=None):
     """Apply `fn` to `objs` in parallel, yielding the (Future, obj) for
     each as it completes.
 
@@ -320,15 +355,196 @@ def _stream(fn, objs):
     :type fn: function
     :param objs: objs
     :type objs: objs
+    :param pool: pool to run `fn` in.  If None, a new pool is used.
+    :type pool: concurrent.futures.Executor
     :returns: iterator over (Future, typeof(obj))
     :rtype: iterator over (Future, typeof(obj))
 
     """
 
-    with concurrent.futures.ThreadPoolExecutor(STREAM_CONCURRENCY) as pool:
-        jobs = {pool.submit(fn, obj): obj for obj in objs}
-        for job in concurrent.futures.as_completed(jobs):
-            yield job, jobs[job]
+    if pool is None:
+        with _stream_pool() as pool:
+            for job, obj in _stream(fn, objs, pool):
+                yield job, obj
+        return
+
+    jobs = {pool.submit(fn, obj): obj for obj in objs}
+    for job in concurrent.futures.as_completed(jobs):
+        yield job, jobs[job]
+
+
+# In follow mode, a file that returned data is polled again after
+# FOLLOW_MIN_INTERVAL seconds.  Each poll that returns nothing multiplies
+# the file's interval by FOLLOW_BACKOFF, up to FOLLOW_MAX_INTERVAL.
+# Intervals are randomized by +/- FOLLOW_JITTER so that files don't poll
+# in lockstep.
+FOLLOW_MIN_INTERVAL = 1.0
+FOLLOW_MAX_INTERVAL = 10.0
+FOLLOW_BACKOFF = 2.0
+FOLLOW_JITTER = 0.1
+
+# Maximum number of concurrent reads against a single slave
+FOLLOW_SLAVE_CONCURRENCY = 4
+
+
+class _FollowScheduler(object):
+    """Polls files for new data for the rest of a `dcos task log
+    --follow` session, using a long-lived pool.  Each file is polled on
+    its own adaptive schedule, and reads are capped per slave.
+
+    :param mesos_files: files to follow
+    :type mesos_files: [MesosFile]
+    :param pool: pool to read the files in
+    :type pool: concurrent.futures.Executor
+    """
+
+    def __init__(self, mesos_files, pool):
+        self._pool = pool
+        self._files = list(mesos_files)
+        self._intervals = {}  # file -> current poll interval
+        self._queue = []  # heap of (poll time, sequence number, file)
+        self._sequence = itertools.count()
+        self._running = {}  # future -> file
+        self._in_flight = collections.Counter()  # slave id -> reads
+        self._waiting = collections.defaultdict(collections.deque)
+
+        now = time.time()
+        for mesos_file in self._files:
+            self._intervals[mesos_file] = FOLLOW_MIN_INTERVAL
+            self._schedule(mesos_file, now)
+
+    def run(self, curr_header):
+        """Prints new lines as they are read.  Only returns by raising
+        an exception once no file is reachable.
+
+        :param curr_header: most recently printed header
+        :type curr_header: str
+        :rtype: None
+        """
+
+        while True:
+            # This flush is needed only for testing, since stdout is fully
+            # buffered (as opposed to line-buffered) when redirected to a
+            # pipe.  So if we don't flush, our --follow tests, which use a
+            # pipe, never see the data
+            sys.stdout.flush()
+
+            self._submit_due()
+
+            timeout = None
+            if self._queue:
+                timeout = max(self._queue[0][0] - time.time(), 0)
+
+            if not self._running:
+                time.sleep(timeout)
+                continue
+
+            done, _ = concurrent.futures.wait(
+                list(self._running),
+                timeout=timeout,
+                return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for job in done:
+                curr_header = self._complete(job, curr_header)
+
+            if not self._files:
+                raise NO_FILE_EXCEPTION
+
+    def _schedule(self, mesos_file, now):
+        """Queues the next poll of `mesos_file`
+
+        :param mesos_file: file to poll
+        :type mesos_file: MesosFile
+        :param now: current time
+        :type now: float
+        :rtype: None
+        """
+
+        jitter = random.uniform(1 - FOLLOW_JITTER, 1 + FOLLOW_JITTER)
+        when = now + self._intervals[mesos_file] * jitter
+        heapq.heappush(self._queue,
+                       (when, next(self._sequence), mesos_file))
+
+    def _submit_due(self):
+        """Starts reading every file whose poll time has come, unless its
+        slave already has FOLLOW_SLAVE_CONCURRENCY reads in flight, in
+        which case it waits for one of them to complete.
+
+        :rtype: None
+        """
+
+        now = time.time()
+        while self._queue and self._queue[0][0] <= now:
+            mesos_file = heapq.heappop(self._queue)[2]
+
+            slave_id = _slave_id(mesos_file)
+            if self._in_flight[slave_id] >= FOLLOW_SLAVE_CONCURRENCY:
+                self._waiting[slave_id].append(mesos_file)
+            else:
+                self._submit(mesos_file)
+
+    def _submit(self, mesos_file):
+        """Starts reading `mesos_file`
+
+        :param mesos_file: file to read
+        :type mesos_file: MesosFile
+        :rtype: None
+        """
+
+        self._in_flight[_slave_id(mesos_file)] += 1
+        self._running[self._pool.submit(_read_rest, mesos_file)] = mesos_file
+
+    def _complete(self, job, curr_header):
+        """Prints the lines read by `job`, and schedules the file's next
+        poll.  Stops following the file if it couldn't be read.
+
+        :param job: completed read
+        :type job: concurrent.futures.Future
+        :param curr_header: most recently printed header
+        :type curr_header: str
+        :returns: the most recently printed header
+        :rtype: str
+        """
+
+        mesos_file = self._running.pop(job)
+        slave_id = _slave_id(mesos_file)
+        self._in_flight[slave_id] -= 1
+
+        try:
+            lines = job.result()
+        except DCOSException as e:
+            # See _stream_files
+            logger.warning("Error reading file: {}".format(e))
+            self._files.remove(mesos_file)
+        else:
+            curr_header = _output(curr_header,
+                                  len(self._files) > 1,
+                                  str(mesos_file),
+                                  lines)
+
+            if lines:
+                interval = FOLLOW_MIN_INTERVAL
+            else:
+                interval = min(self._intervals[mesos_file] * FOLLOW_BACKOFF,
+                               FOLLOW_MAX_INTERVAL)
+            self._intervals[mesos_file] = interval
+            self._schedule(mesos_file, time.time())
+
+        if self._waiting[slave_id]:
+            self._submit(self._waiting[slave_id].popleft())
+
+        return curr_header
+
+
+def _slave_id(mesos_file):
+    """
+    :param mesos_file: file
+    :type mesos_file: MesosFile
+    :returns: id of the slave that holds `mesos_file`
+    :rtype: str
+    """
+
+    return mesos_file.task()['slave_id']
 
 
 # A liberal estimate of a line size.  Used to estimate how much data
@@ -348,35 +564,65 @@ def _read_last_lines(num_lines, mesos_file):
     :rtype: [str]
     """
 
-    file_size = mesos_file.size()
+    lines, fetched = _tail(num_lines, mesos_file)
+    logger.debug('Read the last {0} lines of {1}: fetched {2} bytes'.format(
+        len(lines), mesos_file, fetched))
+    return _decode_lines(lines)
 
-    # estimate how much data we need to fetch to read `num_lines`.
-    fetch_size = LINE_SIZE * num_lines
 
-    end = file_size
-    start = max(file_size - fetch_size, 0)
-    data = ''
-    while True:
-        # fetch data
-        mesos_file.seek(start)
-        data = mesos_file.read(end - start) + data
+def _tail(num_lines, mesos_file):
+    """Scans a file backwards from EOF until it has seen `num_lines`
+    lines, or reached the beginning of the file.  The scan window starts
+    at an estimate of `num_lines` lines and doubles on every step.
+    Newlines are counted per fetched chunk, and the chunks are joined
+    only once, at the end.  Seeks to EOF.
 
-        # break if we have enough lines
-        data_tmp = _strip_trailing_newline(data)
-        lines = data_tmp.split('\n')
-        if len(lines) > num_lines:
-            ret = lines[-num_lines:]
-            break
-        elif start == 0:
-            ret = lines
-            break
+    :param num_lines: number of lines to read
+    :type num_lines: int
+    :param mesos_file: file to read
+    :type mesos_file: MesosFile
+    :returns: the lines read, and the number of bytes fetched
+    :rtype: ([bytes], int)
+    """
 
-        # otherwise shift our read window and repeat
+    file_size = mesos_file.size()
+    if num_lines <= 0:
+        mesos_file.seek(file_size)
+        return [], 0
+
+    chunks = []  # most recent chunk first
+    fetched = 0
+    newlines = 0
+    trailing_newline = 0
+
+    window = LINE_SIZE * num_lines
+    start = file_size
+    while start > 0:
         end = start
-        start = max(file_size - fetch_size, 0)
+        start = max(end - window, 0)
+
+        mesos_file.seek(start)
+        chunk = mesos_file.read(end - start)
+        if not chunks and chunk.endswith(b'\n'):
+            # the newline ending the last line doesn't start a new one
+            trailing_newline = 1
+
+        chunks.append(chunk)
+        fetched += len(chunk)
+        newlines += chunk.count(b'\n')
+
+        # `num_lines` newlines before the end mean that the last
+        # `num_lines` lines have been read completely
+        if newlines - trailing_newline >= num_lines:
+            break
+
+        window *= 2
+
+    chunks.reverse()
+    data = _strip_trailing_newline(b''.join(chunks))
 
     mesos_file.seek(file_size)
-    return ret
+    return data.split(b'\n')[-num_lines:], fetched
 
 
 def _read_rest(mesos_file):
@@ -388,24 +634,35 @@ def _read_rest(mesos_file):
     :rtype: [str]
     """
     data = mesos_file.read()
-    if data == '':
+    if data == b'':
         return []
     else:
         data_tmp = _strip_trailing_newline(data)
-        return data_tmp.split('\n')
+        return _decode_lines(data_tmp.split(b'\n'))
+
+
+def _decode_lines(lines):
+    """Decodes lines read from a MesosFile.  Invalid UTF-8, e.g. a
+    character cut in half by the start of a read, is replaced rather
+    than raised.
+
+    :param lines: lines to decode
+    :type lines: [bytes]
+    :returns: decoded lines
+    :rtype: [str]
+    """
+
+    return [line.decode('utf-8', 'replace') for line in lines]
 
 
 def _strip_trailing_newline(s):
-    """Returns a modified version of the string with the last character
+    """Returns a modified version of the data with the last byte
     truncated if it's a newline.
 
-    :param s: string to trim
-    :type s: str
-    :returns: modified string
-    :rtype: str
+    :param s: data to trim
+    :type s: bytes
+    :returns: modified data
+    :rtype: bytes
     """
 
-    if s == "":
-        return s
-    else:
-        return s[:-1] if s[-1] == '\n' else s
+    return s[:-1] if s.endswith(b'\n') else s
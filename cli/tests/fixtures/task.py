@@ -1,6 +1,4 @@
-from dcos.mesos import Slave, Task
-
-import mock
+from dcos.mesos import Master
 
 
 def task_fixture():
@@ -9,7 +7,7 @@ def task_fixture():
     :rtype: Task
     """
 
-    task = Task({
+    task = {
         "executor_id": "",
         "framework_id": "20150502-231327-16842879-5050-3889-0000",
         "id": "test-app.d44dd7f2-f9b7-11e4-bb43-56847afe9799",
@@ -29,9 +27,18 @@ def task_fixture():
                 "timestamp": 1431552866.52692
             }
         ]
-    }, None)
+    }
 
-    task.user = mock.Mock(return_value='root')
-    slave = Slave({"hostname": "mock-hostname"}, None, None)
-    task.slave = mock.Mock(return_value=slave)
-    return task
+    master = Master({
+        "frameworks": [{
+            "id": task["framework_id"],
+            "user": "root",
+            "active": True,
+            "tasks": [task],
+        }],
+        "slaves": [{
+            "id": task["slave_id"],
+            "hostname": "mock-hostname",
+        }],
+    })
+    return master.task(task["id"])
@@ -19,6 +19,12 @@ Usage:
     dcos marathon --info
     dcos marathon about
     dcos marathon app add [<app-resource>]
+    dcos marathon app bulk start [--force --json --instances=<instances>]
+         [--group=<group-id> --label=<label>] [<app-ids>...]
+    dcos marathon app bulk stop [--force --json]
+         [--group=<group-id> --label=<label>] [<app-ids>...]
+    dcos marathon app bulk restart [--force --json]
+         [--group=<group-id> --label=<label>] [<app-ids>...]
     dcos marathon app list [--json]
     dcos marathon app remove [--force] <app-id>
     dcos marathon app restart [--force] <app-id>
@@ -32,13 +38,15 @@ Usage:
     dcos marathon deployment stop <deployment-id>
     dcos marathon deployment watch [--max-count=<max-count>]
          [--interval=<interval>] <deployment-id>
+    dcos marathon task kill [--scale --json] [--app=<app-id> --host=<host>]
+         [<task-ids>...]
     dcos marathon task list [--json <app-id>]
     dcos marathon task show <task-id>
-    dcos marathon group add [<group-resource>]
+    dcos marathon group add [--plan] [<group-resource>]
     dcos marathon group list [--json]
     dcos marathon group show [--group-version=<group-version>] <group-id>
     dcos marathon group remove [--force] <group-id>
-    dcos marathon group update [--force] <group-id> [<properties>...]
+    dcos marathon group update [--force --plan] <group-id> [<properties>...]
 
 Options:
     -h, --help                       Show this screen
@@ -82,9 +90,31 @@ Options:
 
     --interval=<interval>            Number of seconds to wait between actions
 
+    --group=<group-id>               Select the applications in this group and
+                                     its subgroups
+
+    --label=<label>                  Select the applications that have this
+                                     label. Must be of the format <key> or
+                                     <key>=<value>
+
+    --instances=<instances>          The number of instances to start. Defaults
+                                     to 1
+
+    --app=<app-id>                   Select the tasks of this application
+
+    --host=<host>                    Select the tasks running on this host
+
+    --scale                          Scale down the applications of the killed
+                                     tasks instead of replacing the tasks
+
+    --plan                           Print the application and group changes
+                                     without sending them
+
 Positional Arguments:
     <app-id>                    The application id
 
+    <app-ids>                   The ids of the applications to operate on
+
     <app-resource>              Path to a file containing the app's JSON
                                 definition. If omitted, the definition is read
                                 from stdin. For a detailed description see
@@ -108,6 +138,9 @@ Positional Arguments:
                                 stdin.
 
     <task-id>                   The task id
+
+    <task-ids>                  The ids of the tasks to kill. May contain
+                                shell-style wildcards, e.g. 'web.*'
 """
     assert_command(['dcos', 'marathon', '--help'],
                    stdout=stdout)
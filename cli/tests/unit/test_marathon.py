@@ -0,0 +1,255 @@
+from dcos.errors import DCOSException
+from dcoscli.marathon import main
+
+import pytest
+
+
+def _deployment(step, actions):
+    return {'id': 'd1', 'totalSteps': 2, 'currentStep': step,
+            'currentActions': actions}
+
+
+class _Events(list):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class _Client(object):
+    def __init__(self, deployments, events=None):
+        self.deployments = deployments
+        self.events = events
+
+    def get_deployment(self, deployment_id):
+        return self.deployments.pop(0)
+
+    def get_events(self, event_types):
+        if self.events is None:
+            raise DCOSException('no event stream')
+        return self.events
+
+
+@pytest.fixture
+def published(monkeypatch):
+    published = []
+    monkeypatch.setattr(main.emitter, 'publish', published.append)
+    return published
+
+
+def test_watch_prints_event_deltas(published):
+    start = {'action': 'StartApplication', 'app': '/a'}
+    scale = {'action': 'ScaleApplication', 'app': '/a'}
+    plan = {'id': 'd1', 'steps': [{'actions': [start]},
+                                  {'actions': [scale]}]}
+    events = _Events([
+        {'eventType': 'deployment_info', 'plan': {'id': 'other'},
+         'currentStep': {'actions': []}},
+        {'eventType': 'deployment_info', 'plan': plan,
+         'currentStep': {'actions': [scale]}},
+        {'eventType': 'deployment_success', 'plan': plan},
+    ])
+    client = _Client([_deployment(1, [start])], events)
+
+    main._DeploymentWatch(client, 'd1', None).run(1)
+
+    assert published == [
+        _deployment(1, [start]),
+        {'id': 'd1', 'currentStep': 2, 'currentActions': [scale]},
+        {'id': 'd1', 'status': 'succeeded'},
+    ]
+    assert events.closed
+
+
+def test_watch_polls_without_event_stream(published, monkeypatch):
+    waits = []
+    monkeypatch.setattr(main.time, 'sleep', waits.append)
+
+    first = _deployment(1, [])
+    second = _deployment(2, [])
+    client = _Client([first, first, first, second, None])
+
+    main._DeploymentWatch(client, 'd1', None).run(1)
+
+    assert published == [first, {'id': 'd1', 'currentStep': 2}]
+    assert waits == [1, 2, 4, 1]
+
+
+def test_watch_max_count(published, monkeypatch):
+    monkeypatch.setattr(main.time, 'sleep', lambda seconds: None)
+    client = _Client([_deployment(1, []), _deployment(2, [])])
+
+    main._DeploymentWatch(client, 'd1', 1).run(1)
+
+    assert len(published) == 1
+
+
+class _AppsClient(object):
+    def __init__(self, apps):
+        self.apps = dict((app['id'], app) for app in apps)
+        self.updates = []
+
+    def normalize_app_id(self, app_id):
+        return main.marathon.Client.normalize_app_id(self, app_id)
+
+    def get_apps(self):
+        return list(self.apps.values())
+
+    def get_app(self, app_id):
+        # the id is quoted in the URL, and unquoted by Marathon
+        app_id = main.marathon.urllib.parse.unquote(
+            self.normalize_app_id(app_id))
+        if app_id not in self.apps:
+            raise DCOSException('No application {!r}'.format(app_id))
+        return self.apps[app_id]
+
+    def update_app(self, app_id, payload, force):
+        self.updates.append((app_id, payload['instances']))
+        return 'deploy' + app_id
+
+
+def _apps():
+    return [
+        {'id': '/web/a', 'instances': 0, 'labels': {'tier': 'front'}},
+        {'id': '/web/b', 'instances': 2, 'labels': {'tier': 'back'}},
+        {'id': '/webby', 'instances': 0, 'labels': {'tier': 'front'}},
+        {'id': '/db', 'instances': 0},
+        {'id': '/web/c d', 'instances': 1, 'labels': {'tier': ''}},
+    ]
+
+
+def test_select_apps():
+    client = _AppsClient(_apps())
+
+    assert main._select_apps(client, ['db'], 'web', None) == \
+        ['/db', '/web/a', '/web/b', '/web/c d']
+    assert sorted(main._select_apps(client, [], None, 'tier=front')) == \
+        ['/web/a', '/webby']
+    assert main._select_apps(client, ['web/a'], '/web/', 'tier') == \
+        ['/web/a', '/web/b', '/web/c d']
+
+
+def test_select_apps_compares_unquoted_ids():
+    client = _AppsClient(_apps())
+
+    assert main._select_apps(client, ['web/c d/'], 'web', 'tier=') == \
+        ['/web/c d']
+
+
+def test_single_app_commands_share_bulk_operations(monkeypatch, published):
+    client = _AppsClient(_apps())
+    monkeypatch.setattr(main.marathon, 'create_client', lambda: client)
+
+    assert main._start('web/b', None, False) == 1
+    assert published == ["Application 'web/b' already started: 2 instances."]
+
+    assert main._start('db', '2', False) == 0
+    assert client.updates == [('db', 2)]
+
+
+def test_bulk_reports_per_app_results(monkeypatch, published):
+    client = _AppsClient(_apps())
+    monkeypatch.setattr(main.marathon, 'create_client', lambda: client)
+
+    assert main._bulk(main._start_app, ['web/b', 'missing'], 'web', None,
+                      '3', False, True) == 1
+
+    assert client.updates == [('/web/a', 3)]
+    results = dict((r['id'], r) for r in published[0])
+    assert results['/web/a']['deploymentId'] == 'deploy/web/a'
+    assert 'already started' in results['/web/b']['error']
+    assert 'No application' in results['/missing']['error']
+
+
+def test_bulk_requires_a_selection(monkeypatch):
+    monkeypatch.setattr(main.marathon, 'create_client',
+                        lambda: _AppsClient(_apps()))
+
+    with pytest.raises(DCOSException):
+        main._bulk(main._stop_app, [], 'none', None, None, False, False)
+
+
+class _TasksClient(object):
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.listed = []
+
+    def get_tasks(self, app_id):
+        self.listed.append(app_id)
+        return [task for task in self.tasks
+                if app_id is None or task['appId'] == app_id]
+
+
+def test_select_tasks():
+    client = _TasksClient([
+        {'id': 'web.1', 'appId': '/web', 'host': 'h1'},
+        {'id': 'web.2', 'appId': '/web', 'host': 'h2'},
+        {'id': 'db.1', 'appId': '/db', 'host': 'h1'},
+    ])
+
+    assert main._select_tasks(client, ['x.1', 'y.2'], None, None) == \
+        ['x.1', 'y.2']
+    assert client.listed == []
+
+    assert main._select_tasks(client, [], '/web', 'h1') == ['web.1']
+    assert main._select_tasks(client, ['db.1', '*.1'], None, None) == \
+        ['db.1', 'web.1']
+    assert main._select_tasks(client, [], None, 'h1') == ['web.1', 'db.1']
+    assert client.listed == ['/web', None, None]
+
+
+def test_select_tasks_narrows_given_tasks():
+    client = _TasksClient([
+        {'id': 'web.1', 'appId': '/web', 'host': 'h1'},
+        {'id': 'web.2', 'appId': '/web', 'host': 'h2'},
+        {'id': 'db.1', 'appId': '/db', 'host': 'h1'},
+    ])
+
+    assert main._select_tasks(client, ['web.2', 'db.1'], '/web', None) == \
+        ['web.2']
+    assert main._select_tasks(client, ['*.1', 'web.2'], None, 'h1') == \
+        ['web.1', 'db.1']
+    assert main._select_tasks(client, ['db.*'], '/web', None) == []
+    assert client.listed == ['/web', None, '/web']
+
+
+class _ListClient(object):
+    def __init__(self, apps):
+        self.apps = apps
+        self.embeds = []
+        self.deployment_requests = 0
+
+    def get_apps(self, embed=None):
+        self.embeds.append(embed)
+        return self.apps
+
+    def get_deployments(self):
+        self.deployment_requests += 1
+        return [{'id': 'd1', 'currentActions': [
+            {'app': '/a', 'action': 'ScaleApplication'}]}]
+
+
+def _listed_app(app_id, deployment_ids):
+    return {'id': app_id, 'mem': 16.0, 'cpus': 0.1, 'instances': 1,
+            'tasksRunning': 1, 'tasksHealthy': 0, 'healthChecks': [],
+            'container': None, 'cmd': 'sleep 1000',
+            'deployments': [{'id': d} for d in deployment_ids]}
+
+
+def test_list_embeds_counts_and_deployments(monkeypatch, published):
+    client = _ListClient([_listed_app('/a', []), _listed_app('/b', [])])
+    monkeypatch.setattr(main.marathon, 'create_client', lambda: client)
+
+    assert main._list(False) == 0
+    assert client.embeds == [['apps.counts', 'apps.deployments']]
+    # nothing is deploying, so the deployments aren't read
+    assert client.deployment_requests == 0
+
+    client.apps[0] = _listed_app('/a', ['d1'])
+    assert main._list(False) == 0
+    assert client.deployment_requests == 1
+    assert 'scale' in published[-1]
+
+    assert main._list(True) == 0
+    assert client.embeds[-1] is None
+    assert published[-1] == client.apps
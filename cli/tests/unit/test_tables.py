@@ -22,6 +22,41 @@ def test_app_table():
         assert str(table) == f.read()
 
 
+def test_app_table_matches_deployments_to_apps():
+    def app(app_id, deployment_ids):
+        app = app_fixture()
+        app['id'] = app_id
+        app['deployments'] = [{'id': d} for d in deployment_ids]
+        return app
+
+    def deployment(deployment_id, actions):
+        return {'id': deployment_id,
+                'currentActions': [{'app': app_id, 'action': action}
+                                   for app_id, action in actions]}
+
+    apps = [app('/a', ['d1']), app('/b', ['d1', 'd2']), app('/c', [])]
+    deployments = [
+        deployment('d1', [('/a', 'ScaleApplication'),
+                          ('/b', 'StartApplication'),
+                          ('/c', 'StopApplication')]),
+        deployment('d2', [('/b', 'RestartApplication'),
+                          ('/a', 'KillAllOldTasksOf')]),
+    ]
+
+    table = tables.app_table(apps, deployments)
+    rows = table.get_string(fields=['ID', 'DEPLOYMENT'],
+                            header=False, border=False)
+
+    actions = dict(row.split(None, 1) for row in rows.splitlines())
+
+    # an app only shows the actions on itself, of its own deployments,
+    # which it lists in no particular order
+    assert actions['/a'].strip() == 'scale'
+    assert sorted(actions['/b'].strip(' ()').split(', ')) == \
+        ['restart', 'start']
+    assert actions['/c'].strip() == tables.EMPTY_ENTRY
+
+
 def test_deployment_table():
     _test_table(tables.deployment_table,
                 deployment_fixture,
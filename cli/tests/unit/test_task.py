@@ -0,0 +1,108 @@
+import io
+import time
+
+import concurrent.futures
+from dcos.errors import DCOSException
+from dcoscli.task import main
+
+import pytest
+
+
+class _File(io.BytesIO):
+    """In-memory stand-in for a MesosFile"""
+
+    def size(self):
+        return len(self.getvalue())
+
+
+def _lines(count, width=10):
+    return b''.join(b'x' * (width - 1) + b'\n' for _ in range(count))
+
+
+def test_tail_reads_last_lines():
+    file_ = _File(b'a\nb\nc\nd\n')
+
+    lines, fetched = main._tail(2, file_)
+
+    assert lines == [b'c', b'd']
+    assert file_.tell() == file_.size()
+
+
+def test_tail_without_trailing_newline():
+    assert main._tail(2, _File(b'a\nb\nc'))[0] == [b'b', b'c']
+
+
+def test_tail_short_file():
+    assert main._tail(10, _File(b'a\nb\n'))[0] == [b'a', b'b']
+    assert main._tail(10, _File(b''))[0] == [b'']
+
+
+def test_tail_fetch_is_bounded():
+    # a short-line file larger than the initial estimate
+    file_ = _File(_lines(1000000, width=2))
+
+    lines, fetched = main._tail(10, file_)
+
+    assert lines == [b'x'] * 10
+    assert fetched <= main.LINE_SIZE * 10
+
+
+def test_tail_widens_window():
+    # lines much longer than LINE_SIZE force the window to grow
+    file_ = _File(_lines(100, width=5 * main.LINE_SIZE))
+
+    lines, fetched = main._tail(10, file_)
+
+    assert len(lines) == 10
+    assert fetched < 4 * 10 * 5 * main.LINE_SIZE
+
+
+class _FollowedFile(object):
+    """Stand-in for a MesosFile that returns scripted reads"""
+
+    active = 0
+    max_active = 0
+
+    def __init__(self, name, reads):
+        self._name = name
+        self._reads = list(reads)
+
+    def task(self):
+        return {'slave_id': 'S0'}
+
+    def read(self):
+        _FollowedFile.active += 1
+        _FollowedFile.max_active = max(_FollowedFile.active,
+                                       _FollowedFile.max_active)
+        time.sleep(0.01)
+        _FollowedFile.active -= 1
+
+        data = self._reads.pop(0)
+        if data is None:
+            raise DCOSException('gone')
+        return data
+
+    def __str__(self):
+        return self._name
+
+
+def test_follow_scheduler(monkeypatch):
+    monkeypatch.setattr(main, 'FOLLOW_MIN_INTERVAL', 0.01)
+    monkeypatch.setattr(main, 'FOLLOW_MAX_INTERVAL', 0.04)
+    monkeypatch.setattr(main, 'FOLLOW_SLAVE_CONCURRENCY', 1)
+
+    published = []
+    monkeypatch.setattr(main.emitter, 'publish', published.append)
+
+    files = [_FollowedFile('a', [b'a1\n', b'', b'', b'a2\n', None]),
+             _FollowedFile('b', [b'', b'b1\n', None])]
+
+    with concurrent.futures.ThreadPoolExecutor(4) as pool:
+        scheduler = main._FollowScheduler(files, pool)
+        with pytest.raises(DCOSException) as excinfo:
+            scheduler.run(None)
+
+    assert excinfo.value is main.NO_FILE_EXCEPTION
+    assert _FollowedFile.max_active == 1
+    lines = [p for p in published if not p.startswith('===>')]
+    assert sorted(lines) == ['a1', 'a2', 'b1']
@@ -1,9 +1,7 @@
-import json
 import os
 import sys
 import uuid
 
-import pkg_resources
 import toml
 from dcos import config, constants, emitting, errors, http, jsonitem, util
 from dcos.errors import DCOSException
@@ -126,10 +124,8 @@ def _save_auth_keys(key_dict):
     toml_config = config.mutable_load_from_path(config_path)
 
     section = 'core'
-    config_schema = json.loads(
-        pkg_resources.resource_string(
-            'dcoscli',
-            'data/config-schema/core.json').decode('utf-8'))
+    config_schema = util.load_resource_json('dcoscli',
+                                            'data/config-schema/core.json')
     for k, v in iteritems(key_dict):
         python_value = jsonitem.parse_json_value(k, v, config_schema)
         name = '{}.{}'.format(section, k)
@@ -1,6 +1,9 @@
 DCOS_DIR = ".dcos"
 """DCOS data directory.  Can store subcommands and the config file."""
 
+DCOS_CACHE_SUBDIR = 'cache'
+"""In the DCOS data directory, this is the cache subdirectory."""
+
 DCOS_SUBCOMMAND_VIRTUALENV_SUBDIR = 'env'
 """In a package's directory, this is the virtualenv subdirectory."""
 
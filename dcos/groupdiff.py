@@ -0,0 +1,268 @@
+import posixpath
+
+APP_DEFAULTS = {
+    'instances': 1,
+    'cpus': 1.0,
+    'mem': 128.0,
+    'disk': 0.0,
+    'executor': '',
+    'requirePorts': False,
+    'backoffSeconds': 1,
+    'backoffFactor': 1.15,
+    'maxLaunchDelaySeconds': 3600,
+    'upgradeStrategy': {'minimumHealthCapacity': 1.0,
+                        'maximumOverCapacity': 1.0},
+}
+"""Values that Marathon assigns to app properties that are not set."""
+
+READ_ONLY_PROPERTIES = frozenset(
+    ['version', 'versionInfo', 'deployments', 'lastTaskFailure'])
+"""App and group properties that are reported, but never set."""
+
+SERVER_OWNED_PROPERTIES = frozenset(
+    ['tasks', 'tasksRunning', 'tasksStaged', 'tasksHealthy',
+     'tasksUnhealthy'])
+"""App properties that describe the running tasks."""
+
+GROUP_DIRECTIVES = frozenset(['version', 'scaleBy'])
+"""Group update properties that act on the whole group, such as a
+rollback to an earlier version, rather than describe it."""
+
+SERVER_ASSIGNED_PROPERTIES = frozenset(['ports', 'portDefinitions'])
+"""App properties that Marathon fills in, unless they are set."""
+
+UNORDERED_PROPERTIES = frozenset(['dependencies', 'uris', 'constraints'])
+"""List properties whose order is not significant."""
+
+CREATE = 'create'
+UPDATE = 'update'
+REMOVE = 'remove'
+
+APP = 'app'
+GROUP = 'group'
+
+
+def diff(current, desired, properties=None):
+    """Computes the app and group changes that turn the `current` group
+    tree into the `desired` one, to preview an update or to tell that it
+    changes nothing.  The changes are not meant to be sent one by one:
+    Marathon replaces the apps and groups of a group as a whole, so an
+    update is sent as a single PUT of the desired group, which starts a
+    single deployment.
+
+    Both trees are indexed by id and normalized first, so that relative
+    ids, properties left to their defaults, read-only properties and the
+    order of unordered lists don't show up as changes.  Marathon reports
+    more properties than a definition sets, so a property that is
+    missing from the desired definition is only unset if it is one of
+    `properties`.  The cost is linear in the size of the trees.
+
+    Changes are listed with group creations and updates first, then app
+    creations and updates, then app and group removals.  Apps and groups
+    inside a removed group are not listed separately.
+
+    :param current: the current group, as returned by Marathon
+    :type current: dict
+    :param desired: the desired definition of the same group
+    :type desired: dict
+    :param properties: names of the app and group properties that a
+                       definition can set, such as the properties of its
+                       schema; by default, only the properties of the
+                       desired definition are compared
+    :type properties: set of str
+    :returns: changes, each with an 'action' (create, update or remove),
+              a 'type' (app or group), an 'id', and for creates and
+              updates a 'payload' with the id and changed properties
+    :rtype: [dict]
+    """
+
+    current_apps, current_groups = _index(current)
+    desired_apps, desired_groups = _index(desired)
+
+    changes = {(action, type_): []
+               for action in (CREATE, UPDATE, REMOVE)
+               for type_ in (APP, GROUP)}
+
+    for type_, currents, desireds in [(GROUP, current_groups, desired_groups),
+                                      (APP, current_apps, desired_apps)]:
+        for id_, resource in desireds.items():
+            if id_ not in currents:
+                changes[CREATE, type_].append(
+                    _change(CREATE, type_, id_, resource))
+                continue
+
+            payload = _changed_properties(
+                currents[id_], resource, properties or ())
+            if payload:
+                payload['id'] = id_
+                changes[UPDATE, type_].append(
+                    _change(UPDATE, type_, id_, payload))
+
+        removed = [id_ for id_ in currents if id_ not in desireds]
+        changes[REMOVE, type_].extend(
+            _change(REMOVE, type_, id_)
+            for id_ in removed
+            if not _in_removed_group(id_, current_groups, desired_groups))
+
+    return [change
+            for key in [(CREATE, GROUP), (UPDATE, GROUP),
+                        (CREATE, APP), (UPDATE, APP),
+                        (REMOVE, APP), (REMOVE, GROUP)]
+            for change in sorted(changes[key], key=lambda c: c['id'])]
+
+
+def plan(changes):
+    """
+    :param changes: changes, as returned by py:func:`diff`
+    :type changes: [dict]
+    :returns: one line per change
+    :rtype: [str]
+    """
+
+    lines = []
+    for change in changes:
+        line = '{} {} {}'.format(
+            change['action'], change['type'], change['id'])
+        if change['action'] == UPDATE:
+            line += ': ' + ', '.join(
+                sorted(key for key in change['payload'] if key != 'id'))
+        lines.append(line)
+
+    return lines
+
+
+def _change(action, type_, id_, payload=None):
+    change = {'action': action, 'type': type_, 'id': id_}
+    if payload is not None:
+        change['payload'] = payload
+    return change
+
+
+def _index(group, parent_id='/', apps=None, groups=None):
+    """Indexes the apps and groups of a group tree by absolute id, and
+    normalizes them.
+
+    :param group: group definition
+    :type group: dict
+    :param parent_id: absolute id of the enclosing group
+    :type parent_id: str
+    :param apps: index to add the apps to
+    :type apps: dict
+    :param groups: index to add the groups to
+    :type groups: dict
+    :returns: the normalized apps and groups, by id
+    :rtype: (dict, dict)
+    """
+
+    if apps is None:
+        apps, groups = {}, {}
+
+    group_id = _absolute_id(group.get('id', ''), parent_id)
+    properties = dict((key, value) for key, value in group.items()
+                      if key not in ('apps', 'groups'))
+    groups[group_id] = _normalize(properties, group_id, group_id, {})
+
+    for app in group.get('apps') or []:
+        app_id = _absolute_id(app['id'], group_id)
+        apps[app_id] = _normalize(app, app_id, group_id, APP_DEFAULTS)
+
+    for subgroup in group.get('groups') or []:
+        _index(subgroup, group_id, apps, groups)
+
+    return apps, groups
+
+
+def _normalize(resource, id_, base_id, defaults):
+    """
+    :param resource: app or group definition
+    :type resource: dict
+    :param id_: absolute id of the resource
+    :type id_: str
+    :param base_id: absolute id that relative dependencies refer to: the
+                    enclosing group of an app, or the group itself
+    :type base_id: str
+    :param defaults: values of the properties that are not set
+    :type defaults: dict
+    :returns: the set properties, without defaults or read-only
+              properties, and with absolute ids
+    :rtype: dict
+    """
+
+    normalized = {'id': id_}
+    for key, value in resource.items():
+        if (key == 'id' or key in READ_ONLY_PROPERTIES or
+                key in SERVER_OWNED_PROPERTIES):
+            continue
+
+        if key == 'dependencies' and value:
+            value = [_absolute_id(dependency, base_id)
+                     for dependency in value]
+        if key in UNORDERED_PROPERTIES and value:
+            value = sorted(value)
+
+        if value in (None, '', [], {}) or defaults.get(key) == value:
+            continue
+        normalized[key] = value
+
+    return normalized
+
+
+def _changed_properties(current, desired, properties):
+    """
+    :param current: normalized current definition
+    :type current: dict
+    :param desired: normalized desired definition
+    :type desired: dict
+    :param properties: names of the properties that a definition can set
+    :type properties: set of str
+    :returns: the properties to send to turn `current` into `desired`
+    :rtype: dict
+    """
+
+    changed = {}
+    for key, value in desired.items():
+        if current.get(key) != value:
+            changed[key] = value
+
+    for key in current:
+        if (key in desired or key not in properties or
+                key in SERVER_ASSIGNED_PROPERTIES):
+            continue
+        # properties without a known default are unset with null
+        changed[key] = APP_DEFAULTS.get(key)
+
+    return changed
+
+
+def _absolute_id(id_, parent_id):
+    """
+    :param id_: absolute id, or id relative to `parent_id`
+    :type id_: str
+    :param parent_id: absolute id of the enclosing group
+    :type parent_id: str
+    :returns: absolute id, without a trailing slash
+    :rtype: str
+    """
+
+    return posixpath.normpath(posixpath.join(parent_id, id_)).replace(
+        '//', '/')
+
+
+def _in_removed_group(id_, current_groups, desired_groups):
+    """
+    :param id_: absolute id of a removed app or group
+    :type id_: str
+    :param current_groups: current groups, by id
+    :type current_groups: dict
+    :param desired_groups: desired groups, by id
+    :type desired_groups: dict
+    :returns: whether an enclosing group is removed too
+    :rtype: bool
+    """
+
+    parent_id = posixpath.dirname(id_)
+    while parent_id != '/':
+        if parent_id in current_groups and parent_id not in desired_groups:
+            return True
+        parent_id = posixpath.dirname(parent_id)
+    return False
@@ -1,9 +1,34 @@
+import atexit
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
 import requests
-from dcos import util
+from dcos import constants, util
 from dcos.errors import DCOSException
+from requests.packages.urllib3 import connectionpool
 
 logger = util.get_logger(__name__)
 
+DEFAULT_POOL_CONNECTIONS = 10
+"""Number of per-host connection pools kept alive by the shared session."""
+
+DEFAULT_POOL_MAXSIZE = 20
+"""Number of keep-alive connections kept in each per-host pool."""
+
+EVENT_CHUNK_SIZE = 8 * 1024
+"""Number of bytes read at a time from a chunked event stream."""
+
+DEFAULT_CACHE_TTL = 0
+"""Seconds a cached response without validators is served without
+refetching it."""
+
+DEFAULT_CACHE_MAX_SIZE = 100 * 1024 * 1024
+"""Number of bytes the on-disk response cache may use."""
+
 
 def _default_is_success(status_code):
     """Returns true if the success status is between [200, 300).
@@ -49,6 +74,7 @@ def request(method,
             timeout=3.0,
             is_success=_default_is_success,
             to_exception=_default_to_exception,
+            stream=False,
             **kwargs):
     """Sends an HTTP request.
 
@@ -60,6 +86,8 @@ def request(method,
     :type is_success: Function from int to bool
     :param to_exception: Builds an Error from an unsuccessful response or Error
     :type to_exception: (requests.Response | Error) -> Error
+    :param stream: If True, the body is not downloaded until it is read
+    :type stream: bool
     :param kwargs: Additional arguments to requests.request
         (see http://docs.python-requests.org/en/latest/api/#requests.request)
     :type kwargs: dict
@@ -82,14 +110,18 @@ def request(method,
             request.url,
             request.headers)
 
-        with requests.Session() as session:
-            response = session.send(request.prepare(), timeout=timeout)
+        response = _get_session().send(request.prepare(),
+                                       timeout=timeout,
+                                       stream=stream)
     except Exception as ex:
         raise to_exception(ex)
 
-    logger.info('Received HTTP response [%r]: %r',
-                response.status_code,
-                response.text)
+    if stream:
+        logger.info('Received HTTP response [%r]', response.status_code)
+    else:
+        logger.info('Received HTTP response [%r]: %r',
+                    response.status_code,
+                    response.text)
 
     if is_success(response.status_code):
         return response
@@ -125,6 +157,97 @@ def get(url, to_exception=_default_to_exception, **kwargs):
     return request('get', url, to_exception=to_exception, **kwargs)
 
 
+def cached_get(url, to_exception=_default_to_exception, ttl=None, **kwargs):
+    """Sends a GET request through the on-disk response cache.  Cached
+    responses with an ETag or Last-Modified header are revalidated with
+    a conditional request, so an unchanged resource is not downloaded
+    again.  Responses without validators are reused for `ttl` seconds,
+    which defaults to `core.http_cache_ttl`.
+
+    With `stream=True`, a response that can't be cached is streamed as
+    usual.  A cacheable one is read whole to store it, and its content
+    is then iterated from memory.
+
+    :param url: URL for the new Request object
+    :type url: str
+    :param ttl: seconds to reuse a response without validators
+    :type ttl: float
+    :param kwargs: Additional arguments to requests.request
+                   (see py:func:`request`)
+    :type kwargs: dict
+    :rtype: Response
+    """
+
+    cache = _get_cache()
+    if cache is None:
+        return get(url, to_exception=to_exception, **kwargs)
+
+    key = requests.Request(
+        method='get', url=url, params=kwargs.get('params')).prepare().url
+    headers = dict(kwargs.pop('headers', {'Accept': 'application/json'}))
+
+    entry = cache.load(key)
+    if entry is not None:
+        meta, body = entry
+        if cache.is_fresh(meta, ttl):
+            logger.info('Using cached response for [%r]', key)
+            return _cached_response(key, meta, body)
+        if meta['etag'] is not None:
+            headers['If-None-Match'] = meta['etag']
+        if meta['last_modified'] is not None:
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    response = request('get', url,
+                       is_success=_is_success_or_not_modified,
+                       to_exception=to_exception,
+                       headers=headers,
+                       **kwargs)
+
+    if response.status_code == 304:
+        if entry is None:
+            raise to_exception(response)
+        logger.info('Cached response for [%r] is still valid', key)
+        cache.touch(key)
+        return _cached_response(key, meta, body)
+
+    cache.store(key, response, ttl)
+    return response
+
+
+def _is_success_or_not_modified(status_code):
+    """
+    :param status_code: the http response status
+    :type status_code: int
+    :returns: True for success and 304 Not Modified; False otherwise
+    :rtype: bool
+    """
+
+    return _default_is_success(status_code) or status_code == 304
+
+
+def _cached_response(url, meta, body):
+    """Builds a response object from a cache entry.
+
+    :param url: URL of the cached resource
+    :type url: str
+    :param meta: entry metadata
+    :type meta: dict
+    :param body: response body
+    :type body: bytes
+    :rtype: Response
+    """
+
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.encoding = meta['encoding']
+    response._content = body
+    response._content_consumed = True
+    if meta['content_type'] is not None:
+        response.headers['Content-Type'] = meta['content_type']
+    return response
+
+
 def post(url, to_exception=_default_to_exception,
          data=None, json=None, **kwargs):
     """Sends a POST request.
@@ -192,6 +315,435 @@ def delete(url, to_exception=_default_to_exception, **kwargs):
     return request('delete', url, to_exception=to_exception, **kwargs)
 
 
+def stream_events(response):
+    """Yields the server-sent events of a streamed `text/event-stream`
+    response as they arrive.  Raises a DCOSException if the stream is
+    interrupted, e.g. because no data was received within the request's
+    timeout.
+
+    :param response: response of a request sent with stream=True
+    :type response: Response
+    :returns: (event type, data) for each event
+    :rtype: generator of (str, str)
+    """
+
+    # chunks of a chunked response are returned as soon as they arrive,
+    # but other reads block until the whole buffer is filled
+    chunk_size = 1
+    if getattr(response.raw, 'chunked', False):
+        chunk_size = EVENT_CHUNK_SIZE
+
+    event_type = None
+    data = []
+    try:
+        for line in response.iter_lines(chunk_size=chunk_size):
+            line = line.decode('utf-8')
+            if not line:
+                if data:
+                    yield event_type or 'message', '\n'.join(data)
+                event_type = None
+                data = []
+                continue
+
+            field, _, value = line.partition(':')
+            if value.startswith(' '):
+                value = value[1:]
+            if field == 'event':
+                event_type = value
+            elif field == 'data':
+                data.append(value)
+    except requests.exceptions.RequestException as e:
+        raise DCOSException(
+            'Event stream from [{0}] was interrupted: {1}'.format(
+                response.url, e))
+
+
+class _ConnectionCounters(object):
+    """Thread-safe counters for the connections opened and reused by the
+    shared session's connection pools."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._requests = 0
+
+    def connection_opened(self):
+        with self._lock:
+            self._opened += 1
+
+    def request_sent(self):
+        with self._lock:
+            self._requests += 1
+
+    def stats(self):
+        """
+        :returns: the number of connections opened and reused
+        :rtype: dict
+        """
+
+        with self._lock:
+            return {'opened': self._opened,
+                    'reused': max(self._requests - self._opened, 0)}
+
+
+_counters = _ConnectionCounters()
+
+
+class _CountingHTTPConnectionPool(connectionpool.HTTPConnectionPool):
+    def _new_conn(self):
+        _counters.connection_opened()
+        return super(_CountingHTTPConnectionPool, self)._new_conn()
+
+    def _make_request(self, *args, **kwargs):
+        _counters.request_sent()
+        return super(_CountingHTTPConnectionPool, self)._make_request(
+            *args, **kwargs)
+
+
+class _CountingHTTPSConnectionPool(connectionpool.HTTPSConnectionPool):
+    def _new_conn(self):
+        _counters.connection_opened()
+        return super(_CountingHTTPSConnectionPool, self)._new_conn()
+
+    def _make_request(self, *args, **kwargs):
+        _counters.request_sent()
+        return super(_CountingHTTPSConnectionPool, self)._make_request(
+            *args, **kwargs)
+
+
+class _PooledAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter whose per-host pools count the connections they open
+    and reuse."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(_PooledAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+_session_lock = threading.Lock()
+_session = None
+_pool_connections = None
+_pool_maxsize = None
+
+
+def _configured_pool_sizes():
+    """Returns the pool sizes from the `core.http_pool_connections` and
+    `core.http_pool_maxsize` properties, if a config file is available.
+
+    :returns: number of per-host pools and connections per pool
+    :rtype: (int, int)
+    """
+
+    pool_connections = DEFAULT_POOL_CONNECTIONS
+    pool_maxsize = DEFAULT_POOL_MAXSIZE
+
+    if constants.DCOS_CONFIG_ENV in os.environ:
+        config = util.get_config()
+        pool_connections = config.get('core.http_pool_connections',
+                                      pool_connections)
+        pool_maxsize = config.get('core.http_pool_maxsize', pool_maxsize)
+
+    return pool_connections, pool_maxsize
+
+
+def _get_session():
+    """Returns the process-wide session, creating it on first use.  The
+    session keeps one pool of keep-alive connections per host, so
+    requests to the same master, Marathon or agent reuse TCP and TLS
+    connections, including requests sent from worker threads.
+
+    :returns: the shared session
+    :rtype: requests.Session
+    """
+
+    global _session, _pool_connections, _pool_maxsize
+
+    with _session_lock:
+        if _session is None:
+            if _pool_connections is None:
+                _pool_connections, _pool_maxsize = _configured_pool_sizes()
+
+            adapter = _PooledAdapter(pool_connections=_pool_connections,
+                                     pool_maxsize=_pool_maxsize)
+            _session = requests.Session()
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+
+        return _session
+
+
+def configure_pools(pool_connections=None, pool_maxsize=None):
+    """Resizes the connection pools of the process-wide session.  Idle
+    connections are closed if the sizes change.
+
+    :param pool_connections: number of per-host pools to keep
+    :type pool_connections: int
+    :param pool_maxsize: number of connections to keep in each pool
+    :type pool_maxsize: int
+    :rtype: None
+    """
+
+    global _session, _pool_connections, _pool_maxsize
+
+    with _session_lock:
+        if _pool_connections is None:
+            _pool_connections, _pool_maxsize = _configured_pool_sizes()
+
+        new_connections = pool_connections or _pool_connections
+        new_maxsize = pool_maxsize or _pool_maxsize
+        if (new_connections, new_maxsize) == (_pool_connections,
+                                              _pool_maxsize):
+            return None
+
+        _pool_connections, _pool_maxsize = new_connections, new_maxsize
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def ensure_pool_maxsize(pool_maxsize):
+    """Grows the per-host pools so that `pool_maxsize` concurrent
+    requests to the same host can all keep their connections alive.
+    Never shrinks the pools.
+
+    :param pool_maxsize: number of concurrent requests per host
+    :type pool_maxsize: int
+    :rtype: None
+    """
+
+    with _session_lock:
+        if _pool_connections is None:
+            current = _configured_pool_sizes()[1]
+        else:
+            current = _pool_maxsize
+
+    if pool_maxsize > current:
+        configure_pools(pool_maxsize=pool_maxsize)
+
+
+def connection_stats():
+    """Returns how many connections the process-wide session has opened,
+    and how many requests were sent over an already open connection.
+
+    :returns: {'opened': <int>, 'reused': <int>}
+    :rtype: dict
+    """
+
+    return _counters.stats()
+
+
+def _log_connection_stats():
+    stats = connection_stats()
+    logger.debug('HTTP connections opened: %d, reused: %d',
+                 stats['opened'], stats['reused'])
+
+
+atexit.register(_log_connection_stats)
+
+
+class _ResponseCache(object):
+    """Size-bounded on-disk cache of GET responses.  Each entry is a
+    single file holding a line of JSON metadata followed by the body.
+    Entries are written atomically, and the least recently used ones are
+    evicted once the cache grows past `max_size` bytes.
+
+    :param directory: cache directory
+    :type directory: str
+    :param ttl: seconds an entry without validators stays fresh
+    :type ttl: float
+    :param max_size: maximum number of bytes used by the cache
+    :type max_size: int
+    """
+
+    def __init__(self, directory, ttl, max_size):
+        self._directory = directory
+        self._ttl = ttl
+        self._max_size = max_size
+
+    def _path(self, url):
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self._directory, digest)
+
+    def load(self, url):
+        """
+        :param url: URL of the cached resource
+        :type url: str
+        :returns: the entry's metadata and body, or None if there is no
+                  valid entry for `url`
+        :rtype: (dict, bytes) | None
+        """
+
+        try:
+            with open(self._path(url), 'rb') as entry_file:
+                meta = json.loads(entry_file.readline().decode('utf-8'))
+                body = entry_file.read()
+        except (IOError, OSError, ValueError):
+            return None
+
+        if meta.get('url') != url:
+            return None
+        return meta, body
+
+    def is_fresh(self, meta, ttl=None):
+        """
+        :param meta: entry metadata
+        :type meta: dict
+        :param ttl: overrides the cache's TTL
+        :type ttl: float
+        :returns: True if the entry can be used without contacting the
+                  server; False otherwise
+        :rtype: bool
+        """
+
+        if meta['etag'] is not None or meta['last_modified'] is not None:
+            return False
+        if ttl is None:
+            ttl = self._ttl
+        return time.time() - meta['stored_at'] < ttl
+
+    def store(self, url, response, ttl=None):
+        """Stores `response` if it can be reused later.
+
+        :param url: URL of the resource
+        :type url: str
+        :param response: the response to store
+        :type response: Response
+        :param ttl: overrides the cache's TTL
+        :type ttl: float
+        :rtype: None
+        """
+
+        if ttl is None:
+            ttl = self._ttl
+
+        meta = {
+            'url': url,
+            'stored_at': time.time(),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_type': response.headers.get('Content-Type'),
+            'encoding': response.encoding,
+        }
+        if (meta['etag'] is None and meta['last_modified'] is None and
+                ttl <= 0):
+            return None
+
+        body = response.content
+        if len(body) > self._max_size:
+            return None
+
+        try:
+            util.ensure_dir(self._directory)
+            fd, tmp_path = tempfile.mkstemp(dir=self._directory,
+                                            prefix='.tmp')
+            with os.fdopen(fd, 'wb') as entry_file:
+                entry_file.write(json.dumps(meta).encode('utf-8'))
+                entry_file.write(b'\n')
+                entry_file.write(body)
+            _replace(tmp_path, self._path(url))
+        except (IOError, OSError) as e:
+            logger.warning('Unable to cache response for [%r]: %s', url, e)
+            return None
+
+        self._evict()
+
+    def touch(self, url):
+        """Marks the entry for `url` as recently used.
+
+        :param url: URL of the cached resource
+        :type url: str
+        :rtype: None
+        """
+
+        try:
+            os.utime(self._path(url), None)
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Removes the least recently used entries until the cache fits in
+        `max_size` bytes.
+
+        :rtype: None
+        """
+
+        entries = []
+        total = 0
+        for name in os.listdir(self._directory):
+            path = os.path.join(self._directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self._max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+def _replace(src, dst):
+    """Renames `src` to `dst`, overwriting `dst` if it exists.
+
+    :param src: source path
+    :type src: str
+    :param dst: destination path
+    :type dst: str
+    :rtype: None
+    """
+
+    try:
+        os.rename(src, dst)
+    except OSError:
+        # Windows refuses to rename over an existing file
+        os.remove(dst)
+        os.rename(src, dst)
+
+
+_cache_lock = threading.Lock()
+_cache = None
+_cache_loaded = False
+
+
+def _get_cache():
+    """Returns the process-wide response cache, configured from the
+    `core.http_cache_ttl` and `core.http_cache_max_size` properties.
+
+    :returns: the response cache, or None if it is disabled
+    :rtype: _ResponseCache | None
+    """
+
+    global _cache, _cache_loaded
+
+    with _cache_lock:
+        if not _cache_loaded:
+            ttl = DEFAULT_CACHE_TTL
+            max_size = DEFAULT_CACHE_MAX_SIZE
+            if constants.DCOS_CONFIG_ENV in os.environ:
+                config = util.get_config()
+                ttl = config.get('core.http_cache_ttl', ttl)
+                max_size = config.get('core.http_cache_max_size', max_size)
+
+            if max_size > 0:
+                directory = os.path.join(os.path.expanduser('~'),
+                                         constants.DCOS_DIR,
+                                         constants.DCOS_CACHE_SUBDIR,
+                                         'http')
+                _cache = _ResponseCache(directory, ttl, max_size)
+            _cache_loaded = True
+
+        return _cache
+
+
 def silence_requests_warnings():
     """Silence warnings from requests.packages.urllib3.  See DCOS-1007."""
     requests.packages.urllib3.disable_warnings()
@@ -0,0 +1,316 @@
+import codecs
+import json
+import re
+
+import six
+
+ITEMS = '[]'
+"""Key of a projection node that selects every element of an array."""
+
+_PATH_TOKEN = re.compile(r'\{[^}]*\}|[^.{}]+')
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_SPECIAL = re.compile(r'["\[\]{}]')
+_SCALAR = re.compile(r'[^,:\[\]{}" \t\n\r]*')
+
+
+def parse_paths(paths):
+    """Builds a projection tree from key paths.  A path is a dot separated
+    list of keys, where a `[]` suffix selects every element of an array
+    and `{a,b}` selects several keys, e.g.
+    'frameworks[].tasks[].{id,name}'.  In the tree, every node is a dict
+    from key to child node, and None selects the whole value.
+
+    :param paths: key paths to keep
+    :type paths: [str]
+    :returns: projection tree
+    :rtype: dict
+    """
+
+    tree = {}
+    for path in paths:
+        keys = [_keys(token) for token in _PATH_TOKEN.findall(path)]
+        if not keys:
+            raise ValueError('Empty key path: {!r}'.format(path))
+
+        nodes = [tree]
+        for depth, token_keys in enumerate(keys):
+            last = depth == len(keys) - 1
+            nodes = [child
+                     for node in nodes
+                     for key in token_keys
+                     for child in _select(node, key, last)]
+
+    return tree
+
+
+def _keys(token):
+    """
+    :param token: path token, e.g. 'tasks[]' or '{id,name}'
+    :type token: str
+    :returns: the keys selected by the token
+    :rtype: [str]
+    """
+
+    if token.startswith('{'):
+        return [key.strip() for key in token[1:-1].split(',')]
+    return [token]
+
+
+def _select(node, key, last):
+    """Adds `key` to the projection `node`.
+
+    :param node: projection node
+    :type node: dict
+    :param key: path key, with an optional `[]` suffix
+    :type key: str
+    :param last: whether `key` ends the path
+    :type last: bool
+    :returns: the child node to extend, unless the whole value is kept
+    :rtype: [dict]
+    """
+
+    parts = []
+    while key.endswith(ITEMS):
+        key = key[:-len(ITEMS)]
+        parts.append(ITEMS)
+    parts.insert(0, key)
+
+    for i, part in enumerate(parts):
+        if last and i == len(parts) - 1:
+            node[part] = None
+            return []
+
+        child = node.get(part, {})
+        if child is None:
+            # another path already keeps the whole value
+            return []
+        node = node.setdefault(part, child)
+
+    return [node]
+
+
+def project(chunks, paths):
+    """Parses the JSON document read from `chunks`, building only the
+    values selected by `paths`.  Everything else is scanned and dropped,
+    so memory use depends on the selected values rather than on the
+    size of the document.  Repeated strings are shared.  Arrays are
+    projected element by element, so the `[]` markers in `paths` may be
+    omitted.
+
+    :param chunks: the UTF-8 encoded document
+    :type chunks: iterable of bytes
+    :param paths: key paths to keep (see py:func:`parse_paths`)
+    :type paths: [str]
+    :returns: the projected document
+    :rtype: dict | list
+    """
+
+    parser = _Parser(chunks)
+    value = parser.value(parse_paths(paths))
+    parser.end()
+    return value
+
+
+class _Parser(object):
+    """Incremental JSON parser over a sequence of byte chunks.  Only the
+    unparsed tail of the input is buffered, except while a selected
+    value is being captured.  Equal keys and string values share a
+    single string object, since ids, hostnames and states repeat across
+    thousands of records.
+
+    :param chunks: the UTF-8 encoded document
+    :type chunks: iterable of bytes
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._mark = None
+        self._eof = False
+        self._strings = {}
+
+    def value(self, node):
+        """Parses the next value, keeping only what `node` selects.
+
+        :param node: projection node
+        :type node: dict | None
+        :returns: the projected value
+        :rtype: any
+        """
+
+        char = self._peek()
+        if node is None or char not in '{[':
+            self._mark = self._pos
+            self._scan()
+            text = self._buf[self._mark:self._pos]
+            self._mark = None
+            value = json.loads(text)
+            if isinstance(value, six.text_type):
+                value = self._strings.setdefault(value, value)
+            return value
+        elif char == '{':
+            return self._object(node)
+        else:
+            return self._array(node.get(ITEMS, node))
+
+    def end(self):
+        """Checks that only whitespace is left in the input.
+
+        :rtype: None
+        """
+
+        self._skip_whitespace()
+        if self._pos < len(self._buf):
+            self._error('Extra data')
+
+    def _object(self, node):
+        self._pos += 1
+        result = {}
+        if self._peek() == '}':
+            self._pos += 1
+            return result
+
+        while True:
+            if self._peek() != '"':
+                self._error('Expecting property name')
+            key = self.value(None)
+            self._expect(':')
+            if key in node:
+                result[key] = self.value(node[key])
+            else:
+                self._peek()
+                self._scan()
+
+            char = self._peek()
+            self._pos += 1
+            if char == '}':
+                return result
+            elif char != ',':
+                self._error("Expecting ',' or '}'", -1)
+
+    def _array(self, node):
+        self._pos += 1
+        result = []
+        if self._peek() == ']':
+            self._pos += 1
+            return result
+
+        while True:
+            result.append(self.value(node))
+
+            char = self._peek()
+            self._pos += 1
+            if char == ']':
+                return result
+            elif char != ',':
+                self._error("Expecting ',' or ']'", -1)
+
+    def _scan(self):
+        """Moves past the value at the current position without building
+        it.
+
+        :rtype: None
+        """
+
+        char = self._buf[self._pos]
+        if char == '"':
+            self._pos += 1
+            self._scan_string()
+        elif char in '{[':
+            depth = 0
+            while True:
+                match = _SPECIAL.search(self._buf, self._pos)
+                if match is None:
+                    self._pos = len(self._buf)
+                    self._fill_or_fail()
+                    continue
+
+                self._pos = match.end()
+                char = match.group()
+                if char == '"':
+                    self._scan_string()
+                elif char in '{[':
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        return None
+        else:
+            while True:
+                end = _SCALAR.match(self._buf, self._pos).end()
+                if end < len(self._buf) or not self._fill():
+                    break
+            if end == self._pos:
+                self._error('Expecting value')
+            self._pos = end
+
+    def _scan_string(self):
+        """Moves past the rest of a string whose opening quote was just
+        consumed.
+
+        :rtype: None
+        """
+
+        while True:
+            match = _STRING_BODY.match(self._buf, self._pos)
+            if match is not None:
+                self._pos = match.end()
+                return None
+            self._fill_or_fail()
+
+    def _peek(self):
+        """
+        :returns: the next non-whitespace character
+        :rtype: str
+        """
+
+        self._skip_whitespace()
+        if self._pos >= len(self._buf):
+            self._error('Unexpected end of data')
+        return self._buf[self._pos]
+
+    def _expect(self, char):
+        if self._peek() != char:
+            self._error("Expecting '{}'".format(char))
+        self._pos += 1
+
+    def _skip_whitespace(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf) or not self._fill():
+                return None
+
+    def _fill(self):
+        """Reads the next chunk into the buffer, dropping the consumed
+        input that is not being captured.
+
+        :returns: False at the end of the input; True otherwise
+        :rtype: bool
+        """
+
+        if self._eof:
+            return False
+
+        try:
+            text = self._decoder.decode(next(self._chunks))
+        except StopIteration:
+            text = self._decoder.decode(b'', True)
+            self._eof = True
+
+        cut = self._pos if self._mark is None else self._mark
+        self._buf = self._buf[cut:] + text
+        self._pos -= cut
+        if self._mark is not None:
+            self._mark -= cut
+        return True
+
+    def _fill_or_fail(self):
+        if not self._fill():
+            self._error('Unexpected end of data')
+
+    def _error(self, msg, offset=0):
+        raise ValueError('{} near {!r}'.format(
+            msg, self._buf[self._pos + offset:self._pos + offset + 20]))
@@ -8,6 +8,18 @@ from six.moves import urllib
 
 logger = util.get_logger(__name__)
 
+DEFAULT_INFO_TTL = 600
+"""Seconds for which a Marathon's v2/info response is reused."""
+
+MIN_VERSION = LooseVersion('0.8.1')
+"""Oldest supported Marathon version."""
+
+EVENT_READ_TIMEOUT = 30
+"""Seconds without any data after which an event stream is abandoned."""
+
+TASK_KILL_BATCH_SIZE = 100
+"""Number of task ids sent in each v2/tasks/delete request."""
+
 
 def create_client(config=None):
     """Creates a Marathon client with the supplied configuration.
@@ -22,9 +34,10 @@ def create_client(config=None):
         config = util.get_config()
 
     marathon_url = _get_marathon_url(config)
+    info_ttl = config.get('marathon.info_ttl', DEFAULT_INFO_TTL)
 
     logger.info('Creating marathon client with: %r', marathon_url)
-    return Client(marathon_url)
+    return Client(marathon_url, info_ttl)
 
 
 def _get_marathon_url(config):
@@ -69,25 +82,85 @@ def _to_exception(response):
     return DCOSException('Error: {}'.format(response.json()['message']))
 
 
+class EventStream(object):
+    """Iterable over the events of a v2/events subscription.  Iteration
+    raises a DCOSException if the stream is interrupted.
+
+    :param response: streamed v2/events response
+    :type response: Response
+    :param event_types: event types to return, or None for all
+    :type event_types: [str]
+    """
+
+    def __init__(self, response, event_types):
+        self._response = response
+        self._event_types = event_types
+
+    def __iter__(self):
+        for event_type, data in http.stream_events(self._response):
+            if (self._event_types is not None and
+                    event_type not in self._event_types):
+                continue
+            try:
+                yield json.loads(data)
+            except ValueError:
+                logger.warning('Ignoring malformed %s event: %r',
+                               event_type, data)
+
+    def close(self):
+        """Ends the subscription.
+
+        :rtype: None
+        """
+
+        self._response.close()
+
+
+def _is_success_or_not_found(status_code):
+    """
+    :param status_code: the http response status
+    :type status_code: int
+    :returns: True for success and 404 Not Found; False otherwise
+    :rtype: bool
+    """
+
+    return 200 <= status_code < 300 or status_code == 404
+
+
+def _task_app_id(task_id):
+    """Returns the id of the app that a task belongs to, based on
+    Marathon's task naming scheme: the app id with '/' replaced by '_',
+    followed by '.' and a UUID.
+
+    :param task_id: the id of the task
+    :type task_id: str
+    :returns: the app id, or None if `task_id` doesn't follow the scheme
+    :rtype: str
+    """
+
+    app_part, _, _ = task_id.rpartition('.')
+    if not app_part:
+        return None
+    return '/' + app_part.replace('_', '/')
+
+
 class Client(object):
     """Class for talking to the Marathon server.
 
     :param marathon_url: the base URL for the Marathon server
     :type marathon_url: str
+    :param info_ttl: seconds for which the server's v2/info response is
+                     reused, across invocations, to learn its version
+    :type info_ttl: float
     """
 
-    def __init__(self, marathon_url):
+    def __init__(self, marathon_url, info_ttl=DEFAULT_INFO_TTL):
         self._base_url = marathon_url
+        self._info_ttl = info_ttl
+        self._version = None
 
-        min_version = "0.8.1"
-        version = LooseVersion(self.get_about()["version"])
-        self._version = version
-        if version < LooseVersion(min_version):
-            msg = ("The configured Marathon with version {0} is outdated. " +
-                   "Please use version {1} or later.").format(
-                       version,
-                       min_version)
-            raise DCOSException(msg)
+        # id -> task index, built when a full v2/tasks listing is needed
+        self._tasks_by_id = None
 
     def _create_url(self, path):
         """Creates the url from the provided path.
@@ -100,11 +173,30 @@ class Client(object):
         return urllib.parse.urljoin(self._base_url, path)
 
     def get_version(self):
-        """Get marathon version
+        """Get marathon version.  The version is only looked up when a
+        version dependent feature needs it, and the v2/info response it
+        comes from is cached for `info_ttl` seconds.  Raises a
+        DCOSException if the server is older than the supported version.
+
         :returns: marathon version
         rtype: LooseVersion
         """
 
+        if self._version is None:
+            url = self._create_url('v2/info')
+            response = http.cached_get(url,
+                                       to_exception=_to_exception,
+                                       ttl=self._info_ttl)
+
+            version = LooseVersion(response.json()["version"])
+            if version < MIN_VERSION:
+                msg = ("The configured Marathon with version {0} is " +
+                       "outdated. Please use version {1} or later.").format(
+                           version,
+                           MIN_VERSION)
+                raise DCOSException(msg)
+            self._version = version
+
         return self._version
 
     def get_about(self):
@@ -213,16 +305,25 @@ class Client(object):
         else:
             return response.json()['versions'][:max_count]
 
-    def get_apps(self):
+    def get_apps(self, embed=None):
         """Get a list of known applications.
 
+        :param embed: related resources to embed in each app, such as
+                      'apps.tasks', 'apps.counts' or 'apps.deployments'
+        :type embed: [str]
         :returns: list of known applications
         :rtype: [dict]
         """
 
         url = self._create_url('v2/apps')
 
-        response = http.get(url, to_exception=_to_exception)
+        params = None
+        if embed:
+            params = {'embed': embed}
+
+        response = http.cached_get(url,
+                                   to_exception=_to_exception,
+                                   params=params)
 
         return response.json()['apps']
 
@@ -445,6 +546,42 @@ class Client(object):
 
         return deployment
 
+    def get_events(self, event_types=None, timeout=EVENT_READ_TIMEOUT):
+        """Subscribes to Marathon's v2/events stream.  The subscription is
+        in place when this method returns, so no event that happens
+        afterwards is missed.  Raises a DCOSException if Marathon
+        doesn't serve an event stream.
+
+        :param event_types: event types to return, or None for all
+        :type event_types: [str]
+        :param timeout: seconds to wait for data before the iteration
+                        fails with a DCOSException
+        :type timeout: float
+        :returns: the events, as they happen
+        :rtype: EventStream
+        """
+
+        url = self._create_url('v2/events')
+
+        # newer servers filter the events themselves
+        params = None
+        if event_types is not None:
+            params = {'event_type': event_types}
+
+        response = http.get(url,
+                            params=params,
+                            headers={'Accept': 'text/event-stream'},
+                            stream=True,
+                            timeout=timeout)
+
+        content_type = response.headers.get('Content-Type', '')
+        if not content_type.startswith('text/event-stream'):
+            response.close()
+            raise DCOSException(
+                'Marathon at [{}] did not return an event stream'.format(url))
+
+        return EventStream(response, event_types)
+
     def get_deployments(self, app_id=None):
         """Returns a list of deployments, optionally limited to an app.
 
@@ -522,7 +659,9 @@ class Client(object):
         self._cancel_deployment(deployment_id, True)
 
     def get_tasks(self, app_id):
-        """Returns a list of tasks, optionally limited to an app.
+        """Returns a list of tasks, optionally limited to an app.  An app's
+        tasks are fetched from v2/apps/<app-id>/tasks, so that only
+        that app's tasks are downloaded.
 
         :param app_id: the id of the application to restart
         :type app_id: str
@@ -530,23 +669,26 @@ class Client(object):
         :rtype: [dict]
         """
 
-        url = self._create_url('v2/tasks')
+        if app_id is None:
+            return self._get_all_tasks()
 
-        response = http.get(url, to_exception=_to_exception)
+        app_id = self.normalize_app_id(app_id)
+        url = self._create_url('v2/apps{}/tasks'.format(app_id))
 
-        if app_id is not None:
-            app_id = self.normalize_app_id(app_id)
-            tasks = [
-                task for task in response.json()['tasks']
-                if app_id == task['appId']
-            ]
-        else:
-            tasks = response.json()['tasks']
+        response = http.get(url,
+                            is_success=_is_success_or_not_found,
+                            to_exception=_to_exception)
+
+        # an unknown app has no tasks
+        if response.status_code == 404:
+            return []
 
-        return tasks
+        return response.json()['tasks']
 
     def get_task(self, task_id):
-        """Returns a task
+        """Returns a task.  Marathon names tasks after their app, so the
+        task is first looked up among the tasks of the app its id
+        refers to.  Only if that fails are all tasks listed.
 
         :param task_id: the id of the task
         :type task_id: str
@@ -554,16 +696,86 @@ class Client(object):
         :rtype: dict
         """
 
+        app_id = _task_app_id(task_id)
+        if app_id is not None and self._tasks_by_id is None:
+            task = next(
+                (task for task in self.get_tasks(app_id)
+                 if task_id == task['id']),
+                None)
+            if task is not None:
+                return task
+
+        if self._tasks_by_id is None:
+            self._tasks_by_id = {task['id']: task
+                                 for task in self._get_all_tasks()}
+
+        return self._tasks_by_id.get(task_id)
+
+    def _get_all_tasks(self):
+        """
+        :returns: every task known to Marathon
+        :rtype: [dict]
+        """
+
         url = self._create_url('v2/tasks')
 
         response = http.get(url, to_exception=_to_exception)
 
-        task = next(
-            (task for task in response.json()['tasks']
-             if task_id == task['id']),
-            None)
+        return response.json()['tasks']
+
+    def kill_tasks(self, task_ids, scale=False,
+                   batch_size=TASK_KILL_BATCH_SIZE):
+        """Kills tasks through the v2/tasks/delete endpoint, sending
+        `batch_size` task ids per request.  If a request fails, the error
+        lists the tasks that the earlier requests killed.
+
+        :param task_ids: the ids of the tasks to kill
+        :type task_ids: [str]
+        :param scale: whether to scale down the apps of the killed tasks,
+                      instead of letting Marathon replace them
+        :type scale: bool
+        :param batch_size: number of task ids sent per request
+        :type batch_size: int
+        :returns: the killed tasks and the deployments created to scale
+                  down their apps
+        :rtype: {'tasks': [dict], 'deploymentIds': [str]}
+        """
 
-        return task
+        if not scale:
+            params = None
+        else:
+            params = {'scale': 'true'}
+
+        url = self._create_url('v2/tasks/delete')
+
+        result = {'tasks': [], 'deploymentIds': []}
+        killed = []
+        for start in range(0, len(task_ids), batch_size):
+            batch = task_ids[start:start + batch_size]
+            try:
+                response = http.post(
+                    url,
+                    params=params,
+                    json={'ids': batch},
+                    to_exception=_to_exception)
+            except DCOSException as e:
+                if not killed:
+                    raise
+                # the earlier batches can't be undone; say what they did
+                message = '{}\nKilled tasks before the error: {}'.format(
+                    e, ', '.join(killed))
+                if result['deploymentIds']:
+                    message += '\nCreated deployments: {}'.format(
+                        ', '.join(result['deploymentIds']))
+                raise DCOSException(message)
+
+            killed.extend(batch)
+            body = response.json()
+            result['tasks'].extend(body.get('tasks', []))
+            if body.get('deploymentId') is not None:
+                result['deploymentIds'].append(body['deploymentId'])
+
+        return result
 
     def get_app_schema(self):
         """Returns app json schema
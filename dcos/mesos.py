@@ -1,8 +1,10 @@
+import collections
 import fnmatch
+import io
 import itertools
 import os
 
-from dcos import http, util
+from dcos import http, jsonstream, util
 from dcos.errors import DCOSException
 
 from six.moves import urllib
@@ -11,19 +13,34 @@ logger = util.get_logger(__name__)
 
 MESOS_TIMEOUT = 5
 
+STATE_CHUNK_SIZE = 64 * 1024
+"""Number of bytes read at a time when projecting a streamed state.json."""
 
-def get_master():
+FILE_BLOCK_SIZE = 64 * 1024
+"""Number of bytes a MesosFile fetches per files/read.json request."""
+
+FILE_CACHE_BLOCKS = 16
+"""Number of complete blocks each MesosFile keeps in its page cache."""
+
+_unreachable_slaves = set()
+"""Ids of the slaves that could not be reached directly.  They are
+reached through the DCOS proxy for the rest of the process, by every
+MesosClient."""
+
+
+def get_master(paths=None):
     """Create a Master object using the url stored in the
     'core.mesos_master_url' property if it exists.  Otherwise, we use
     the `core.dcos_url` property
 
-    :param config: user config
-    :type config: Toml
+    :param paths: If set, only these key paths of the master's
+                  state.json are kept (see py:func:`jsonstream.parse_paths`)
+    :type paths: [str]
     :returns: master state object
     :rtype: Master
     """
 
-    return Master(MesosClient().get_master_state())
+    return Master(MesosClient().get_master_state(paths))
 
 
 class MesosClient:
@@ -40,6 +57,11 @@ class MesosClient:
         else:
             self._mesos_master_url = mesos_master_url
 
+        # Without a DCOS URL there is no proxy, so slaves are always
+        # reached directly
+        self._slave_direct = (self._dcos_url is None or
+                              config.get('core.mesos_slave_direct', False))
+
     def master_url(self, path):
         """ Create a URL that hits the master
 
@@ -53,42 +75,96 @@ class MesosClient:
                     urllib.parse.urljoin(self._dcos_url, 'mesos/'))
         return urllib.parse.urljoin(base_url, path)
 
-    # TODO (mgummelt): this doesn't work with self._mesos_master_url
-    def slave_url(self, slave_id, path):
-        """ Create a URL that hits the slave
+    def slave_url(self, slave_id, private_url, path):
+        """ Create a URL that hits the slave.  Goes through the DCOS proxy
+        if there is one.
 
         :param slave_id: slave ID
         :type slave_id: str
+        :param private_url: The slave's private URL derived from its
+                            pid.  Used when there's no DCOS proxy.
+        :type private_url: str
         :param path: the path suffix of the desired URL
         :type path: str
-        :returns: URL that hits the master
+        :returns: URL that hits the slave
         :rtype: str
         """
 
+        if self._dcos_url is None:
+            return urllib.parse.urljoin(private_url, path)
         return urllib.parse.urljoin(self._dcos_url,
                                     'slave/{}/{}'.format(slave_id, path))
 
-    def get_master_state(self):
-        """Get the Mesos master state json object
+    def slave_get(self, slave_id, private_url, path, **kwargs):
+        """GET a resource from a slave.  If `core.mesos_slave_direct` is
+        set, the slave is contacted at its private URL, and the DCOS
+        proxy is only used once the slave turns out to be unreachable.
+
+        :param slave_id: slave ID
+        :type slave_id: str
+        :param private_url: The slave's private URL derived from its pid
+        :type private_url: str
+        :param path: the path suffix of the desired URL
+        :type path: str
+        :param kwargs: http.get kwargs
+        :type kwargs: dict
+        :returns: the response object
+        :rtype: Response
+        """
 
+        if self._slave_direct and slave_id not in _unreachable_slaves:
+            url = urllib.parse.urljoin(private_url, path)
+            try:
+                return http.get(url, to_exception=_to_direct_exception,
+                                **kwargs)
+            except _SlaveUnreachable as e:
+                if self._dcos_url is None:
+                    raise
+                logger.warning(
+                    'Falling back to the DCOS proxy for slave %s: %s',
+                    slave_id, e)
+                _unreachable_slaves.add(slave_id)
+
+        url = self.slave_url(slave_id, private_url, path)
+        return http.get(url, **kwargs)
+
+    def get_master_state(self, paths=None):
+        """Get the Mesos master state json object.  If `paths` is set, the
+        response is parsed as it streams in, and only the values at
+        `paths` are kept.  Commands that use a small part of a large
+        state.json should pass the key paths they need.
+
+        :param paths: key paths to keep, e.g. 'frameworks[].{id,name}'
+                      (see py:func:`jsonstream.parse_paths`)
+        :type paths: [str]
         :returns: Mesos' master state json object
         :rtype: dict
         """
 
         url = self.master_url('master/state.json')
-        return http.get(url).json()
-
-    def get_slave_state(self, slave_id):
+        if paths is None:
+            return http.cached_get(url).json()
+
+        # a cached state.json is projected from the cached body
+        response = http.cached_get(url, stream=True)
+        try:
+            return jsonstream.project(
+                response.iter_content(STATE_CHUNK_SIZE), paths)
+        finally:
+            response.close()
+
+    def get_slave_state(self, slave_id, private_url):
         """Get the Mesos slave state json object
 
         :param slave_id: slave ID
         :type slave_id: str
+        :param private_url: The slave's private URL derived from its pid
+        :type private_url: str
         :returns: Mesos' master state json object
         :rtype: dict
         """
 
-        url = self.slave_url(slave_id, 'state.json')
-        return http.get(url).json()
+        return self.slave_get(slave_id, private_url, 'state.json').json()
 
     def get_state_summary(self):
         """Get the Mesos master state summary json object
@@ -127,6 +203,10 @@ class Master(object):
         self._frameworks = {}
         self._slaves = {}
 
+        # id-keyed indexes over the raw dicts, built on first use
+        self._slaves_by_id = None
+        self._frameworks_by_id = None
+
     def state(self):
         """Returns master's master/state.json.
 
@@ -153,7 +233,9 @@ class Master(object):
 
     def slave(self, fltr):
         """Returns the slave that has `fltr` in its id.  Raises a
-        DCOSException if there is not exactly one such slave.
+        DCOSException if there is not exactly one such slave.  If `fltr`
+        is the exact id of a slave, that slave is returned without
+        scanning the others.
 
         :param fltr: filter string
         :type fltr: str
@@ -161,13 +243,17 @@ class Master(object):
         :rtype: Slave
         """
 
+        slave = self._slave_index().get(fltr)
+        if slave is not None:
+            return self._slave_obj(slave)
+
         slaves = self.slaves(fltr)
 
         if len(slaves) == 0:
             raise DCOSException('Slave {} no longer exists'.format(fltr))
 
         elif len(slaves) > 1:
-            matches = ['\t{0}'.format(slave.id) for slave in slaves]
+            matches = ['\t{0}'.format(slave['id']) for slave in slaves]
             raise DCOSException(
                 "There are multiple slaves with that id. " +
                 "Please choose one: {}".format('\n'.join(matches)))
@@ -208,10 +294,10 @@ class Master(object):
         :rtype: Framework
         """
 
-        for f in self._framework_dicts(True, True):
-            if f['id'] == framework_id:
-                return self._framework_obj(f)
-        return None
+        framework = self._framework_index().get(framework_id)
+        if framework is None:
+            return None
+        return self._framework_obj(framework)
 
     def slaves(self, fltr=""):
         """Returns those slaves that have `fltr` in their 'id'
@@ -308,6 +394,31 @@ class Master(object):
             self._frameworks[framework['id']] = Framework(framework, self)
         return self._frameworks[framework['id']]
 
+    def _slave_index(self):
+        """Returns the slave dictionaries keyed by id.  The index is built
+        once per state snapshot.
+
+        :returns: slave id -> slave dict
+        :rtype: dict
+        """
+
+        if self._slaves_by_id is None:
+            self._slaves_by_id = _index_by_id(self.state()['slaves'])
+        return self._slaves_by_id
+
+    def _framework_index(self):
+        """Returns the active, inactive and completed framework dictionaries
+        keyed by id.  The index is built once per state snapshot.
+
+        :returns: framework id -> framework dict
+        :rtype: dict
+        """
+
+        if self._frameworks_by_id is None:
+            self._frameworks_by_id = _index_by_id(
+                self._framework_dicts(True, True))
+        return self._frameworks_by_id
+
     def _framework_dicts(self, inactive=False, completed=False):
         """Returns a list of all frameworks as their raw dictionaries
 
@@ -337,10 +448,13 @@ class Slave(object):
     :type master: Master
     """
 
+    __slots__ = ('_short_state', '_state', '_master', '_executors_by_task_id')
+
     def __init__(self, short_state, state, master):
         self._short_state = short_state
         self._state = state
         self._master = master
+        self._executors_by_task_id = None
 
     def state(self):
         """Get the slave's state.json object.  Fetch it if it's not already
@@ -351,9 +465,48 @@ class Slave(object):
         """
 
         if not self._state:
-            self._state = MesosClient().get_slave_state(self['id'])
+            self._state = MesosClient().get_slave_state(self['id'],
+                                                        self.private_url())
+            self._executors_by_task_id = None
         return self._state
 
+    def private_url(self):
+        """Returns the slave's own URL, derived from its pid.
+
+        :returns: the slave's private URL
+        :rtype: str
+        """
+
+        _, ip, port = parse_pid(self['pid'])
+        return 'http://{}:{}/'.format(ip, port)
+
+    def executor(self, task_id):
+        """Returns the executor that runs, ran or will run the task with
+        id `task_id`.  The task id -> executor map is built once per
+        loaded state.json.
+
+        :param task_id: the task's id
+        :type task_id: str
+        :returns: the task's executor, or None if the slave has no
+                  record of the task
+        :rtype: dict | None
+        """
+
+        if self._executors_by_task_id is None:
+            self.state()
+
+            executors_by_task_id = {}
+            for executor in self.executor_dicts():
+                tasks = _merge(executor,
+                               ['completed_tasks',
+                                'tasks',
+                                'queued_tasks'])
+                for task in tasks:
+                    executors_by_task_id.setdefault(task['id'], executor)
+            self._executors_by_task_id = executors_by_task_id
+
+        return self._executors_by_task_id.get(task_id)
+
     def _framework_dicts(self):
         """Returns the framework dictionaries from the state.json dict
 
@@ -396,10 +549,13 @@ class Framework(object):
     :type master: Master
     """
 
+    __slots__ = ('_framework', '_master', '_tasks', '_tasks_by_id')
+
     def __init__(self, framework, master):
         self._framework = framework
         self._master = master
         self._tasks = {}  # id->Task map
+        self._tasks_by_id = None  # id->task dict index, built on first use
 
     def task(self, task_id):
         """Returns a task by id
@@ -410,10 +566,14 @@ class Framework(object):
         :rtype: Task
         """
 
-        for task in _merge(self._framework, ['tasks', 'completed_tasks']):
-            if task['id'] == task_id:
-                return self._task_obj(task)
-        return None
+        if self._tasks_by_id is None:
+            self._tasks_by_id = _index_by_id(
+                _merge(self._framework, ['tasks', 'completed_tasks']))
+
+        task = self._tasks_by_id.get(task_id)
+        if task is None:
+            return None
+        return self._task_obj(task)
 
     def _task_obj(self, task):
         """Returns the Task object corresponding to the provided `task`
@@ -454,6 +614,10 @@ class Task(object):
     :type master: Master
     """
 
+    # one Task is created per listed task, which may be hundreds of
+    # thousands with --completed
+    __slots__ = ('_task', '_master')
+
     def __init__(self, task, master):
         self._task = task
         self._master = master
@@ -499,14 +663,8 @@ class Task(object):
         :returns: task's executor
         :rtype: dict
         """
-        for executor in self.slave().executor_dicts():
-            tasks = _merge(executor,
-                           ['completed_tasks',
-                            'tasks',
-                            'queued_tasks'])
-            if any(task['id'] == self['id'] for task in tasks):
-                return executor
-        return None
+
+        return self.slave().executor(self['id'])
 
     def directory(self):
         """ Sandbox directory for this task
@@ -529,9 +687,9 @@ class Task(object):
         return self._task[name]
 
 
-class MesosFile(object):
-    """File-like object that is backed by a remote slave file.  Uses the
-    files/read.json endpoint.  This endpoint isn't well documented
+class MesosFile(io.RawIOBase):
+    """Seekable binary stream that is backed by a remote slave file.  Uses
+    the files/read.json endpoint.  This endpoint isn't well documented
     anywhere, so here is the spec derived from the mesos source code:
 
     request format:
@@ -554,18 +712,55 @@ class MesosFile(object):
               file if the request offset was -1 or >= the file size.
     }
 
+    The file is fetched in blocks of `block_size` bytes, aligned on
+    multiples of `block_size`.  Complete blocks are kept in a small LRU
+    page cache keyed by their offset, so that `readline()`, line
+    iteration and backward scans don't fetch the same range twice.  The
+    incomplete block at the end of the file is never cached, since the
+    file may still be growing.
+
     :param task: file's task
     :type task: Task
     :param path: file's path, relative to the sandbox
     :type path: str
+    :param mesos_client: client used to build the slave's URL
+    :type mesos_client: MesosClient
+    :param block_size: number of bytes fetched per read.json request
+    :type block_size: int
+    :param cache_blocks: maximum number of complete blocks to cache
+    :type cache_blocks: int
     """
 
-    def __init__(self, task, path, mesos_client):
+    def __init__(self, task, path, mesos_client,
+                 block_size=FILE_BLOCK_SIZE,
+                 cache_blocks=FILE_CACHE_BLOCKS):
+        super(MesosFile, self).__init__()
         self._task = task
         self._path = path
         self._mesos_client = mesos_client
+        self._block_size = block_size
+        self._cache_blocks = cache_blocks
+        self._blocks = collections.OrderedDict()  # offset -> bytes
         self._cursor = 0
 
+        # resolved on first use, then reused for every read.json fetch
+        self._sandbox_path = None
+        self._slave = None
+
+    def task(self):
+        """
+        :returns: the task whose sandbox holds this file
+        :rtype: Task
+        """
+
+        return self._task
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
     def size(self):
         """Size of the file
 
@@ -586,8 +781,8 @@ class MesosFile(object):
                        beginning of the file, or relative to the end
                        of the file
         :type whence: os.SEEK_SET | os.SEEK_CUR | os.SEEK_END
-        :returns: None
-        :rtype: None
+        :returns: the new cursor position
+        :rtype: int
         """
 
         if whence == os.SEEK_SET:
@@ -600,6 +795,8 @@ class MesosFile(object):
             raise ValueError(
                 "Unexpected value for `whence`: {}".format(whence))
 
+        return self._cursor
+
     def tell(self):
         """ The current cursor position.
 
@@ -609,37 +806,146 @@ class MesosFile(object):
 
         return self._cursor
 
+    def readinto(self, b):
+        """Reads up to len(b) bytes into `b`, without crossing a block
+        boundary.
+
+        :param b: buffer to fill
+        :type b: bytearray | memoryview
+        :returns: number of bytes read.  0 at EOF.
+        :rtype: int
+        """
+
+        block_start, block = self._block()
+        start = self._cursor - block_start
+        data = block[start:start + len(b)]
+
+        b[:len(data)] = data
+        self._cursor += len(data)
+        return len(data)
+
     def read(self, length=None):
-        """Reads up to `length` bytes, or the entire file if `length` is None.
+        """Reads up to `length` bytes, or the rest of the file if `length`
+        is None or negative.
 
         :param length: number of bytes to read
         :type length: int | None
         :returns: data read
-        :rtype: str
+        :rtype: bytes
+        """
+
+        if length is None or length < 0:
+            return self.readall()
+
+        buf = bytearray(length)
+        view = memoryview(buf)
+        read = 0
+        while read < length:
+            n = self.readinto(view[read:])
+            if n == 0:
+                break
+            read += n
+
+        return bytes(buf[:read])
+
+    def readall(self):
+        """Reads the rest of the file.
+
+        :returns: data read
+        :rtype: bytes
+        """
+
+        chunks = []
+        while True:
+            block_start, block = self._block()
+            chunk = block[self._cursor - block_start:]
+            if not chunk:
+                break
+            chunks.append(chunk)
+            self._cursor += len(chunk)
+
+        return b''.join(chunks)
+
+    def readline(self, limit=-1):
+        """Reads up to and including the next newline, or at most `limit`
+        bytes if `limit` is not negative.
+
+        :param limit: maximum number of bytes to read
+        :type limit: int
+        :returns: the line, or b'' at EOF
+        :rtype: bytes
         """
 
-        data = ''
-        while length is None or length - len(data) > 0:
-            chunk_length = -1 if length is None else length - len(data)
-            chunk = self._fetch_chunk(chunk_length)
-            if chunk == '':
+        if limit is None:
+            limit = -1
+
+        chunks = []
+        while limit != 0:
+            block_start, block = self._block()
+            start = self._cursor - block_start
+            end = len(block) if limit < 0 else min(len(block), start + limit)
+            if start >= end:
+                break
+
+            newline = block.find(b'\n', start, end)
+            if newline >= 0:
+                end = newline + 1
+
+            chunks.append(block[start:end])
+            self._cursor += end - start
+            if limit > 0:
+                limit -= end - start
+            if newline >= 0:
                 break
-            data += chunk
 
-        return data
+        return b''.join(chunks)
+
+    def _block(self):
+        """Returns the block that contains the cursor, fetching it if it
+        isn't cached.
+
+        :returns: the block's offset and data
+        :rtype: (int, bytes)
+        """
+
+        block_start = self._cursor - self._cursor % self._block_size
+
+        block = self._blocks.get(block_start)
+        if block is not None:
+            # mark as most recently used
+            del self._blocks[block_start]
+            self._blocks[block_start] = block
+            return block_start, block
+
+        # fetch from the cursor, so that a block the server returned
+        # partially isn't fetched again from its start
+        data = self._fetch_bytes(block_start + self._block_size - self._cursor,
+                                 self._cursor)
+        if self._cursor != block_start:
+            return self._cursor, data
+
+        if len(data) == self._block_size:
+            self._blocks[block_start] = data
+            if len(self._blocks) > self._cache_blocks:
+                self._blocks.popitem(last=False)
+
+        return block_start, data
 
     def _host_path(self):
-        """ The absolute path to the file on slave.
+        """ The absolute path to the file on slave.  The task's sandbox is
+        only looked up the first time.
 
         :returns: the absolute path to the file on slave
         :rtype: str
         """
 
-        directory = self._task.directory()
-        if directory[-1] == '/':
-            return directory + self._path
-        else:
-            return directory + '/' + self._path
+        if self._sandbox_path is None:
+            directory = self._task.directory()
+            if directory[-1] == '/':
+                self._sandbox_path = directory + self._path
+            else:
+                self._sandbox_path = directory + '/' + self._path
+        return self._sandbox_path
 
     def _params(self, length, offset=None):
         """GET parameters to send to files/read.json.  See the MesosFile
@@ -663,25 +969,19 @@ class MesosFile(object):
             'length': length
         }
 
-    def _fetch_chunk(self, length, offset=None):
+    def _fetch_bytes(self, length, offset):
         """Fetch data from files/read.json
 
         :param length: number of bytes to fetch
         :type length: int
-        :param offset: start location.  If not None, this file's
-                       cursor is set to `offset`
+        :param offset: start location
         :type offset: int
         :returns: data read
-        :rtype: str
+        :rtype: bytes
         """
 
-        if offset is not None:
-            self.seek(offset, os.SEEK_SET)
-
-        params = self._params(length)
-        data = self._fetch(params)["data"]
-        self.seek(len(data), os.SEEK_CUR)
-        return data
+        params = self._params(length, offset)
+        return self._fetch(params)["data"].encode('utf-8')
 
     def _fetch(self, params):
         """Fetch data from files/read.json
@@ -692,9 +992,13 @@ class MesosFile(object):
         :rtype: dict
         """
 
-        read_url = self._mesos_client.slave_url(self._task.slave()['id'],
-                                                'files/read.json')
-        return http.get(read_url, params=params).json()
+        if self._slave is None:
+            self._slave = self._task.slave()
+
+        return self._mesos_client.slave_get(self._slave['id'],
+                                            self._slave.private_url(),
+                                            'files/read.json',
+                                            params=params).json()
 
     def __str__(self):
         """String representation of the file: <task_id:file_path>
@@ -706,6 +1010,31 @@ class MesosFile(object):
         return "{0}:{1}".format(self._task['id'], self._path)
 
 
+class _SlaveUnreachable(DCOSException):
+    """A slave could not be reached at its private URL"""
+
+    pass
+
+
+def _to_direct_exception(response):
+    """Exception builder for requests sent directly to a slave.  Errors
+    raised before a response is received mean that the slave is
+    unreachable.
+
+    :param response: HTTP response object or Exception
+    :type response: requests.Response | Exception
+    :returns: exception
+    :rtype: Exception
+    """
+
+    if isinstance(response, Exception):
+        return _SlaveUnreachable(str(response))
+
+    return DCOSException(
+        'Error while fetching [{0}]: HTTP {1}: {2}'.format(
+            response.request.url, response.status_code, response.reason))
+
+
 def parse_pid(pid):
     """ Parse the mesos pid string,
 
@@ -720,6 +1049,22 @@ def parse_pid(pid):
     return id_, ip, port
 
 
+def _index_by_id(dicts):
+    """ Index dictionaries by their 'id' field.  If several share an id,
+    the first one wins, matching the result of a linear scan.
+
+    :param dicts: dictionaries with an 'id' key
+    :type dicts: iterable of dict
+    :returns: id -> dict
+    :rtype: dict
+    """
+
+    index = {}
+    for d in dicts:
+        index.setdefault(d['id'], d)
+    return index
+
+
 def _merge(d, keys):
     """ Merge multiple lists from a dictionary into one iterator.
         e.g. _merge({'a': [1, 2], 'b': [3]}, ['a', 'b']) ->
@@ -733,4 +1078,4 @@ def _merge(d, keys):
     :rtype: iter
     """
 
-    return itertools.chain(*[d[k] for k in keys])
+    return itertools.chain(*[d.get(k, []) for k in keys])
@@ -1,21 +1,30 @@
 import abc
 import base64
 import collections
+import contextlib
 import copy
 import hashlib
 import json
+import mmap
 import os
 import shutil
 import stat
+import struct
 import subprocess
+import tarfile
+import tempfile
+import time
 import zipfile
+import zlib
 from distutils.version import LooseVersion
 
+import concurrent.futures
 import git
 import portalocker
 import pystache
 import six
-from dcos import constants, emitting, errors, marathon, mesos, subcommand, util
+from dcos import (constants, emitting, errors, http, marathon, mesos,
+                  subcommand, util)
 from dcos.errors import DCOSException
 
 from six.moves import urllib
@@ -25,6 +34,61 @@ logger = util.get_logger(__name__)
 emitter = emitting.FlatEmitter()
 
 
+TASK_FETCH_CONCURRENCY = 8
+"""Number of apps whose tasks are fetched concurrently when Marathon
+didn't embed them.  If more apps need their tasks, all tasks are listed
+in a single request instead."""
+
+SOURCE_UPDATE_CONCURRENCY = 4
+"""Number of package sources that are fetched concurrently."""
+
+STAGE_REGISTRY_DIR = 'registry'
+"""Directory of a staging directory that a source is fetched into."""
+
+SOURCE_METADATA_FILE = 'source-metadata.json'
+"""File of a cached registry that describes the fetched source content."""
+
+HTTP_SOURCE_TIMEOUT = 60
+"""Seconds to wait for data when downloading an HTTP source."""
+
+HTTP_SOURCE_CHUNK_SIZE = 65536
+"""Size of the blocks in which an HTTP source is downloaded."""
+
+HTTP_SOURCE_SPOOL_SIZE = 16 * 1024 * 1024
+"""Size up to which a downloaded HTTP source is kept in memory."""
+
+PACK_FILE = 'packages.pack'
+"""File of a cached registry that packs the package definitions."""
+
+PACK_HEADER = struct.Struct('>8sQ')
+"""Header of a pack: its magic and the length of its JSON index."""
+
+PACK_MAGIC = b'DCOSPAK1'
+"""Magic of the current pack format; other packs are ignored."""
+
+SEARCH_INDEX_FILE = 'search-index.bin'
+"""File of a cached registry that indexes its packages for search."""
+
+SEARCH_INDEX_HEADER = struct.Struct('>8sII')
+"""Header of a search index: its magic, the number of indexed packages
+and the number of trigrams."""
+
+SEARCH_INDEX_MAGIC = b'DCOSSRC2'
+"""Magic of the current search index format; other indexes are
+ignored."""
+
+SEARCH_INDEX_TRIGRAM = struct.Struct('>III')
+"""Entry of a trigram in a search index: the hash of the trigram, and
+the offset and number of the positions of the packages that contain
+it."""
+
+SEARCH_INDEX_POSITION = struct.Struct('>I')
+"""Position of a package in the package index."""
+
+SEARCH_FUZZY_THRESHOLD = 0.3
+"""Minimum trigram similarity of a fuzzy match with a package name or
+tag."""
+
 PACKAGE_METADATA_KEY = 'DCOS_PACKAGE_METADATA'
 PACKAGE_NAME_KEY = 'DCOS_PACKAGE_NAME'
 PACKAGE_VERSION_KEY = 'DCOS_PACKAGE_VERSION'
@@ -245,8 +309,9 @@ def uninstall_app(app_name, remove_all, app_id, init_client, mesos_client):
         if framework_name is not None:
             logger.info(
                 'Trying to shutdown framework {}'.format(framework_name))
-            frameworks = mesos.Master(mesos_client.get_master_state()) \
-                              .frameworks(inactive=True)
+            state = mesos_client.get_master_state(
+                ['frameworks[].{id,name,active}'])
+            frameworks = mesos.Master(state).frameworks(inactive=True)
 
             # Look up all the framework names
             framework_ids = [
@@ -402,7 +467,9 @@ def installed_apps(init_client, endpoints=False):
     :rtype: [dict]
     """
 
-    apps = init_client.get_apps()
+    # embedding the tasks saves one request per app
+    embed = ['apps.tasks'] if endpoints else None
+    apps = init_client.get_apps(embed=embed)
 
     encoded_apps = [(a['id'], a['labels'])
                     for a in apps
@@ -430,17 +497,60 @@ def installed_apps(init_client, endpoints=False):
         valid_apps.append(decoded)
 
     if endpoints:
+        tasks_by_app = _app_tasks(init_client, apps,
+                                  [app["appId"] for app in valid_apps])
         for app in valid_apps:
-            tasks = init_client.get_tasks(app["appId"])
+            tasks = tasks_by_app[app["appId"]]
             app['endpoints'] = [{"host": t["host"], "ports": t["ports"]}
                                 for t in tasks]
 
     return valid_apps
 
 
+def _app_tasks(init_client, apps, app_ids):
+    """Returns the tasks of each app in `app_ids`.  Tasks that Marathon
+    embedded in `apps` are used as is.  The tasks of the other apps are
+    fetched concurrently, or with one listing of all tasks if there are
+    more than TASK_FETCH_CONCURRENCY such apps.
+
+    :param init_client: The program to use to list packages
+    :type init_client: object
+    :param apps: apps returned by `init_client.get_apps`
+    :type apps: [dict]
+    :param app_ids: ids of the apps whose tasks are needed
+    :type app_ids: [str]
+    :returns: app id -> tasks
+    :rtype: dict
+    """
+
+    tasks_by_app = {app['id']: app['tasks']
+                    for app in apps
+                    if 'tasks' in app}
+
+    missing = [app_id for app_id in app_ids if app_id not in tasks_by_app]
+    if len(missing) > TASK_FETCH_CONCURRENCY:
+        grouped = {app_id: [] for app_id in missing}
+        for task in init_client.get_tasks(None):
+            app_tasks = grouped.get(task['appId'])
+            if app_tasks is not None:
+                app_tasks.append(task)
+        tasks_by_app.update(grouped)
+    elif missing:
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=TASK_FETCH_CONCURRENCY) as pool:
+            tasks_by_app.update(
+                zip(missing, pool.map(init_client.get_tasks, missing)))
+
+    return tasks_by_app
+
+
 def search(query, cfg):
     """Returns a list of index entry collections, one for each registry in
-    the supplied config.
+    the supplied config.  Packages that contain the search term in their
+    name, tags or description are ranked by where it appears.  If no
+    package contains it, packages whose name or a tag is similar to it
+    are returned instead.  An empty search term returns every package,
+    in registry order.
 
     :param query: The search term
     :type query: str
@@ -449,9 +559,6 @@ def search(query, cfg):
     :rtype: [IndexEntries]
     """
 
-    threshold = 0.5  # Minimum rank required to appear in results
-    results = []
-
     def clean_package_entry(entry):
         result = entry.copy()
         result.update({
@@ -459,46 +566,315 @@ def search(query, cfg):
         })
         return result
 
+    results = []
     for registry in registries(cfg):
-        source_results = []
-        index = registry.get_index()
-
-        for pkg in index['packages']:
-            rank = _search_rank(pkg, query)
-            if rank >= threshold:
-                source_results.append(clean_package_entry(pkg))
+        packages = registry.get_index()['packages']
+        matches = _search_matches(
+            packages, registry.get_search_index(), query.lower())
 
-        entries = IndexEntries(registry.source, source_results)
+        entries = IndexEntries(
+            registry.source,
+            [clean_package_entry(packages[i]) for i in matches])
         results.append(entries)
 
     return results
 
 
+def build_search_index(index):
+    """Builds the search index of a package index.  The search index maps
+    the trigrams of every lower-cased package name, tag and description
+    to the positions of the packages that contain them.  It is a binary
+    table of trigrams sorted by hash, followed by the positions, so that
+    it can be searched in place once memory-mapped.
+
+    :param index: package index, as returned by Registry.get_index
+    :type index: dict
+    :returns: search index
+    :rtype: bytes
+    """
+
+    packages = index['packages']
+    postings = collections.defaultdict(set)
+    for i, pkg in enumerate(packages):
+        for text in _search_texts(pkg):
+            for trigram in _trigrams(text, padded=True):
+                postings[_trigram_hash(trigram)].add(i)
+
+    table = []
+    positions = []
+    for key in sorted(postings):
+        package_positions = sorted(postings[key])
+        table.append(SEARCH_INDEX_TRIGRAM.pack(
+            key, len(positions), len(package_positions)))
+        positions.extend(package_positions)
+
+    return b''.join(
+        [SEARCH_INDEX_HEADER.pack(
+            SEARCH_INDEX_MAGIC, len(packages), len(table))] +
+        table +
+        [struct.pack('>{}I'.format(len(positions)), *positions)])
+
+
+class SearchIndex(object):
+    """Search index of a registry, read in place from the output of
+    py:func:`build_search_index`.  Looking up a trigram is a binary
+    search, so only the parts of the index that a query needs are read.
+
+    :param data: the search index
+    :type data: bytes | mmap.mmap
+    """
+
+    def __init__(self, data):
+        magic, self._package_count, self._trigram_count = \
+            SEARCH_INDEX_HEADER.unpack_from(data)
+        if magic != SEARCH_INDEX_MAGIC:
+            raise ValueError('Unknown search index format')
+
+        self._data = data
+        self._positions_start = (SEARCH_INDEX_HEADER.size +
+                                 self._trigram_count *
+                                 SEARCH_INDEX_TRIGRAM.size)
+
+    @property
+    def package_count(self):
+        """Returns the number of packages that were indexed.
+
+        :rtype: int
+        """
+
+        return self._package_count
+
+    def containing(self, trigrams):
+        """
+        :param trigrams: trigrams of a query
+        :type trigrams: set of str
+        :returns: the positions of the packages that may contain every
+                  trigram, in order
+        :rtype: [int]
+        """
+
+        # intersect the shortest lists first; lists of every package
+        # don't narrow anything down, and are not read
+        entries = sorted((self._lookup(trigram) for trigram in trigrams),
+                         key=lambda entry: entry[1])
+        entries = [entry for entry in entries
+                   if entry[1] < self._package_count]
+        if not entries:
+            return list(range(self._package_count))
+
+        candidates = None
+        for entry in entries:
+            positions = self._read(*entry)
+            if candidates is None:
+                candidates = list(positions)
+            else:
+                positions = set(positions)
+                candidates = [i for i in candidates if i in positions]
+            if not candidates:
+                break
+        return candidates or []
+
+    def sharing(self, trigrams):
+        """
+        :param trigrams: trigrams of a query
+        :type trigrams: set of str
+        :returns: the positions of the packages that may contain any of
+                  the trigrams
+        :rtype: set of int
+        """
+
+        candidates = set()
+        for trigram in trigrams:
+            candidates.update(self._read(*self._lookup(trigram)))
+        return candidates
+
+    def _lookup(self, trigram):
+        """
+        :param trigram: a trigram
+        :type trigram: str
+        :returns: the offset and number of the positions of the packages
+                  that contain the trigram, or another trigram with the
+                  same hash
+        :rtype: (int, int)
+        """
+
+        key = _trigram_hash(trigram)
+        low, high = 0, self._trigram_count
+        while low < high:
+            middle = (low + high) // 2
+            middle_key, offset, count = SEARCH_INDEX_TRIGRAM.unpack_from(
+                self._data,
+                SEARCH_INDEX_HEADER.size + middle * SEARCH_INDEX_TRIGRAM.size)
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                return (offset, count)
+        return (0, 0)
+
+    def _read(self, offset, count):
+        """
+        :param offset: offset of the positions, as returned by _lookup
+        :type offset: int
+        :param count: number of positions
+        :type count: int
+        :returns: the positions
+        :rtype: (int)
+        """
+
+        return struct.unpack_from(
+            '>{}I'.format(count),
+            self._data,
+            self._positions_start + offset * SEARCH_INDEX_POSITION.size)
+
+
+def _search_matches(packages, search_index, query):
+    """
+    :param packages: the packages of a registry's index
+    :type packages: [dict]
+    :param search_index: the registry's search index, if it has one
+    :type search_index: SearchIndex | None
+    :param query: lower-cased search term
+    :type query: str
+    :returns: the positions of the matching packages, best match first
+    :rtype: [int]
+    """
+
+    if not query:
+        return list(range(len(packages)))
+
+    if (search_index is not None and
+            search_index.package_count != len(packages)):
+        logger.warning('Ignoring outdated search index')
+        search_index = None
+
+    threshold = 0.5  # Minimum rank required to appear in results
+
+    query_trigrams = _trigrams(query)
+    if search_index is not None and query_trigrams:
+        # only packages that contain every trigram can contain the query
+        candidates = search_index.containing(query_trigrams)
+    else:
+        candidates = range(len(packages))
+
+    ranked = [(i, _search_rank(packages[i], query)) for i in candidates]
+    ranked = [(i, rank) for i, rank in ranked if rank >= threshold]
+    if not ranked and len(query) >= 3:
+        ranked = _fuzzy_matches(packages, search_index, query)
+
+    return [i for i, _ in sorted(ranked, key=lambda r: (-r[1], r[0]))]
+
+
+def _fuzzy_matches(packages, search_index, query):
+    """
+    :param packages: the packages of a registry's index
+    :type packages: [dict]
+    :param search_index: the registry's search index, if it has one
+    :type search_index: SearchIndex | None
+    :param query: lower-cased search term
+    :type query: str
+    :returns: the position and similarity of the packages whose name or
+              tag is similar to the query
+    :rtype: [(int, float)]
+    """
+
+    query_trigrams = _trigrams(query, padded=True)
+    if search_index is not None:
+        candidates = search_index.sharing(query_trigrams)
+    else:
+        candidates = range(len(packages))
+
+    ranked = []
+    for i in candidates:
+        pkg = packages[i]
+        texts = [pkg['name']] + pkg.get('tags', [])
+        similarity = max(
+            _similarity(query_trigrams, _trigrams(text.lower(), True))
+            for text in texts)
+        if similarity >= SEARCH_FUZZY_THRESHOLD:
+            ranked.append((i, similarity))
+
+    return ranked
+
+
 def _search_rank(pkg, query):
     """
     :param pkg: Index entry to rank for affinity with the search term
-    :type pkg: object
-    :param query: Search term
+    :type pkg: dict
+    :param query: lower-cased search term
     :type query: str
     :rtype: float
     """
 
-    q = query.lower()
-
     result = 0.0
-    if q in pkg['name'].lower():
+    if query in pkg['name'].lower():
         result += 2.0
 
-    for tag in pkg['tags']:
-        if q in tag.lower():
+    for tag in pkg.get('tags', []):
+        if query in tag.lower():
             result += 1.0
 
-    if q in pkg['description'].lower():
+    if query in pkg.get('description', '').lower():
         result += 0.5
 
     return result
 
 
+def _search_texts(pkg):
+    """
+    :param pkg: package index entry
+    :type pkg: dict
+    :returns: the lower-cased name, description and tags of the package
+    :rtype: [str]
+    """
+
+    return [text.lower() for text in
+            [pkg['name'], pkg.get('description', '')] + pkg.get('tags', [])]
+
+
+def _trigram_hash(trigram):
+    """
+    :param trigram: a trigram
+    :type trigram: str
+    :returns: the key of the trigram in a search index
+    :rtype: int
+    """
+
+    return zlib.crc32(trigram.encode('utf-8')) & 0xffffffff
+
+
+def _trigrams(text, padded=False):
+    """
+    :param text: the text to split
+    :type text: str
+    :param padded: whether to pad the text so that its start and end
+                   have trigrams of their own
+    :type padded: bool
+    :returns: the sequences of three characters in the text
+    :rtype: set of str
+    """
+
+    if padded:
+        text = '  {} '.format(text)
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def _similarity(trigrams, other):
+    """
+    :param trigrams: trigrams of a text
+    :type trigrams: set of str
+    :param other: trigrams of another text
+    :type other: set of str
+    :returns: the share of the trigrams that are common to both texts
+    :rtype: float
+    """
+
+    if not trigrams or not other:
+        return 0.0
+    return len(trigrams & other) / float(len(trigrams | other))
+
+
 def _extract_default_values(config_schema):
     """
     :param config_schema: A json-schema describing configuration options.
@@ -648,6 +1024,9 @@ def _acquire_file_lock(lock_file_path):
 
 def update_sources(config, validate=False):
     """Overwrites the local package cache with the latest source data.
+    Sources are fetched and checked concurrently, without holding the
+    cache lock.  The lock is then only held to swap each staged source
+    into the cache.
 
     :param config: Configuration dictionary
     :type config: dcos.config.Toml
@@ -668,61 +1047,200 @@ def update_sources(config, validate=False):
         raise DCOSException(
             'Cache directory does not exist! [{}]'.format(cache_dir))
 
-    # obtain an exclusive file lock on $CACHE/.lock
-    lock_path = os.path.join(cache_dir, '.lock')
-
-    with _acquire_file_lock(lock_path):
+    # list sources
+    sources = list_sources(config)
 
-        # list sources
-        sources = list_sources(config)
+    staged = []
+    obsolete = []
+    try:
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=SOURCE_UPDATE_CONCURRENCY) as pool:
+            futures = [pool.submit(_stage_source, source, cache_dir, validate)
+                       for source in sources]
+
+        for source, future in zip(sources, futures):
+            stage_root, stage_errors = future.result()
+            errors += stage_errors
+            if stage_root is not None:
+                staged.append((source, stage_root))
+
+        # obtain an exclusive file lock on $CACHE/.lock
+        lock_path = os.path.join(cache_dir, '.lock')
+
+        with _acquire_file_lock(lock_path):
+            while staged:
+                source, stage_root = staged.pop(0)
+                target_dir = os.path.join(cache_dir, source.hash())
+                try:
+                    obsolete += _publish_stage(stage_root, target_dir)
+                except OSError:
+                    errors.append(
+                        'Could not replace directory [{}]'.format(target_dir))
+                    obsolete.append(stage_root)
+    finally:
+        obsolete += [stage_root for _, stage_root in staged]
+        for path in obsolete:
+            _remove_stage(path)
 
-        for source in sources:
+    if errors:
+        raise DCOSException(util.list_to_err(errors))
 
-            emitter.publish('Updating source [{}]'.format(source))
 
-            # create a temporary staging directory
-            with util.tempdir() as tmp_dir:
+def _stage_source(source, cache_dir, validate):
+    """Fetches a source into a new staging directory in the cache
+    directory, and checks it.
 
-                stage_dir = os.path.join(tmp_dir, source.hash())
+    :param source: the source to fetch
+    :type source: Source
+    :param cache_dir: the package cache directory
+    :type cache_dir: str
+    :param validate: whether to validate the packages
+    :type validate: bool
+    :returns: the staging directory, unless the source could not be
+              staged or the cache is current, and the errors
+    :rtype: (str, [str])
+    """
 
-                # copy to the staging directory
-                try:
-                    source.copy_to_cache(stage_dir)
-                except DCOSException as e:
-                    errors.append(e.message)
-                    continue
-
-                # check the version
-                # TODO(jsancio): move this to the validation when it is forced
-                Registry(source, stage_dir).check_version(
-                    LooseVersion('1.0'),
-                    LooseVersion('2.0'))
-
-                # validate content
-                if validate:
-                    validation_errors = Registry(source, stage_dir).validate()
-                    if len(validation_errors) > 0:
-                        errors += validation_errors
-                        continue  # keep updating the other sources
-
-                # remove the $CACHE/source.hash() directory
-                target_dir = os.path.join(cache_dir, source.hash())
-                try:
-                    if os.path.exists(target_dir):
-                        shutil.rmtree(target_dir,
-                                      onerror=_rmtree_on_error,
-                                      ignore_errors=False)
-                except OSError:
-                    err = Error(
-                        'Could not remove directory [{}]'.format(target_dir))
-                    errors.append(err)
-                    continue  # keep updating the other sources
+    emitter.publish('Updating source [{}]'.format(source))
+    start = time.time()
 
-                # move the staging directory to $CACHE/source.hash()
-                shutil.move(stage_dir, target_dir)
+    stage_root = tempfile.mkdtemp(prefix='.{}-'.format(source.hash()),
+                                  dir=cache_dir)
+    stage_dir = os.path.join(stage_root, STAGE_REGISTRY_DIR)
+    cached_dir = os.path.join(cache_dir, source.hash())
+    errors = []
+    staged = False
+    try:
+        # copy to the staging directory, unless the cache is current
+        saved = source.copy_to_cache(stage_dir, cached_dir)
+        if saved is not None:
+            if validate:
+                errors = [err.error() for err in
+                          Registry(source, cached_dir).validate()]
+                if errors:
+                    return (None, errors)
+
+            if saved:
+                emitter.publish(
+                    'Source [{}] is up to date; skipped downloading '
+                    '{}'.format(source, util.humanize_bytes(saved)))
+            else:
+                emitter.publish('Source [{}] is up to date'.format(source))
+            return (None, [])
+
+        registry = Registry(source, stage_dir)
+
+        # check the version
+        # TODO(jsancio): move this to the validation when it is forced
+        registry.check_version(LooseVersion('1.0'), LooseVersion('2.0'))
+
+        # validate content
+        if validate:
+            errors = [err.error() for err in registry.validate()]
+
+        # index the packages for search, and pack their definitions
+        if not errors:
+            registry.write_search_index()
+            registry.write_pack()
+            staged = True
+    except DCOSException as e:
+        errors = [str(e)]
+    except Exception as e:
+        # a broken source must not abort the update of the others
+        logger.exception('Error updating source [%s]', source)
+        errors = ['Unable to update source [{}]: {}'.format(source, e)]
+    finally:
+        if not staged:
+            _remove_stage(stage_root)
 
     if errors:
-        raise DCOSException(util.list_to_err(errors))
+        return (None, errors)
+
+    emitter.publish('Fetched source [{}] in {:.2f}s'.format(
+        source, time.time() - start))
+    return (stage_root, [])
+
+
+def _publish_stage(stage_root, target_dir):
+    """Replaces the cached registry at `target_dir` with the one staged in
+    `stage_root`.  Where symlinks are supported, `target_dir` is a
+    symlink to the staged registry, and is replaced by a single atomic
+    rename, so that readers see either the old or the new registry.
+
+    :param stage_root: the staging directory
+    :type stage_root: str
+    :param target_dir: the path of the cached registry
+    :type target_dir: str
+    :returns: the staging directories that held the replaced registry
+    :rtype: [str]
+    """
+
+    stage_dir = os.path.join(stage_root, STAGE_REGISTRY_DIR)
+    old_dir = os.path.join(stage_root, 'replaced')
+
+    if util.is_windows_platform():
+        if os.path.exists(target_dir):
+            os.rename(target_dir, old_dir)
+        os.rename(stage_dir, target_dir)
+        return [stage_root]
+
+    link = stage_root + '.link'
+    os.symlink(os.path.relpath(stage_dir, os.path.dirname(target_dir)), link)
+    try:
+        if os.path.islink(target_dir):
+            replaced = _stage_root_of(target_dir)
+            os.rename(link, target_dir)
+            return [] if replaced is None else [replaced]
+
+        # the registry predates the symlinked cache layout
+        obsolete = []
+        if os.path.exists(target_dir):
+            os.rename(target_dir, old_dir)
+            obsolete.append(old_dir)
+        os.rename(link, target_dir)
+        return obsolete
+    except OSError:
+        os.remove(link)
+        raise
+
+
+def _stage_root_of(target_dir):
+    """
+    :param target_dir: the path of a cached registry, which is a symlink
+    :type target_dir: str
+    :returns: the staging directory that the symlink points into, or None
+              if it points anywhere else than into a staging directory
+              of the same source in the cache directory
+    :rtype: str | None
+    """
+
+    cache_dir = os.path.dirname(os.path.abspath(target_dir))
+    stage_dir = os.path.normpath(
+        os.path.join(cache_dir, os.readlink(target_dir)))
+    stage_root = os.path.dirname(stage_dir)
+
+    prefix = '.{}-'.format(os.path.basename(target_dir))
+    if (os.path.basename(stage_dir) != STAGE_REGISTRY_DIR or
+            os.path.dirname(stage_root) != cache_dir or
+            not os.path.basename(stage_root).startswith(prefix)):
+        logger.warning('Not removing [%s], which is not a staging directory',
+                       stage_root)
+        return None
+    return stage_root
+
+
+def _remove_stage(path):
+    """Removes a staging directory, logging failures.
+
+    :param path: the directory to remove
+    :type path: str
+    :rtype: None
+    """
+
+    try:
+        shutil.rmtree(path, onerror=_rmtree_on_error)
+    except OSError:
+        logger.warning('Could not remove directory [%s]', path)
 
 
 class Source:
@@ -760,12 +1278,17 @@ class Source:
             util.get_config_vals(config, ['package.cache'])[0])
         return os.path.join(cache_dir, self.hash())
 
-    def copy_to_cache(self, target_dir):
-        """Copies the source content to the supplied local directory.
+    def copy_to_cache(self, target_dir, cached_dir=None):
+        """Copies the source content to the supplied local directory,
+        unless the content cached in `cached_dir` is current.
 
         :param target_dir: Path to the destination directory.
         :type target_dir: str
-        :rtype: None
+        :param cached_dir: Path to the cached content, which may not exist
+        :type cached_dir: str
+        :returns: None if the content was copied; otherwise the number of
+                  bytes that did not have to be downloaded
+        :rtype: int
         """
 
         raise NotImplementedError
@@ -794,11 +1317,13 @@ class FileSource(Source):
 
         return self._url
 
-    def copy_to_cache(self, target_dir):
+    def copy_to_cache(self, target_dir, cached_dir=None):
         """Copies the source content to the supplied local directory.
 
         :param target_dir: Path to the destination directory.
         :type target_dir: str
+        :param cached_dir: Unused; local sources are always copied
+        :type cached_dir: str
         :rtype: None
         """
 
@@ -832,57 +1357,184 @@ class HttpSource(Source):
 
         return self._url
 
-    def copy_to_cache(self, target_dir):
-        """Copies the source content to the supplied local directory.
+    def copy_to_cache(self, target_dir, cached_dir=None):
+        """Copies the source content to the supplied local directory.  The
+        download is conditional on the ETag and Last-Modified validators
+        stored with `cached_dir`, and is not extracted if its content
+        hash matches the cached one.
 
         :param target_dir: Path to the destination directory.
         :type target_dir: str
-        :returns: The error, if one occurred
-        :rtype: None
+        :param cached_dir: Path to the cached content, which may not exist
+        :type cached_dir: str
+        :returns: None if the content was copied; otherwise the number of
+                  bytes that did not have to be downloaded
+        :rtype: int
         """
 
+        metadata = _read_source_metadata(cached_dir)
+
+        headers = {}
+        if metadata.get('etag') is not None:
+            headers['If-None-Match'] = metadata['etag']
+        if metadata.get('last_modified') is not None:
+            headers['If-Modified-Since'] = metadata['last_modified']
+
         try:
-            with util.tempdir() as tmp_dir:
+            # Download the zip file, unless it is unchanged.  Small
+            # downloads are never written to disk.
+            response = http.get(self.url,
+                                headers=headers,
+                                stream=True,
+                                timeout=HTTP_SOURCE_TIMEOUT,
+                                is_success=_is_fetched)
+            if response.status_code == 304:
+                response.close()
+                return metadata.get('size', 0)
+
+            with tempfile.SpooledTemporaryFile(
+                    max_size=HTTP_SOURCE_SPOOL_SIZE) as spool:
+                digest = hashlib.sha256()
+                size = 0
+                for chunk in response.iter_content(HTTP_SOURCE_CHUNK_SIZE):
+                    spool.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+
+                if metadata.get('sha256') == digest.hexdigest():
+                    # keep the new validators of the unchanged content, so
+                    # that the next download is conditional on them
+                    metadata.update({
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get(
+                            'Last-Modified'),
+                    })
+                    try:
+                        _write_source_metadata(cached_dir, metadata)
+                    except (IOError, OSError) as e:
+                        logger.warning(
+                            'Could not update the metadata of [%s]: %s',
+                            cached_dir, e)
+                    return 0
+
+                # Extract the enclosing directory to the target directory
+                spool.seek(0)
+                _extract_registry(zipfile.ZipFile(spool, 'r'), target_dir)
+
+                _write_source_metadata(target_dir, {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'sha256': digest.hexdigest(),
+                    'size': size,
+                })
 
-                tmp_file = os.path.join(tmp_dir, 'packages.zip')
+                return None
 
-                # Download the zip file.
-                urllib.request.urlretrieve(self.url, tmp_file)
+        except Exception:
+            raise DCOSException(
+                'Unable to fetch packages from [{}]'.format(self.url))
 
-                # Unzip the downloaded file.
-                packages_zip = zipfile.ZipFile(tmp_file, 'r')
-                packages_zip.extractall(tmp_dir)
 
-                # Move the enclosing directory to the target directory
-                enclosing_dirs = [item
-                                  for item in os.listdir(tmp_dir)
-                                  if os.path.isdir(
-                                      os.path.join(tmp_dir, item))]
+def _extract_registry(packages_zip, target_dir):
+    """Extracts the directory that encloses the registry in a zip file
+    straight to the target directory, making the scripts executable.
 
-                # There should only be one directory present after extracting.
-                assert(len(enclosing_dirs) is 1)
+    :param packages_zip: the zip file
+    :type packages_zip: zipfile.ZipFile
+    :param target_dir: Path to the destination directory.
+    :type target_dir: str
+    :rtype: None
+    """
 
-                enclosing_dir = os.path.join(tmp_dir, enclosing_dirs[0])
+    x_mode = (stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR |
+              stat.S_IRGRP | stat.S_IWGRP | stat.S_IXGRP)
 
-                shutil.copytree(enclosing_dir, target_dir)
+    members = packages_zip.infolist()
 
-                # Set appropriate file permissions on the scripts.
-                x_mode = (stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR |
-                          stat.S_IRGRP | stat.S_IWGRP | stat.S_IXGRP)
+    # There should only be one enclosing directory.
+    prefixes = set(member.filename.split('/', 1)[0] for member in members
+                   if '/' in member.filename)
+    if len(prefixes) != 1:
+        raise DCOSException('Expected a single enclosing directory')
+    prefix = prefixes.pop() + '/'
 
-                scripts_dir = os.path.join(target_dir, 'scripts')
-                scripts = os.listdir(scripts_dir)
+    target_dir = os.path.abspath(target_dir)
+    util.ensure_dir(target_dir)
 
-                for script in scripts:
-                    script_path = os.path.join(scripts_dir, script)
-                    if os.path.isfile(script_path):
-                        os.chmod(script_path, x_mode)
+    for member in members:
+        if not member.filename.startswith(prefix):
+            continue
 
-                return None
+        parts = [part for part in member.filename[len(prefix):].split('/')
+                 if part]
+        path = os.path.abspath(os.path.join(target_dir, *parts))
+        if not parts or not path.startswith(target_dir + os.sep):
+            continue
 
-        except Exception:
-            raise DCOSException(
-                'Unable to fetch packages from [{}]'.format(self.url))
+        if member.filename.endswith('/'):
+            util.ensure_dir(path)
+            continue
+
+        util.ensure_dir(os.path.dirname(path))
+        with packages_zip.open(member) as src, open(path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, HTTP_SOURCE_CHUNK_SIZE)
+
+        if parts[:1] == ['scripts'] and len(parts) == 2:
+            os.chmod(path, x_mode)
+
+
+def _is_fetched(status_code):
+    """
+    :param status_code: the http response status
+    :type status_code: int
+    :returns: True for success and 304 Not Modified; False otherwise
+    :rtype: bool
+    """
+
+    return 200 <= status_code < 300 or status_code == 304
+
+
+def _read_source_metadata(cached_dir):
+    """
+    :param cached_dir: Path to the cached content, which may not exist
+    :type cached_dir: str
+    :returns: the metadata stored with the cached content
+    :rtype: dict
+    """
+
+    if cached_dir is None:
+        return {}
+
+    path = os.path.join(cached_dir, SOURCE_METADATA_FILE)
+    try:
+        with open(path) as fd:
+            return json.load(fd)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def _write_source_metadata(target_dir, metadata):
+    """Stores the metadata with the fetched content.  The metadata file is
+    replaced atomically, as the content may be in use.
+
+    :param target_dir: Path to the fetched content
+    :type target_dir: str
+    :param metadata: the metadata to store with the content
+    :type metadata: dict
+    :rtype: None
+    """
+
+    path = os.path.join(target_dir, SOURCE_METADATA_FILE)
+    fd, tmp_path = tempfile.mkstemp(dir=target_dir, prefix='.tmp')
+    with os.fdopen(fd, 'w') as tmp_file:
+        json.dump(metadata, tmp_file)
+
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Windows refuses to rename over an existing file
+        os.remove(path)
+        os.rename(tmp_path, path)
 
 
 class GitSource(Source):
@@ -904,39 +1556,142 @@ class GitSource(Source):
 
         return self._url
 
-    def copy_to_cache(self, target_dir):
-        """Copies the source content to the supplied local directory.
+    def copy_to_cache(self, target_dir, cached_dir=None):
+        """Copies the source content to the supplied local directory.  The
+        master branch is fetched, one commit deep, into a bare mirror
+        that is kept next to `cached_dir`, so that an unchanged source
+        costs a single fetch.  Its tree is then exported to the target
+        directory, unless it is the cached one.
 
         :param target_dir: Path to the destination directory.
         :type target_dir: str
-        :returns: The error, if one occurred
-        :rtype: None
+        :param cached_dir: Path to the cached content, which may not exist
+        :type cached_dir: str
+        :returns: None if the content was copied; otherwise the number of
+                  bytes that did not have to be downloaded
+        :rtype: int
         """
 
-        try:
-            # TODO(SS): add better url parsing
+        mirror_dir = None if cached_dir is None else cached_dir + '.git'
+
+        # TODO(SS): add better url parsing
 
-            # Ensure git is installed properly.
-            git_program = util.which('git')
-            if git_program is None:
-                raise DCOSException("""Could not locate the git program.  Make sure \
+        # Ensure git is installed properly.
+        git_program = util.which('git')
+        if git_program is None:
+            raise DCOSException("""Could not locate the git program.  Make sure \
 it is installed and on the system search path.
 PATH = {}""".format(os.environ[constants.PATH_ENV]))
 
-            # Clone git repo into the supplied target directory.
-            git.Repo.clone_from(self._url,
-                                to_path=target_dir,
-                                progress=None,
-                                branch='master')
+        with util.tempdir() as tmp_dir, _lock_mirror(mirror_dir):
+            if mirror_dir is None:
+                mirror_dir = os.path.join(tmp_dir, 'mirror.git')
 
-            # Remove .git directory to save space.
-            shutil.rmtree(os.path.join(target_dir, ".git"),
-                          onerror=_rmtree_on_error)
-            return None
+            try:
+                return self._fetch_to(mirror_dir, target_dir, cached_dir)
+            except git.exc.GitCommandError as e:
+                # keep a sound mirror, so that a failed fetch doesn't cost
+                # a full clone next time
+                if not _is_sound_mirror(mirror_dir):
+                    logger.warning('Removing corrupt mirror [%s]', mirror_dir)
+                    _remove_stage(mirror_dir)
 
-        except git.exc.GitCommandError:
-            raise DCOSException(
-                'Unable to fetch packages from [{}]'.format(self.url))
+                raise DCOSException(
+                    'Unable to fetch packages from [{}]: {}'.format(
+                        self.url, _git_error(e)))
+
+    def _fetch_to(self, mirror_dir, target_dir, cached_dir):
+        """Fetches the source into its mirror, and exports the fetched tree.
+
+        :param mirror_dir: Path to the mirror, which may not exist
+        :type mirror_dir: str
+        :param target_dir: Path to the destination directory.
+        :type target_dir: str
+        :param cached_dir: Path to the cached content, which may not exist
+        :type cached_dir: str
+        :returns: see py:meth:`copy_to_cache`
+        :rtype: int
+        """
+
+        try:
+            repo = git.Repo(mirror_dir)
+        except (git.exc.InvalidGitRepositoryError, git.exc.NoSuchPathError):
+            if os.path.exists(mirror_dir):
+                _remove_stage(mirror_dir)
+            repo = git.Repo.init(mirror_dir, bare=True)
+
+        # Fetch the latest commit of master into the mirror.
+        repo.git.fetch('--depth', '1', self._url,
+                       '+refs/heads/master:refs/heads/master')
+        commit = repo.git.rev_parse('master')
+
+        if _read_source_metadata(cached_dir).get('commit') == commit:
+            return 0
+
+        # Export the tree to the target directory.
+        with tempfile.SpooledTemporaryFile(
+                max_size=HTTP_SOURCE_SPOOL_SIZE) as archive:
+            repo.archive(archive, 'master')
+            archive.seek(0)
+            with tarfile.open(fileobj=archive) as tar:
+                tar.extractall(target_dir)
+
+        _write_source_metadata(target_dir, {'commit': commit})
+        return None
+
+
+def _git_error(error):
+    """
+    :param error: a failed git command
+    :type error: git.exc.GitCommandError
+    :returns: the first line of the command's error output
+    :rtype: str
+    """
+
+    stderr = error.stderr
+    if isinstance(stderr, bytes):
+        stderr = stderr.decode('utf-8', 'replace')
+    lines = stderr.strip().splitlines()
+    if not lines:
+        return 'git exited with status {}'.format(error.status)
+    return lines[0]
+
+
+def _is_sound_mirror(mirror_dir):
+    """
+    :param mirror_dir: Path to the mirror of a git source
+    :type mirror_dir: str
+    :returns: whether the mirror is a git repository without corrupt or
+              missing objects
+    :rtype: bool
+    """
+
+    try:
+        git.Repo(mirror_dir).git.fsck('--no-dangling', '--no-progress')
+    except (git.exc.InvalidGitRepositoryError, git.exc.NoSuchPathError,
+            git.exc.GitCommandError):
+        return False
+    return True
+
+
+@contextlib.contextmanager
+def _lock_mirror(mirror_dir):
+    """Locks the mirror of a git source, which package updates in other
+    processes may be fetching into.
+
+    :param mirror_dir: path to the mirror, or None for a temporary one
+    :type mirror_dir: str
+    :returns: a context manager that holds the lock
+    :rtype: context manager
+    """
+
+    if mirror_dir is None:
+        yield
+        return
+
+    util.ensure_dir(os.path.dirname(mirror_dir))
+    with _acquire_file_lock(mirror_dir + '.lock'):
+        yield
 
 
 def _rmtree_on_error(func, path, exc_info):
@@ -995,6 +1750,10 @@ class Registry():
     def __init__(self, source, base_path):
         self._base_path = base_path
         self._source = source
+        self._pack_loaded = False
+        self._pack_data = None
+        self._pack_start = None
+        self._pack_index = None
 
     def validate(self):
         """Validates a package registry.
@@ -1096,6 +1855,38 @@ class Registry():
         except ValueError:
             raise DCOSException('Unable to parse [{}]'.format(index_path))
 
+    def write_search_index(self):
+        """Builds the search index of this registry, and stores it next to
+        the package index.
+
+        :rtype: None
+        """
+
+        search_index = build_search_index(self.get_index())
+        with util.open_file(
+                os.path.join(self._base_path, SEARCH_INDEX_FILE), 'wb') as fd:
+            fd.write(search_index)
+
+    def get_search_index(self):
+        """Memory-maps the search index of this registry, if it has a valid
+        one.  Registries updated before search indexes existed have none,
+        and are searched linearly.
+
+        :rtype: SearchIndex | None
+        """
+
+        path = os.path.join(self._base_path, SEARCH_INDEX_FILE)
+        if not os.path.isfile(path):
+            return None
+
+        try:
+            with open(path, 'rb') as fd:
+                data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+            return SearchIndex(data)
+        except (EnvironmentError, ValueError, struct.error):
+            logger.warning('Ignoring invalid search index [%s]', path)
+            return None
+
     def get_package(self, package_name):
         """Returns the named package, if it exists.
 
@@ -1118,6 +1909,13 @@ class Registry():
             first_character,
             package_name)
 
+        pack_index = self._get_pack_index()
+        if pack_index is not None:
+            entry = pack_index.get(package_name)
+            if entry is None:
+                return None
+            return Package(self, package_path, entry)
+
         if not os.path.isdir(package_path):
             return None
 
@@ -1127,6 +1925,111 @@ class Registry():
             raise DCOSException(
                 'Could not read package [{}]'.format(package_name))
 
+    def write_pack(self):
+        """Packs the definitions of every package into a single file: a
+        header, a JSON index of the packages, and the content of their
+        files.  The index records the versions of each package, and the
+        offset and length of each of their files in the content.
+
+        :rtype: None
+        """
+
+        packages_dir = os.path.join(self._base_path, 'repo', 'packages')
+        letters = []
+        if os.path.isdir(packages_dir):
+            letters = _list_dir(packages_dir)
+        index = {}
+
+        with tempfile.TemporaryFile() as content:
+            for letter in letters:
+                letter_dir = os.path.join(packages_dir, letter)
+                for name in _list_dir(letter_dir):
+                    package_path = os.path.join(letter_dir, name)
+                    versions = _list_dir(package_path)
+                    versions.reverse()
+
+                    files = {}
+                    for version in versions:
+                        version_dir = os.path.join(package_path, version)
+                        files[version] = {}
+                        for filename in _list_dir(version_dir):
+                            path = os.path.join(version_dir, filename)
+                            if not os.path.isfile(path):
+                                continue
+                            with open(path, 'rb') as fd:
+                                data = fd.read()
+                            files[version][filename] = \
+                                [content.tell(), len(data)]
+                            content.write(data)
+
+                    index[name] = {'versions': versions, 'files': files}
+
+            header = json.dumps(index).encode('utf-8')
+            content.seek(0)
+            with open(os.path.join(self._base_path, PACK_FILE), 'wb') as fd:
+                fd.write(PACK_HEADER.pack(PACK_MAGIC, len(header)))
+                fd.write(header)
+                shutil.copyfileobj(content, fd)
+
+    def _get_pack_index(self):
+        """Memory-maps the pack of this registry, if it has a valid one, and
+        returns its index.
+
+        :returns: the index of the pack, by package name
+        :rtype: dict | None
+        """
+
+        if self._pack_loaded:
+            return self._pack_index
+        self._pack_loaded = True
+
+        path = os.path.join(self._base_path, PACK_FILE)
+        if not os.path.isfile(path):
+            return None
+
+        try:
+            with open(path, 'rb') as fd:
+                data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, length = PACK_HEADER.unpack_from(data)
+            if magic != PACK_MAGIC:
+                return None
+
+            start = PACK_HEADER.size + length
+            index = json.loads(data[PACK_HEADER.size:start].decode('utf-8'))
+        except (EnvironmentError, ValueError, struct.error):
+            logger.warning('Ignoring invalid package pack [%s]', path)
+            return None
+
+        self._pack_data = data
+        self._pack_start = start
+        self._pack_index = index
+        return index
+
+    def read_packed(self, offset, length):
+        """Returns the content of a packed file.
+
+        :param offset: offset of the file in the packed content
+        :type offset: int
+        :param length: length of the file
+        :type length: int
+        :rtype: bytes
+        """
+
+        offset += self._pack_start
+        return self._pack_data[offset:offset + length]
+
+
+def _list_dir(path):
+    """
+    :param path: path to a directory
+    :type path: str
+    :returns: the entries of the directory, except hidden ones, in
+              directory order
+    :rtype: [str]
+    """
+
+    return [f for f in os.listdir(path) if not f.startswith('.')]
+
 
 class Package():
     """Interface to a package on disk.
@@ -1135,11 +2038,15 @@ class Package():
     :type registry: Registry
     :param path: Path to the package description on disk
     :type path: str
+    :param packed: The package's entry in the registry's pack, which is
+                   then read instead of the package description
+    :type packed: dict
     """
 
-    def __init__(self, registry, path):
-        assert os.path.isdir(path)
+    def __init__(self, registry, path, packed=None):
+        assert packed is not None or os.path.isdir(path)
         self._registry = registry
+        self._packed = packed
         self.path = path
 
     def name(self):
@@ -1207,6 +2114,9 @@ class Package():
         :rtype: bool
         """
 
+        if self._packed is not None:
+            return filename in self._packed['files'].get(version, {})
+
         return os.path.isfile(
             os.path.join(
                 self.path,
@@ -1239,7 +2149,7 @@ class Package():
         :rtype: dict
         """
 
-        return self._json(os.path.join(version, 'config.json'))
+        return self._json(version, 'config.json')
 
     def package_json(self, version):
         """Returns the JSON content of the package.json file.
@@ -1250,7 +2160,7 @@ class Package():
         :rtype: dict
         """
 
-        return self._json(os.path.join(version, 'package.json'))
+        return self._json(version, 'package.json')
 
     def marathon_json(self, version, options):
         """Returns the JSON content of the marathon.json template, after
@@ -1291,7 +2201,7 @@ class Package():
         :rtype: dict
         """
 
-        template = self._data(os.path.join(version, 'command.json'))
+        template = self._data(version, 'command.json')
         rendered = pystache.render(template, options)
         return json.loads(rendered)
 
@@ -1307,31 +2217,42 @@ class Package():
         :rtype: dict
         """
 
-        template = self._data(os.path.join(version, name))
+        template = self._data(version, name)
         return util.render_mustache_json(template, options)
 
-    def _json(self, path):
-        """Returns the json content of the supplied file, relative to the
-        base path.
+    def _json(self, version, filename):
+        """Returns the json content of the supplied file of a version.
 
-        :param path: The relative path to the file to read
-        :type path: str
+        :param version: the package version
+        :type version: str
+        :param filename: The file to read
+        :type filename: str
         :rtype: dict
         """
 
-        data = self._data(path)
+        data = self._data(version, filename)
         return util.load_jsons(data)
 
-    def _data(self, path):
-        """Returns the content of the supplied file, relative to the base path.
+    def _data(self, version, filename):
+        """Returns the content of the supplied file of a version.
 
-        :param path: The relative path to the file to read
-        :type path: str
+        :param version: the package version
+        :type version: str
+        :param filename: The file to read
+        :type filename: str
         :returns: File content of the supplied path
         :rtype: str
         """
 
-        full_path = os.path.join(self.path, path)
+        full_path = os.path.join(self.path, version, filename)
+
+        if self._packed is not None:
+            location = self._packed['files'].get(version, {}).get(filename)
+            if location is None:
+                raise DCOSException(
+                    'Path [{}] is not a file'.format(full_path))
+            return self._registry.read_packed(*location).decode('utf-8')
+
         return util.read_file(full_path)
 
     def package_versions(self):
@@ -1344,7 +2265,10 @@ class Package():
         :rtype: [str]
         """
 
-        vs = [f for f in os.listdir(self.path) if not f.startswith('.')]
+        if self._packed is not None:
+            return list(self._packed['versions'])
+
+        vs = _list_dir(self.path)
         vs.reverse()
         return vs
 
@@ -12,6 +12,7 @@ import tempfile
 import time
 
 import jsonschema
+import pkg_resources
 import prettytable
 import pystache
 import six
@@ -256,13 +257,64 @@ def validate_json(instance, schema):
     def sort_key(ve):
         return six.u(_hack_error_message_fix(ve.message))
 
-    validator = jsonschema.Draft4Validator(schema)
+    validator = _validator(schema)
     validation_errors = list(validator.iter_errors(instance))
     validation_errors = sorted(validation_errors, key=sort_key)
 
     return [_format_validation_error(e) for e in validation_errors]
 
 
+VALIDATOR_CACHE_SIZE = 32
+"""Number of schema validators kept by py:func:`validate_json`."""
+
+_validators = collections.OrderedDict()
+
+
+def _validator(schema):
+    """Returns a validator for the schema.  Validators of the most recently
+    used schema objects are kept, so that a schema's references are only
+    resolved once.  Shared schemas, such as the ones returned by
+    py:func:`load_resource_json`, share their validator.
+
+    :param schema: the schema to validate with
+    :type schema: dict
+    :returns: the schema's validator
+    :rtype: jsonschema.Draft4Validator
+    """
+
+    # the entry holds on to the schema, so that its id is not reused
+    entry = _validators.pop(id(schema), None)
+    if entry is None or entry[0] is not schema:
+        entry = (schema, jsonschema.Draft4Validator(schema))
+
+    _validators[id(schema)] = entry
+    while len(_validators) > VALIDATOR_CACHE_SIZE:
+        _validators.popitem(last=False)
+    return entry[1]
+
+
+_resources = {}
+
+
+def load_resource_json(package, resource):
+    """Loads a JSON resource of a package, such as a schema.  Resources are
+    loaded once per process, so callers must not modify the result.
+
+    :param package: the name of the package
+    :type package: str
+    :param resource: the path of the resource in the package
+    :type resource: str
+    :returns: the parsed resource
+    :rtype: dict
+    """
+
+    key = (package, resource)
+    if key not in _resources:
+        _resources[key] = json.loads(
+            pkg_resources.resource_string(package, resource).decode('utf-8'))
+    return _resources[key]
+
+
 # TODO(jsancio): clean up this hack
 # The error string from jsonschema already contains improperly formatted
 # JSON values, so we have to resort to removing the unicode prefix using
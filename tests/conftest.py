@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+from six.moves import BaseHTTPServer, socketserver
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def http_server():
+    """Returns a function that starts a local HTTP server, which answers
+    GET requests with `do_get(handler)`.  Keyword arguments are set as
+    attributes of the server, where `do_get` can find them as
+    `handler.server`.  The servers are stopped after the test.
+
+    :returns: function of `do_get` and the server attributes, which
+              returns the running server, with its 'url'
+    :rtype: function
+    """
+
+    servers = []
+
+    def start(do_get, **attributes):
+        handler = type('Handler', (_Handler,), {'do_GET': do_get})
+        server = _Server(('127.0.0.1', 0), handler)
+        for name, value in attributes.items():
+            setattr(server, name, value)
+        server.url = 'http://127.0.0.1:{}/'.format(server.server_address[1])
+
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        servers.append(server)
+        return server
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
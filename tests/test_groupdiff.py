@@ -0,0 +1,183 @@
+from dcos import groupdiff
+
+
+def _current():
+    return {
+        'id': '/prod',
+        'version': '2015-10-01T00:00:00.000Z',
+        'dependencies': [],
+        'apps': [{
+            'id': '/prod/web',
+            'cmd': 'serve',
+            'instances': 2,
+            'cpus': 1.0,
+            'mem': 128.0,
+            'ports': [10000],
+            'uris': ['b', 'a'],
+            'env': {},
+            'tasksRunning': 2,
+            'version': '2015-10-01T00:00:00.000Z',
+        }],
+        'groups': [{
+            'id': '/prod/db',
+            'dependencies': [],
+            'apps': [{'id': '/prod/db/pg', 'cmd': 'pg', 'instances': 1}],
+            'groups': [{
+                'id': '/prod/db/replicas',
+                'apps': [{'id': '/prod/db/replicas/r1', 'cmd': 'pg'}],
+                'groups': [],
+            }],
+        }, {
+            'id': '/prod/old',
+            'apps': [{'id': '/prod/old/legacy', 'cmd': 'legacy'}],
+            'groups': [],
+        }],
+    }
+
+
+def _desired():
+    return {
+        'id': '/prod',
+        'apps': [{'id': 'web', 'cmd': 'serve', 'instances': 2,
+                  'uris': ['a', 'b']}],
+        'groups': [{
+            'id': 'db',
+            'dependencies': ['../web'],
+            'apps': [{'id': 'pg', 'cmd': 'pg', 'mem': 256}],
+        }, {
+            'id': 'cache',
+            'apps': [{'id': 'redis', 'cmd': 'redis'}],
+        }],
+    }
+
+
+def test_unchanged_tree_has_no_changes():
+    assert groupdiff.diff(_current(), _current()) == []
+
+
+def test_normalization_ignores_defaults_order_and_read_only():
+    current = _current()
+    desired = _current()
+    desired['apps'] = [{'id': 'web', 'cmd': 'serve', 'instances': 2,
+                        'uris': ['a', 'b']}]
+
+    assert groupdiff.diff(current, desired) == []
+
+
+def test_diff():
+    changes = groupdiff.diff(_current(), _desired())
+
+    assert groupdiff.plan(changes) == [
+        'create group /prod/cache',
+        'update group /prod/db: dependencies',
+        'create app /prod/cache/redis',
+        'update app /prod/db/pg: mem',
+        'remove group /prod/db/replicas',
+        'remove group /prod/old',
+    ]
+    assert changes[1]['payload'] == {'id': '/prod/db',
+                                     'dependencies': ['/prod/web']}
+    assert changes[2]['payload'] == {'id': '/prod/cache/redis',
+                                     'cmd': 'redis'}
+
+
+def test_unset_properties_are_reset():
+    current = _current()
+    current['apps'][0]['env'] = {'DEBUG': '1'}
+    desired = _current()
+    desired['apps'][0] = {'id': '/prod/web', 'cmd': 'serve'}
+
+    changes = groupdiff.diff(current, desired, {'instances', 'env', 'uris'})
+
+    assert changes == [{
+        'action': 'update', 'type': 'app', 'id': '/prod/web',
+        'payload': {'id': '/prod/web', 'instances': 1, 'env': None,
+                    'uris': None},
+    }]
+
+
+def _marathon_group():
+    """A group as Marathon 1.x reports it in v2/groups, with the
+    properties that it fills in."""
+
+    return {
+        'id': '/prod',
+        'version': '2016-06-01T00:00:00.000Z',
+        'dependencies': [],
+        'groups': [],
+        'apps': [{
+            'id': '/prod/web',
+            'cmd': 'serve',
+            'args': None,
+            'user': None,
+            'env': {'MODE': 'prod'},
+            'instances': 2,
+            'cpus': 0.5,
+            'mem': 128,
+            'disk': 0,
+            'gpus': 0,
+            'executor': '',
+            'constraints': [],
+            'uris': ['https://example.com/web.tgz'],
+            'fetch': [{'uri': 'https://example.com/web.tgz',
+                       'extract': True, 'executable': False,
+                       'cache': False}],
+            'storeUrls': [],
+            'backoffSeconds': 1,
+            'backoffFactor': 1.15,
+            'maxLaunchDelaySeconds': 3600,
+            'container': None,
+            'healthChecks': [],
+            'readinessChecks': [],
+            'dependencies': [],
+            'upgradeStrategy': {'minimumHealthCapacity': 1,
+                                'maximumOverCapacity': 1},
+            'unreachableStrategy': {'inactiveAfterSeconds': 300,
+                                    'expungeAfterSeconds': 600},
+            'killSelection': 'YOUNGEST_FIRST',
+            'labels': {},
+            'ipAddress': None,
+            'residency': None,
+            'secrets': {},
+            'taskKillGracePeriodSeconds': None,
+            'acceptedResourceRoles': None,
+            'ports': [10000],
+            'portDefinitions': [{'port': 10000, 'protocol': 'tcp',
+                                 'labels': {}}],
+            'requirePorts': False,
+            'version': '2016-06-01T00:00:00.000Z',
+            'versionInfo': {
+                'lastScalingAt': '2016-06-01T00:00:00.000Z',
+                'lastConfigChangeAt': '2016-06-01T00:00:00.000Z'},
+            'tasksStaged': 0,
+            'tasksRunning': 2,
+            'tasksHealthy': 0,
+            'tasksUnhealthy': 0,
+            'deployments': [],
+        }],
+    }
+
+
+_PROPERTIES = {
+    'id', 'apps', 'groups', 'dependencies', 'version', 'acceptedResourceRoles',
+    'args', 'backoffFactor', 'backoffSeconds', 'cmd', 'constraints',
+    'container', 'cpus', 'disk', 'env', 'executor', 'healthChecks',
+    'instances', 'labels', 'maxLaunchDelaySeconds', 'mem', 'ports',
+    'requirePorts', 'storeUrls', 'upgradeStrategy', 'uris', 'user',
+}
+
+
+def test_marathon_group_matches_its_definition():
+    desired = {
+        'id': '/prod',
+        'apps': [{'id': 'web', 'cmd': 'serve', 'instances': 2, 'cpus': 0.5,
+                  'env': {'MODE': 'prod'},
+                  'uris': ['https://example.com/web.tgz']}],
+    }
+
+    assert groupdiff.diff(_marathon_group(), desired, _PROPERTIES) == []
+
+    del desired['apps'][0]['env']
+    assert groupdiff.plan(groupdiff.diff(
+        _marathon_group(), desired, _PROPERTIES)) == [
+            'update app /prod/web: env']
@@ -0,0 +1,121 @@
+import os
+
+from dcos import http
+
+import pytest
+
+
+def _do_get(handler):
+    handler.server.requests.append(handler.path)
+
+    if handler.path == '/etag' and \
+       handler.headers.get('If-None-Match') == '"v1"':
+        handler.send_response(304)
+        handler.send_header('Content-Length', '0')
+        handler.end_headers()
+        return
+
+    body = '{{"path": "{}"}}'.format(handler.path).encode('utf-8')
+    handler.send_response(200)
+    handler.send_header('Content-Type', 'application/json')
+    handler.send_header('Content-Length', str(len(body)))
+    if handler.path == '/etag':
+        handler.send_header('ETag', '"v1"')
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+@pytest.fixture
+def server(http_server):
+    return http_server(_do_get, requests=[])
+
+
+@pytest.fixture
+def server_url(server):
+    return server.url
+
+
+@pytest.fixture
+def cache(tmpdir, monkeypatch):
+    cache = http._ResponseCache(str(tmpdir), ttl=60, max_size=1024)
+    monkeypatch.setattr(http, '_get_cache', lambda: cache)
+    return cache
+
+
+def test_keep_alive_connections_are_reused(server_url):
+    before = http.connection_stats()
+
+    for _ in range(3):
+        assert http.get(server_url).json() == {'path': '/'}
+
+    after = http.connection_stats()
+    assert after['opened'] - before['opened'] == 1
+    assert after['reused'] - before['reused'] == 2
+
+
+def test_ensure_pool_maxsize_only_grows(monkeypatch):
+    # resize a fresh session, and restore the process-wide one afterwards
+    for name in ['_session', '_pool_connections', '_pool_maxsize']:
+        monkeypatch.setattr(http, name, None)
+
+    http.configure_pools(pool_connections=4, pool_maxsize=8)
+    session = http._get_session()
+
+    http.ensure_pool_maxsize(4)
+    assert http._get_session() is session
+
+    http.ensure_pool_maxsize(16)
+    assert http._get_session() is not session
+    assert http._pool_maxsize == 16
+    http._get_session().close()
+
+
+def test_cached_get_revalidates_etag(server, server_url, cache):
+    url = server_url + 'etag'
+
+    for _ in range(3):
+        assert http.cached_get(url).json() == {'path': '/etag'}
+
+    # every request was conditional, but only the first one had a body
+    assert server.requests == ['/etag'] * 3
+    assert cache.load(url)[0]['etag'] == '"v1"'
+
+
+def test_cached_get_ttl_without_validators(server, server_url, cache):
+    url = server_url + 'plain'
+
+    assert http.cached_get(url).json() == {'path': '/plain'}
+    assert http.cached_get(url).json() == {'path': '/plain'}
+    assert server.requests == ['/plain']
+
+    cache._ttl = 0
+    http.cached_get(url)
+    assert server.requests == ['/plain'] * 2
+
+
+def test_cached_get_stream(server, server_url, cache):
+    url = server_url + 'plain'
+
+    for _ in range(2):
+        response = http.cached_get(url, stream=True)
+        assert b''.join(response.iter_content(4)) == b'{"path": "/plain"}'
+        response.close()
+    assert server.requests == ['/plain']
+
+    cache._ttl = 0
+    response = http.cached_get(url, stream=True)
+    assert response.json() == {'path': '/plain'}
+    assert server.requests == ['/plain'] * 2
+
+
+def test_cache_evicts_least_recently_used(server, server_url, cache):
+    cache._max_size = 200
+    urls = [server_url + 'plain{}'.format(i) for i in range(3)]
+
+    for i, url in enumerate(urls):
+        http.cached_get(url)
+        # make the modification times distinct
+        os.utime(cache._path(url), (i, i))
+
+    assert cache.load(urls[0]) is None
+    assert cache.load(urls[2]) is not None
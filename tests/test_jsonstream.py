@@ -0,0 +1,80 @@
+import json
+
+from dcos import jsonstream
+
+import pytest
+
+
+def _chunks(document, size):
+    raw = json.dumps(document, ensure_ascii=False).encode('utf-8')
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+
+def _state():
+    return {
+        'hostname': 'master',
+        'frameworks': [{
+            'id': 'F0',
+            'name': u'märathon "1"',
+            'tasks': [
+                {'id': 'app.1', 'state': 'TASK_RUNNING',
+                 'resources': {'cpus': 0.5, 'ports': '[31000-31001]'}},
+                {'id': 'app.2', 'state': 'TASK_STAGING',
+                 'statuses': [{'state': 'TASK_STAGING'}]},
+            ],
+            'completed_tasks': [{'id': 'app.0', 'state': 'TASK_FAILED'}],
+        }],
+        'slaves': [{'id': 'S0', 'attributes': {}, 'active': True}],
+        'completed_frameworks': [],
+        'activated_slaves': 1.0,
+        'flags': None,
+    }
+
+
+def test_parse_paths():
+    assert jsonstream.parse_paths(
+        ['frameworks[].tasks[].{id,state}', 'frameworks[].id', 'slaves',
+         'slaves[].id']) == {
+            'frameworks': {'[]': {'tasks': {'[]': {'id': None,
+                                                   'state': None}},
+                                  'id': None}},
+            'slaves': None,
+    }
+
+
+@pytest.mark.parametrize('size', [1, 3, 64, 4096])
+def test_project(size):
+    projected = jsonstream.project(
+        _chunks(_state(), size),
+        ['frameworks[].{id,name}', 'frameworks[].tasks[].{id,resources}',
+         'slaves', 'flags'])
+
+    assert projected == {
+        'frameworks': [{
+            'id': 'F0',
+            'name': u'märathon "1"',
+            'tasks': [{'id': 'app.1',
+                       'resources': {'cpus': 0.5, 'ports': '[31000-31001]'}},
+                      {'id': 'app.2'}],
+        }],
+        'slaves': [{'id': 'S0', 'attributes': {}, 'active': True}],
+        'flags': None,
+    }
+
+
+def test_project_without_array_markers():
+    assert jsonstream.project(_chunks(_state(), 7), ['frameworks.tasks.id']) \
+        == {'frameworks': [{'tasks': [{'id': 'app.1'}, {'id': 'app.2'}]}]}
+
+
+@pytest.mark.parametrize('document', [
+    b'{"a": }',
+    b'{"a": 1',
+    b'{"a" 1}',
+    b'{"a": [1 2]}',
+    b'{"a": 1} x',
+    b'{"b": "unterminated}',
+])
+def test_project_invalid_json(document):
+    with pytest.raises(ValueError):
+        jsonstream.project([document], ['a'])
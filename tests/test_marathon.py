@@ -0,0 +1,237 @@
+import json
+import time
+
+from dcos import marathon
+from dcos.errors import DCOSException
+
+import pytest
+
+
+class _Response(object):
+    status_code = 200
+
+    def __init__(self, body):
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+def _fake_info(monkeypatch, version):
+    calls = []
+
+    def cached_get(url, to_exception=None, ttl=None, **kwargs):
+        calls.append((url, ttl))
+        return _Response({'version': version})
+
+    monkeypatch.setattr(marathon.http, 'cached_get', cached_get)
+    return calls
+
+
+def test_version_is_fetched_lazily_once(monkeypatch):
+    calls = _fake_info(monkeypatch, '0.10.0')
+
+    client = marathon.Client('http://marathon/', info_ttl=30)
+    assert calls == []
+
+    assert client.get_version() == marathon.LooseVersion('0.10.0')
+    assert client.get_version() == marathon.LooseVersion('0.10.0')
+    assert calls == [('http://marathon/v2/info', 30)]
+
+
+def test_outdated_version(monkeypatch):
+    _fake_info(monkeypatch, '0.8.0')
+
+    client = marathon.Client('http://marathon/')
+    with pytest.raises(DCOSException) as e:
+        client.get_app_schema()
+    assert 'outdated' in str(e.value)
+
+
+def test_get_apps_embeds_resources(monkeypatch):
+    calls = []
+
+    def cached_get(url, to_exception=None, params=None, **kwargs):
+        calls.append((url, params))
+        return _Response({'apps': []})
+
+    monkeypatch.setattr(marathon.http, 'cached_get', cached_get)
+
+    client = marathon.Client('http://marathon/')
+    client.get_apps()
+    client.get_apps(embed=['apps.counts', 'apps.deployments'])
+
+    assert calls == [
+        ('http://marathon/v2/apps', None),
+        ('http://marathon/v2/apps',
+         {'embed': ['apps.counts', 'apps.deployments']}),
+    ]
+
+
+def test_task_app_id():
+    assert marathon._task_app_id('my.app.0f8a-11e5') == '/my.app'
+    assert marathon._task_app_id('group_app.0f8a-11e5') == '/group/app'
+    assert marathon._task_app_id('no-uuid') is None
+
+
+def _fake_tasks(monkeypatch, tasks):
+    urls = []
+
+    def get(url, **kwargs):
+        urls.append(url)
+        if url.endswith('v2/tasks'):
+            return _Response({'tasks': tasks})
+        app_tasks = [task for task in tasks
+                     if url == 'http://marathon/v2/apps{}/tasks'.format(
+                         task['appId'])]
+        return _Response({'tasks': app_tasks})
+
+    monkeypatch.setattr(marathon.http, 'get', get)
+    return urls
+
+
+def test_get_task_uses_app_endpoint(monkeypatch):
+    tasks = [{'id': 'group_app.1', 'appId': '/group/app'},
+             {'id': 'other.2', 'appId': '/other'}]
+    urls = _fake_tasks(monkeypatch, tasks)
+
+    client = marathon.Client('http://marathon/')
+    assert client.get_task('group_app.1') == tasks[0]
+    assert urls == ['http://marathon/v2/apps/group/app/tasks']
+
+
+def test_get_task_falls_back_to_index(monkeypatch):
+    tasks = [{'id': 'foreign-task', 'appId': '/app'},
+             {'id': 'app.2', 'appId': '/app'}]
+    urls = _fake_tasks(monkeypatch, tasks)
+
+    client = marathon.Client('http://marathon/')
+    assert client.get_task('foreign-task') == tasks[0]
+    assert client.get_task('app.2') == tasks[1]
+    assert client.get_task('missing.3') is None
+    assert urls == ['http://marathon/v2/tasks']
+
+
+def test_kill_tasks_in_batches(monkeypatch):
+    requests = []
+
+    def post(url, params=None, json=None, **kwargs):
+        requests.append((url, params, json['ids']))
+        if params is None:
+            return _Response({'tasks': [{'id': id_} for id_ in json['ids']]})
+        return _Response({'deploymentId': str(len(requests)),
+                          'version': '2015-01-01'})
+
+    monkeypatch.setattr(marathon.http, 'post', post)
+    client = marathon.Client('http://marathon/')
+    task_ids = ['app.{}'.format(i) for i in range(5)]
+
+    result = client.kill_tasks(task_ids, batch_size=2)
+    assert [ids for _, _, ids in requests] == \
+        [task_ids[0:2], task_ids[2:4], task_ids[4:]]
+    assert requests[0][0] == 'http://marathon/v2/tasks/delete'
+    assert [task['id'] for task in result['tasks']] == task_ids
+    assert result['deploymentIds'] == []
+
+    del requests[:]
+    result = client.kill_tasks(task_ids, scale=True)
+    assert requests == [('http://marathon/v2/tasks/delete',
+                         {'scale': 'true'}, task_ids)]
+    assert result == {'tasks': [], 'deploymentIds': ['1']}
+
+
+def test_kill_tasks_reports_killed_batches_on_error(monkeypatch):
+    requests = []
+
+    def post(url, params=None, json=None, **kwargs):
+        requests.append(json['ids'])
+        if len(requests) == 3:
+            raise DCOSException('Error while fetching [{}]'.format(url))
+        return _Response({'deploymentId': str(len(requests))})
+
+    monkeypatch.setattr(marathon.http, 'post', post)
+    client = marathon.Client('http://marathon/')
+    task_ids = ['app.{}'.format(i) for i in range(6)]
+
+    with pytest.raises(DCOSException) as e:
+        client.kill_tasks(task_ids, scale=True, batch_size=2)
+
+    message = str(e.value)
+    assert message.startswith('Error while fetching')
+    assert 'Killed tasks before the error: app.0, app.1, app.2, app.3' \
+        in message
+    assert 'Created deployments: 1, 2' in message
+
+
+def _event(event_type, deployment_id):
+    data = json.dumps({'eventType': event_type, 'plan': {'id': deployment_id}})
+    return 'event: {}\ndata: {}\n\n'.format(event_type, data).encode()
+
+
+def _do_get_events(handler):
+    server = handler.server
+    if not handler.path.startswith('/v2/events'):
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', '2')
+        handler.end_headers()
+        handler.wfile.write(b'{}')
+        return
+
+    def write(data):
+        if server.chunked:
+            data = '{:x}\r\n'.format(len(data)).encode() + data + b'\r\n'
+        handler.wfile.write(data)
+        handler.wfile.flush()
+
+    handler.send_response(200)
+    handler.send_header('Content-Type', 'text/event-stream')
+    if server.chunked:
+        handler.send_header('Transfer-Encoding', 'chunked')
+    else:
+        handler.send_header('Connection', 'close')
+    handler.end_headers()
+
+    write(b': connected\n\n')
+    write(_event('deployment_info', 'd1'))
+    write(_event('status_update_event', 'd1'))
+    time.sleep(server.pause)
+    write(_event('deployment_success', 'd1'))
+    if server.chunked:
+        handler.wfile.write(b'0\r\n\r\n')
+    handler.close_connection = True
+
+
+@pytest.fixture(params=[True, False], ids=['chunked', 'unchunked'])
+def event_server(request, http_server):
+    return http_server(_do_get_events, chunked=request.param, pause=0)
+
+
+def _event_client(server):
+    return marathon.Client(server.url)
+
+
+def test_get_events(event_server):
+    events = _event_client(event_server).get_events(
+        ['deployment_info', 'deployment_success'])
+
+    assert [e['eventType'] for e in events] == ['deployment_info',
+                                                'deployment_success']
+
+
+def test_get_events_timeout(event_server):
+    event_server.pause = 1
+    events = iter(_event_client(event_server).get_events(timeout=0.3))
+
+    assert next(events)['eventType'] == 'deployment_info'
+    with pytest.raises(DCOSException):
+        list(events)
+    events.close()
+
+
+def test_get_events_without_event_stream(event_server):
+    client = _event_client(event_server)
+    client._create_url = lambda path: client._base_url + 'not-events'
+
+    with pytest.raises(DCOSException):
+        client.get_events()
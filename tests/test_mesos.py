@@ -0,0 +1,309 @@
+import json
+import os
+
+from dcos import jsonstream, mesos
+from dcos.errors import DCOSException
+
+import pytest
+
+
+def _state():
+    return {
+        'slaves': [
+            {'id': 'S1', 'hostname': 'host-1'},
+            {'id': 'S10', 'hostname': 'host-10'},
+        ],
+        'frameworks': [{
+            'id': 'F0',
+            'active': True,
+            'user': 'root',
+            'tasks': [
+                {'id': 'app.1', 'framework_id': 'F0', 'slave_id': 'S1'},
+                {'id': 'app.2', 'framework_id': 'F0', 'slave_id': 'S10'},
+            ],
+            'completed_tasks': [],
+        }],
+        'completed_frameworks': [{
+            'id': 'F1',
+            'active': False,
+            'user': 'nobody',
+            'tasks': [],
+            'completed_tasks': [
+                {'id': 'old.1', 'framework_id': 'F1', 'slave_id': 'S1'},
+            ],
+        }],
+    }
+
+
+def test_slave_exact_id_lookup():
+    master = mesos.Master(_state())
+
+    # 'S1' is also a substring of 'S10', but it is an exact id
+    assert master.slave('S1')['hostname'] == 'host-1'
+    assert master.slave('S10')['hostname'] == 'host-10'
+    assert master.slave('S1') is master.slave('S1')
+
+
+def test_slave_substring_filter():
+    master = mesos.Master(_state())
+
+    assert master.slave('10')['id'] == 'S10'
+    with pytest.raises(DCOSException):
+        master.slave('S')
+    with pytest.raises(DCOSException):
+        master.slave('S2')
+
+
+def test_framework_lookup():
+    master = mesos.Master(_state())
+
+    assert master.framework('F0')['user'] == 'root'
+    assert master.framework('F1')['user'] == 'nobody'
+    assert master.framework('F2') is None
+
+
+def test_task_relations():
+    master = mesos.Master(_state())
+
+    task = master.task('app.2')
+    assert task.slave()['hostname'] == 'host-10'
+    assert task.user() == 'root'
+    assert master.framework('F0').task('app.2') is task
+    assert master.framework('F0').task('missing') is None
+
+
+def test_tasks_filter():
+    master = mesos.Master(_state())
+
+    assert [t['id'] for t in master.tasks('app.*')] == ['app.1', 'app.2']
+    assert [t['id'] for t in master.tasks('old', completed=True)] == \
+        ['old.1']
+
+
+def _slave_state():
+    return {
+        'frameworks': [{
+            'executors': [{
+                'id': 'E1',
+                'directory': '/sandbox/E1',
+                'tasks': [{'id': 'app.1'}],
+                'completed_tasks': [],
+                'queued_tasks': [],
+            }],
+            'completed_executors': [{
+                'id': 'E2',
+                'directory': '/sandbox/E2/',
+                'tasks': [],
+                'completed_tasks': [{'id': 'app.2'}],
+                'queued_tasks': [],
+            }],
+        }],
+        'completed_frameworks': [],
+    }
+
+
+def test_slave_executor_index():
+    master = mesos.Master(_state())
+    master.slave('S1')._state = _slave_state()
+    master.slave('S10')._state = _slave_state()
+
+    assert master.task('app.1').executor()['id'] == 'E1'
+    assert master.task('app.2').directory() == '/sandbox/E2/'
+    assert master.slave('S1').executor('missing') is None
+
+
+def test_mesos_file_host_path_resolved_once(monkeypatch):
+    master = mesos.Master(_state())
+    master.slave('S1')._state = _slave_state()
+    task = master.task('app.1')
+
+    calls = []
+    directory = mesos.Task.directory
+
+    def counting_directory(self):
+        calls.append(1)
+        return directory(self)
+
+    monkeypatch.setattr(mesos.Task, 'directory', counting_directory)
+    mesos_file = mesos.MesosFile(task, 'stdout', None)
+
+    assert mesos_file._host_path() == '/sandbox/E1/stdout'
+    assert mesos_file._host_path() == '/sandbox/E1/stdout'
+    assert len(calls) == 1
+
+
+class _FakeMesosFile(mesos.MesosFile):
+    """MesosFile that serves files/read.json from memory."""
+
+    def __init__(self, content, **kwargs):
+        super(_FakeMesosFile, self).__init__(None, 'stdout', None, **kwargs)
+        self.content = content
+        self.fetched = 0
+
+    def _host_path(self):
+        return '/sandbox/stdout'
+
+    def _fetch(self, params):
+        offset, length = params['offset'], params['length']
+        if offset == -1:
+            return {'offset': len(self.content), 'data': ''}
+
+        end = len(self.content) if length == -1 else offset + length
+        data = self.content[offset:end]
+        self.fetched += len(data)
+        return {'offset': offset, 'data': data.decode('utf-8')}
+
+
+def test_mesos_file_read():
+    content = ''.join('line {}\n'.format(i) for i in range(100)).encode()
+    mesos_file = _FakeMesosFile(content, block_size=16)
+
+    assert mesos_file.read(5) == b'line '
+    assert mesos_file.tell() == 5
+    assert mesos_file.read() == content[5:]
+    assert mesos_file.read() == b''
+
+    mesos_file.seek(-7, os.SEEK_END)
+    assert mesos_file.read(100) == b'line 99\n'[1:]
+
+
+def test_mesos_file_readline_and_iteration():
+    content = b'first\nsecond line is long\n\nlast'
+    mesos_file = _FakeMesosFile(content, block_size=4)
+
+    assert mesos_file.readline() == b'first\n'
+    assert mesos_file.readline(3) == b'sec'
+    assert list(mesos_file) == [b'ond line is long\n', b'\n', b'last']
+    assert mesos_file.readline() == b''
+
+
+def test_mesos_file_caches_complete_blocks():
+    content = b'x' * 40
+    mesos_file = _FakeMesosFile(content, block_size=16, cache_blocks=2)
+
+    mesos_file.read()
+    assert mesos_file.fetched == 40
+
+    # the two complete blocks are cached, the partial tail is refetched
+    mesos_file.seek(0)
+    mesos_file.read()
+    assert mesos_file.fetched == 48
+
+    # the file grew: only the new data is fetched
+    mesos_file.content += b'y' * 8
+    mesos_file.seek(40)
+    assert mesos_file.read() == b'y' * 8
+    assert mesos_file.fetched == 56
+
+
+def _client(dcos_url, slave_direct):
+    client = mesos.MesosClient.__new__(mesos.MesosClient)
+    client._dcos_url = dcos_url
+    client._mesos_master_url = None
+    client._slave_direct = slave_direct
+    return client
+
+
+def test_slave_private_url():
+    slave = mesos.Slave({'id': 'S1', 'pid': 'slave(1)@10.0.0.1:5051'},
+                        None, None)
+    assert slave.private_url() == 'http://10.0.0.1:5051/'
+
+
+def test_slave_get_falls_back_to_proxy(monkeypatch):
+    urls = []
+
+    def fake_get(url, to_exception=None, **kwargs):
+        urls.append(url)
+        if url.startswith('http://10.0.0.1'):
+            raise to_exception(IOError('connection refused'))
+        return url
+
+    monkeypatch.setattr(mesos.http, 'get', fake_get)
+    monkeypatch.setattr(mesos, '_unreachable_slaves', set())
+
+    # the fallback is remembered across clients, as each Slave creates
+    # its own
+    for _ in range(2):
+        client = _client('http://dcos/', slave_direct=True)
+        client.slave_get('S1', 'http://10.0.0.1:5051/', 'state.json')
+
+    assert urls == ['http://10.0.0.1:5051/state.json',
+                    'http://dcos/slave/S1/state.json',
+                    'http://dcos/slave/S1/state.json']
+
+
+def test_slave_get_without_proxy(monkeypatch):
+    monkeypatch.setattr(mesos.http, 'get', lambda url, **kwargs: url)
+
+    client = _client(None, slave_direct=True)
+    assert client.slave_get('S1', 'http://10.0.0.1:5051/', 'state.json') == \
+        'http://10.0.0.1:5051/state.json'
+
+    client = _client('http://dcos/', slave_direct=False)
+    assert client.slave_get('S1', 'http://10.0.0.1:5051/', 'state.json') == \
+        'http://dcos/slave/S1/state.json'
+
+
+def _completed_state(num_tasks):
+    return {
+        'frameworks': [],
+        'slaves': [{'id': 'S{}'.format(i), 'hostname': 'host-{}'.format(i)}
+                   for i in range(10)],
+        'completed_frameworks': [{
+            'id': 'F0',
+            'user': 'root',
+            'active': False,
+            'tasks': [],
+            'completed_tasks': [{
+                'id': 'app.{}'.format(i),
+                'name': 'app',
+                'framework_id': 'F0',
+                'slave_id': 'S{}'.format(i % 10),
+                'state': 'TASK_FINISHED',
+                'resources': {'cpus': 0.1, 'mem': 16.0, 'disk': 0.0},
+                'statuses': [{'state': 'TASK_FINISHED', 'timestamp': i}],
+                'labels': [],
+            } for i in range(num_tasks)],
+        }],
+    }
+
+
+def test_projected_completed_tasks_share_strings():
+    raw = json.dumps(_completed_state(10)).encode('utf-8')
+    state = jsonstream.project([raw], [
+        'completed_frameworks[].{id,user,active}',
+        'completed_frameworks[].completed_tasks[].'
+        '{id,name,state,slave_id,framework_id}',
+    ])
+
+    tasks = mesos.Master(state).tasks(completed=True)
+    assert len(tasks) == 10
+    assert tasks[0]['state'] is tasks[1]['state']
+    assert tasks[0]['framework_id'] is tasks[1]['framework_id']
+    assert tasks[0].user() == 'root'
+
+
+def test_completed_tasks_memory_benchmark():
+    tracemalloc = pytest.importorskip('tracemalloc')
+    raw = json.dumps(_completed_state(5000)).encode('utf-8')
+    chunks = [raw[i:i + 65536] for i in range(0, len(raw), 65536)]
+
+    def peak(load):
+        tracemalloc.start()
+        try:
+            tasks = mesos.Master(load()).tasks(completed=True)
+            assert len(tasks) == 5000
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    full = peak(lambda: json.loads(raw.decode('utf-8')))
+    projected = peak(lambda: jsonstream.project(chunks, [
+        'completed_frameworks[].{id,user,active}',
+        'completed_frameworks[].completed_tasks[].'
+        '{id,name,state,slave_id,framework_id}',
+        'slaves[].{id,hostname}',
+    ]))
+
+    assert projected < full / 2
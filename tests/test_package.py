@@ -1,4 +1,8 @@
 import collections
+import io
+import json
+import time
+import zipfile
 
 from dcos import package
 
@@ -77,3 +81,458 @@ def test_option_merge(merge_data):
     assert merge_data.expected == package._merge_options(
         merge_data.first,
         merge_data.second)
+
+
+class _TaskClient(object):
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.calls = []
+
+    def get_tasks(self, app_id):
+        self.calls.append(app_id)
+        return [task for task in self.tasks
+                if app_id is None or task['appId'] == app_id]
+
+
+def test_app_tasks_uses_embedded_and_fetched_tasks():
+    tasks = [{'appId': '/a', 'host': 'h1'}, {'appId': '/b', 'host': 'h2'}]
+    client = _TaskClient(tasks)
+    apps = [{'id': '/a', 'tasks': [tasks[0]]}, {'id': '/b'}]
+
+    assert package._app_tasks(client, apps, ['/a', '/b']) == {
+        '/a': [tasks[0]], '/b': [tasks[1]]}
+    assert client.calls == ['/b']
+
+
+def test_app_tasks_lists_all_tasks_once():
+    app_ids = ['/app{}'.format(i)
+               for i in range(package.TASK_FETCH_CONCURRENCY + 2)]
+    tasks = [{'appId': app_id} for app_id in app_ids] + [{'appId': '/x'}]
+    client = _TaskClient(tasks)
+    apps = [{'id': '/app0', 'tasks': []}] + [{'id': i} for i in app_ids[1:]]
+
+    tasks_by_app = package._app_tasks(client, apps, app_ids)
+    assert tasks_by_app['/app0'] == []
+    assert tasks_by_app['/app1'] == [{'appId': '/app1'}]
+    assert client.calls == [None]
+
+
+def _search_packages():
+    return [
+        {'name': 'chronos', 'tags': ['cron', 'scheduler'],
+         'description': 'A fault tolerant job scheduler', 'versions': {}},
+        {'name': 'kafka', 'tags': ['message', 'broker'],
+         'description': 'Apache Kafka framework', 'versions': {'0.9': '0'}},
+        {'name': 'spark', 'tags': ['bigdata', 'framework', 'data'],
+         'description': 'Fast cluster computing', 'versions': {}},
+    ]
+
+
+@pytest.fixture(params=[True, False], ids=['indexed', 'linear'])
+def search(request):
+    packages = _search_packages()
+    search_index = None
+    if request.param:
+        search_index = package.SearchIndex(
+            package.build_search_index({'packages': packages}))
+
+    def search(query):
+        return [packages[i]['name'] for i in package._search_matches(
+            packages, search_index, query.lower())]
+    return search
+
+
+def test_search_substring_ranking(search):
+    assert search('framework') == ['spark', 'kafka']
+    assert search('SCHED') == ['chronos']
+    assert search('ka') == ['kafka']
+    assert search('xyzzy') == []
+
+
+def test_search_without_query_keeps_registry_order(search):
+    assert search('') == ['chronos', 'kafka', 'spark']
+
+
+def test_search_fuzzy_matches(search):
+    assert search('kafak') == ['kafka']
+    assert search('chronso') == ['chronos']
+
+
+def test_search_index_ignores_other_packages():
+    packages = _search_packages()
+    search_index = package.SearchIndex(
+        package.build_search_index({'packages': packages}))
+    assert search_index.package_count == 3
+
+    assert package._search_matches(
+        packages + [{'name': 'kafka2', 'versions': {}}],
+        search_index, 'kafka') == [1, 3]
+
+    with pytest.raises(ValueError):
+        package.SearchIndex(b'NOTINDEX' + b'\0' * 8)
+
+
+def _synthetic_packages(count):
+    return [{'name': 'package-{}'.format(i),
+             'tags': ['tag{}'.format(i % 50), 'service'],
+             'description': 'Synthetic package number {} for the search '
+                            'benchmark, with a longer description'.format(i),
+             'versions': {'0': '1.0.0'}}
+            for i in range(count)]
+
+
+def test_search_index_is_no_slower_than_linear_scan():
+    packages = _synthetic_packages(1000)
+    search_index = package.SearchIndex(
+        package.build_search_index({'packages': packages}))
+
+    def best_time(search_index, query):
+        times = []
+        for _ in range(5):
+            start = time.time()
+            matches = package._search_matches(packages, search_index, query)
+            times.append(time.time() - start)
+        return min(times), matches
+
+    for query in ['package-42', 'tag7', 'zzz']:
+        indexed, indexed_matches = best_time(search_index, query)
+        linear, linear_matches = best_time(None, query)
+        assert indexed_matches == linear_matches
+        assert indexed <= linear
+
+
+def _universe(path, packages):
+    meta = path.join('repo', 'meta')
+    meta.ensure(dir=True)
+    meta.join('version.json').write(json.dumps({'version': '1.0.0'}))
+    meta.join('index.json').write(json.dumps({'packages': [
+        {'name': name, 'tags': [], 'description': '', 'versions': {}}
+        for name in packages]}))
+    return 'file://' + str(path)
+
+
+def _update(tmpdir, sources):
+    cache = tmpdir.join('cache')
+    package.update_sources({'package.sources': sources,
+                            'package.cache': str(cache)})
+    return cache
+
+
+def test_update_sources_publishes_atomically(tmpdir, monkeypatch):
+    monkeypatch.setattr(package.emitter, 'publish', lambda event: None)
+    sources = [_universe(tmpdir.join('u1'), ['chronos']),
+               _universe(tmpdir.join('u2'), ['kafka'])]
+
+    cache = _update(tmpdir, sources)
+    _universe(tmpdir.join('u1'), ['marathon'])
+    _update(tmpdir, sources)
+
+    registries = package.registries({'package.sources': sources,
+                                     'package.cache': str(cache)})
+    assert [[pkg['name'] for pkg in registry.get_index()['packages']]
+            for registry in registries] == [['marathon'], ['kafka']]
+
+    # only the swapped-in registries and the lock are left in the cache
+    entries = sorted(entry.basename for entry in cache.listdir())
+    hashes = sorted(package.url_to_source(s).hash() for s in sources)
+    assert [e for e in entries if not e.startswith('.')] == hashes
+    assert len(entries) == 2 + 1 + 2
+    assert all(cache.join(h).islink() for h in hashes)
+
+
+def test_update_sources_only_removes_own_stages(tmpdir, monkeypatch):
+    monkeypatch.setattr(package.emitter, 'publish', lambda event: None)
+    source = _universe(tmpdir.join('u1'), ['chronos'])
+    cache = _update(tmpdir, [source])
+
+    # a registry that the user moved out of the cache
+    target = cache.join(package.url_to_source(source).hash())
+    elsewhere = tmpdir.join('elsewhere')
+    target.realpath().dirpath().move(elsewhere)
+    target.remove()
+    target.mksymlinkto(elsewhere.join(package.STAGE_REGISTRY_DIR))
+
+    _universe(tmpdir.join('u1'), ['kafka'])
+    _update(tmpdir, [source])
+
+    assert elsewhere.join(package.STAGE_REGISTRY_DIR).check(dir=True)
+    assert 'kafka' in target.join('repo', 'meta', 'index.json').read()
+
+
+def test_update_sources_keeps_cache_on_error(tmpdir, monkeypatch):
+    monkeypatch.setattr(package.emitter, 'publish', lambda event: None)
+    source = _universe(tmpdir.join('u1'), ['chronos'])
+    cache = _update(tmpdir, [source])
+
+    with pytest.raises(package.DCOSException) as e:
+        _update(tmpdir, [source, 'file://' + str(tmpdir.join('missing'))])
+    assert 'Unable to fetch packages' in str(e.value)
+
+    registry, = package.registries({'package.sources': [source],
+                                    'package.cache': str(cache)})
+    assert registry.get_index()['packages'][0]['name'] == 'chronos'
+
+
+def test_update_sources_reports_unexpected_errors(tmpdir, monkeypatch):
+    monkeypatch.setattr(package.emitter, 'publish', lambda event: None)
+    good = _universe(tmpdir.join('u1'), ['chronos'])
+    broken = _universe(tmpdir.join('u2'), ['kafka'])
+    tmpdir.join('u2', 'repo', 'packages').ensure(dir=True)
+    tmpdir.join('u2', 'repo', 'packages', 'README').write('not a letter')
+
+    with pytest.raises(package.DCOSException) as e:
+        _update(tmpdir, [good, broken])
+    assert 'Unable to update source [{}]'.format(broken) in str(e.value)
+
+    cache = tmpdir.join('cache')
+    registry, = package.registries({'package.sources': [good],
+                                    'package.cache': str(cache)})
+    assert registry.get_index()['packages'][0]['name'] == 'chronos'
+
+
+def _universe_zip(packages):
+    files = [
+        ('universe/scripts/build.sh', ''),
+        ('universe/repo/meta/version.json', json.dumps({'version': '1.0.0'})),
+        ('universe/repo/meta/index.json', json.dumps(
+            {'packages': [{'name': name, 'tags': [], 'description': '',
+                           'versions': {}} for name in packages]})),
+    ]
+
+    # the same packages always make the same zip file
+    body = io.BytesIO()
+    with zipfile.ZipFile(body, 'w') as zip_file:
+        for name, content in files:
+            zip_file.writestr(zipfile.ZipInfo(name, (2016, 1, 1, 0, 0, 0)),
+                              content)
+    return body.getvalue()
+
+
+def _do_get_universe(handler):
+    server = handler.server
+    etag = '"{}"'.format(server.version) if server.etags else None
+    if etag is not None and handler.headers.get('If-None-Match') == etag:
+        server.statuses.append(304)
+        handler.send_response(304)
+        handler.send_header('Content-Length', '0')
+        handler.end_headers()
+        return
+
+    server.statuses.append(200)
+    body = _universe_zip(server.packages)
+    handler.send_response(200)
+    handler.send_header('Content-Length', str(len(body)))
+    if etag is not None:
+        handler.send_header('ETag', etag)
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+@pytest.fixture
+def universe_server(http_server):
+    return http_server(_do_get_universe, etags=True, version=1,
+                       packages=['chronos'], statuses=[])
+
+
+@pytest.mark.parametrize('etags', [True, False])
+def test_update_http_source_conditionally(tmpdir, monkeypatch,
+                                          universe_server, etags):
+    published = []
+    monkeypatch.setattr(package.emitter, 'publish', published.append)
+    universe_server.etags = etags
+    source = universe_server.url + 'universe.zip'
+    config = {'package.sources': [source],
+              'package.cache': str(tmpdir.join('cache'))}
+
+    def names():
+        registry, = package.registries(config)
+        return [pkg['name'] for pkg in registry.get_index()['packages']]
+
+    package.update_sources(config)
+    target = package.os.readlink(package.registries(config)[0]._base_path)
+
+    package.update_sources(config)
+    assert names() == ['chronos']
+    assert package.os.readlink(
+        package.registries(config)[0]._base_path) == target
+    assert 'is up to date' in published[-1]
+
+    universe_server.version = 2
+    universe_server.packages = ['kafka']
+    package.update_sources(config)
+    assert names() == ['kafka']
+
+    assert universe_server.statuses == \
+        ([200, 304, 200] if etags else [200, 200, 200])
+
+
+def test_update_http_source_keeps_new_validators(tmpdir, monkeypatch,
+                                                 universe_server):
+    published = []
+    monkeypatch.setattr(package.emitter, 'publish', published.append)
+    config = {'package.sources': [universe_server.url + 'universe.zip'],
+              'package.cache': str(tmpdir.join('cache'))}
+
+    validated = []
+    monkeypatch.setattr(package.Registry, 'validate',
+                        lambda registry: validated.append(registry) or [])
+
+    package.update_sources(config)
+
+    # a new ETag for the same content
+    universe_server.version = 2
+    package.update_sources(config, validate=True)
+    package.update_sources(config, validate=True)
+
+    assert universe_server.statuses == [200, 200, 304]
+    assert 'is up to date' in published[-1]
+
+    # the cached registry is validated, even when it is not downloaded
+    assert len(validated) == 2
+
+
+def test_extract_registry(tmpdir):
+    body = io.BytesIO(_universe_zip(['chronos']))
+    target = tmpdir.join('registry')
+
+    package._extract_registry(zipfile.ZipFile(body), str(target))
+
+    assert sorted(p.basename for p in target.listdir()) == \
+        ['repo', 'scripts']
+    assert target.join('scripts', 'build.sh').stat().mode & 0o100
+    assert json.loads(target.join('repo', 'meta', 'version.json').read()) \
+        == {'version': '1.0.0'}
+
+
+def test_extract_registry_needs_one_enclosing_directory(tmpdir):
+    body = io.BytesIO()
+    with zipfile.ZipFile(body, 'w') as zip_file:
+        zip_file.writestr('a/repo/x', '')
+        zip_file.writestr('b/repo/y', '')
+
+    with pytest.raises(package.DCOSException):
+        package._extract_registry(zipfile.ZipFile(body),
+                                  str(tmpdir.join('registry')))
+
+
+def _git(path, *args):
+    package.subprocess.check_output(
+        ['git', '-C', str(path), '-c', 'user.name=test',
+         '-c', 'user.email=test@example.com'] + list(args))
+
+
+def test_git_source_uses_shallow_mirror(tmpdir):
+    upstream = tmpdir.join('upstream')
+    _universe(upstream, ['chronos'])
+    _git(upstream, 'init', '-q')
+    _git(upstream, 'checkout', '-q', '-b', 'master')
+    _git(upstream, 'add', '.')
+    _git(upstream, 'commit', '-q', '-m', 'first')
+
+    source = package.GitSource('file://' + str(upstream))
+    cached = tmpdir.join('cache', source.hash())
+
+    source.copy_to_cache(str(cached), str(cached))
+    assert cached.join('repo', 'meta', 'index.json').check()
+    assert tmpdir.join('cache', source.hash() + '.git').check(dir=True)
+
+    # unchanged upstream
+    assert source.copy_to_cache(str(tmpdir.join('stage1')),
+                                str(cached)) == 0
+    assert not tmpdir.join('stage1').check()
+
+    _universe(upstream, ['kafka'])
+    _git(upstream, 'commit', '-q', '-a', '-m', 'second')
+    assert source.copy_to_cache(str(tmpdir.join('stage2')),
+                                str(cached)) is None
+    assert 'kafka' in tmpdir.join(
+        'stage2', 'repo', 'meta', 'index.json').read()
+
+
+def test_git_source_keeps_mirror_on_fetch_error(tmpdir):
+    upstream = tmpdir.join('upstream')
+    _universe(upstream, ['chronos'])
+    _git(upstream, 'init', '-q')
+    _git(upstream, 'checkout', '-q', '-b', 'master')
+    _git(upstream, 'add', '.')
+    _git(upstream, 'commit', '-q', '-m', 'first')
+
+    source = package.GitSource('file://' + str(upstream))
+    cached = tmpdir.join('cache', source.hash())
+    mirror = tmpdir.join('cache', source.hash() + '.git')
+    source.copy_to_cache(str(cached), str(cached))
+
+    # an unreachable source keeps the mirror
+    upstream.move(tmpdir.join('moved'))
+    with pytest.raises(package.DCOSException) as e:
+        source.copy_to_cache(str(tmpdir.join('stage1')), str(cached))
+    assert 'Unable to fetch packages' in str(e.value)
+    assert mirror.check(dir=True)
+
+    # a corrupt one is removed, and cloned again by the next update
+    tmpdir.join('moved').move(upstream)
+    for path in mirror.join('objects').visit(lambda p: p.check(file=True)):
+        path.chmod(0o644)
+        path.write('corrupt')
+    with pytest.raises(package.DCOSException):
+        source.copy_to_cache(str(tmpdir.join('stage2')), str(cached))
+    assert not mirror.check()
+    assert source.copy_to_cache(str(tmpdir.join('stage3')),
+                                str(cached)) == 0
+
+
+def test_git_mirror_is_locked(tmpdir):
+    mirror_dir = str(tmpdir.join('source.git'))
+
+    with package._lock_mirror(mirror_dir):
+        with pytest.raises(package.DCOSException):
+            with package._lock_mirror(mirror_dir):
+                pass
+
+    with package._lock_mirror(mirror_dir):
+        pass
+
+
+def _package_tree(path):
+    for version, software in [('0', '2.3.0'), ('1', '2.4.0')]:
+        version_dir = path.join('repo', 'packages', 'C', 'chronos', version)
+        version_dir.ensure(dir=True)
+        version_dir.join('package.json').write(json.dumps(
+            {'name': 'chronos', 'version': software}))
+        version_dir.join('config.json').write(json.dumps(
+            {'type': 'object', 'properties': {}}))
+        version_dir.join('command.json').write('{"pip": ["{{url}}"]}')
+    return path
+
+
+def test_packed_registry_reads_no_tree(tmpdir, monkeypatch):
+    base = _package_tree(tmpdir.join('registry'))
+    package.Registry(None, str(base)).write_pack()
+    tree_versions = package.Package(
+        None, str(base.join('repo', 'packages', 'C', 'chronos'))
+    ).package_versions()
+
+    registry = package.Registry(None, str(base))
+    pkg = registry.get_package('chronos')
+
+    # everything below is read from the pack
+    monkeypatch.setattr(package.os, 'listdir', None)
+    monkeypatch.setattr(package.util, 'read_file', None)
+
+    assert registry.get_package('marathon') is None
+    assert pkg.name() == 'chronos'
+    assert pkg.package_versions() == tree_versions
+    assert pkg.latest_version() == '1'
+    assert pkg.software_versions() == {'0': '2.3.0', '1': '2.4.0'}
+    assert pkg.has_command_definition('0')
+    assert not pkg.has_marathon_definition('0')
+    assert pkg.command_json('1', {'url': 'x'}) == {'pip': ['x']}
+    assert pkg.options('1', None) == {}
+
+
+def test_invalid_pack_falls_back_to_tree(tmpdir):
+    base = _package_tree(tmpdir.join('registry'))
+    base.join(package.PACK_FILE).write('garbage')
+
+    pkg = package.Registry(None, str(base)).get_package('chronos')
+    assert pkg.package_json('0')['version'] == '2.3.0'
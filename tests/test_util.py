@@ -28,3 +28,37 @@ def test_open_file():
             pass
     assert 'Error opening file [{}]: No such file or directory'.format(path) \
         in str(excinfo.value)
+
+
+def test_validators_are_shared(monkeypatch):
+    created = []
+    validator = util.jsonschema.Draft4Validator
+
+    def counting_validator(schema):
+        created.append(schema)
+        return validator(schema)
+
+    monkeypatch.setattr(util, '_validators', util.collections.OrderedDict())
+    monkeypatch.setattr(util.jsonschema, 'Draft4Validator',
+                        counting_validator)
+
+    schema = {'type': 'object', 'required': ['id']}
+    assert util.validate_json({}, schema) == \
+        ['Error: missing required property \'id\'.']
+    assert util.validate_json({'id': 'a'}, schema) == []
+    assert len(created) == 1
+
+    assert util.validate_json({'id': 'a'}, dict(schema)) == []
+    assert len(created) == 2
+
+
+def test_validators_are_bounded(monkeypatch):
+    monkeypatch.setattr(util, '_validators', util.collections.OrderedDict())
+    monkeypatch.setattr(util, 'VALIDATOR_CACHE_SIZE', 2)
+
+    schemas = [{'type': 'object'} for _ in range(3)]
+    for schema in schemas:
+        util.validate_json({}, schema)
+    util.validate_json({}, schemas[1])
+
+    assert list(util._validators) == [id(schemas[2]), id(schemas[1])]